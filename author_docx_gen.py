@@ -2,7 +2,11 @@ from docx import Document
 from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
 from docx.shared import Pt, RGBColor, Inches
-import json
+from docx_gen.assignment import balance_assignment, estimate_costs, load_author_papers
+from docx_gen.ooxml_writer import write_assignment_table
+import argparse
+import glob
+import time
 
 
 def add_hyperlink(paragraph, text, url):
@@ -40,97 +44,168 @@ def add_hyperlink(paragraph, text, url):
     paragraph._p.append(hyperlink)
 
 
-# 加载 JSON 数据
-json_file_path = "author_info/Zhouchen_Lin.json"
-with open(json_file_path, "r", encoding="utf-8") as file:
-    data = json.load(file)
-
-doc = Document()
-
-doc.add_heading("2025年引用摘录分工", level=1)
-
-table = doc.add_table(rows=1, cols=3)
-table.style = "Table Grid"
-
-# ---- 将表格线改为虚线 ----
-tbl = table._tbl
-tblPr = tbl.tblPr
-tblBorders = tblPr.first_child_found_in("w:tblBorders")
-
-if tblBorders is None:
-    tblBorders = OxmlElement("w:tblBorders")
-    tblPr.append(tblBorders)
-
-for border_name in ("top", "left", "bottom", "right", "insideH", "insideV"):
-    border_el = tblBorders.find(qn("w:%s" % border_name))
-    if border_el is None:
-        border_el = OxmlElement("w:%s" % border_name)
-        tblBorders.append(border_el)
-    # 设为虚线 (dotted)，线宽可根据需要进行调整
-    border_el.set(qn("w:val"), "dotted")
-    border_el.set(qn("w:sz"), "4")
-    border_el.set(qn("w:space"), "0")
-    border_el.set(qn("w:color"), "auto")
-# ---- 虚线设置结束 ----
-
-
-# 手动指定列宽
-table.autofit = False
-table.columns[0].width = Inches(5)
-table.columns[1].width = Inches(0.7)
-table.columns[2].width = Inches(0.7)
-
-# 设置表头并居中
-headers = ["论文", "引用数", "负责人"]
-header_row = table.rows[0]
-for i, header in enumerate(headers):
-    cell = header_row.cells[i]
-    cell.text = header
-    for paragraph in cell.paragraphs:
-        paragraph.alignment = 1  # 居中对齐
-
-# 填充表格内容
-for entry in data:
-    row_cells = table.add_row().cells
-
-    # 第1列（信息）
-    info_cell = row_cells[0]
-    info_paragraph = info_cell.paragraphs[0]
-    info_paragraph.paragraph_format.line_spacing = Pt(12)  # 调小行距
-    info_paragraph.paragraph_format.space_before = Pt(0)
-    info_paragraph.paragraph_format.space_after = Pt(0)
-
-    title = entry.get("title", "N/A")
-    authors = entry.get("authors", "N/A")
-    publication = entry.get("publication", "N/A")
-    link = entry.get("link", "#")
-
-    # 添加标题为超链接
-    add_hyperlink(info_paragraph, title, link)
-
-    # 插入作者
-    info_paragraph.add_run("\n" + authors).font.size = Pt(9)
-    # 插入发表信息
-    info_paragraph.add_run("\n" + publication).font.size = Pt(9)
-
-    # 第2列：引用次数（居中）
-    cited_by = str(entry.get("cite_num_within_time", 0))
-    row_cells[1].text = cited_by
-    for p in row_cells[1].paragraphs:
-        p.alignment = 1  # 居中对齐
-        for run in p.runs:
-            run.font.name = "Arial"
-            run.font.size = Pt(9)
-
-    # 第3列：负责人（居中）
-    row_cells[2].text = ""
-    for p in row_cells[2].paragraphs:
-        p.alignment = 1  # 居中对齐
-        for run in p.runs:
-            run.font.name = "Arial"
-            run.font.size = Pt(9)
-
-output_file_path = "2024年引用摘录分工_zlin.docx"
-doc.save(output_file_path)
-
-print(f"文档已保存到 {output_file_path}")
+HEADERS = ["论文", "引用数", "负责人"]
+
+
+def table_rows(data, assignees=None):
+    """(title, link, authors, publication, cite count, assignee) of each paper."""
+    if assignees is None:
+        assignees = [""] * len(data)
+    return [
+        (
+            entry.get("title", "N/A"),
+            entry.get("link", "#"),
+            entry.get("authors", "N/A"),
+            entry.get("publication", "N/A"),
+            str(entry.get("cite_num_within_time", 0)),
+            assignee,
+        )
+        for entry, assignee in zip(data, assignees)
+    ]
+
+
+def write_table_docx(output_file_path, heading, headers, rows):
+    doc = Document()
+
+    doc.add_heading(heading, level=1)
+
+    table = doc.add_table(rows=1, cols=3)
+    table.style = "Table Grid"
+
+    # ---- 将表格线改为虚线 ----
+    tbl = table._tbl
+    tblPr = tbl.tblPr
+    tblBorders = tblPr.first_child_found_in("w:tblBorders")
+
+    if tblBorders is None:
+        tblBorders = OxmlElement("w:tblBorders")
+        tblPr.append(tblBorders)
+
+    for border_name in ("top", "left", "bottom", "right", "insideH", "insideV"):
+        border_el = tblBorders.find(qn("w:%s" % border_name))
+        if border_el is None:
+            border_el = OxmlElement("w:%s" % border_name)
+            tblBorders.append(border_el)
+        # 设为虚线 (dotted)，线宽可根据需要进行调整
+        border_el.set(qn("w:val"), "dotted")
+        border_el.set(qn("w:sz"), "4")
+        border_el.set(qn("w:space"), "0")
+        border_el.set(qn("w:color"), "auto")
+    # ---- 虚线设置结束 ----
+
+    # 手动指定列宽
+    table.autofit = False
+    table.columns[0].width = Inches(5)
+    table.columns[1].width = Inches(0.7)
+    table.columns[2].width = Inches(0.7)
+
+    # 设置表头并居中
+    header_row = table.rows[0]
+    for i, header in enumerate(headers):
+        cell = header_row.cells[i]
+        cell.text = header
+        for paragraph in cell.paragraphs:
+            paragraph.alignment = 1  # 居中对齐
+
+    # 填充表格内容
+    for title, link, authors, publication, cited_by, assignee in rows:
+        row_cells = table.add_row().cells
+
+        # 第1列（信息）
+        info_cell = row_cells[0]
+        info_paragraph = info_cell.paragraphs[0]
+        info_paragraph.paragraph_format.line_spacing = Pt(12)  # 调小行距
+        info_paragraph.paragraph_format.space_before = Pt(0)
+        info_paragraph.paragraph_format.space_after = Pt(0)
+
+        # 添加标题为超链接
+        add_hyperlink(info_paragraph, title, link)
+
+        # 插入作者
+        info_paragraph.add_run("\n" + authors).font.size = Pt(9)
+        # 插入发表信息
+        info_paragraph.add_run("\n" + publication).font.size = Pt(9)
+
+        # 第2列：引用次数（居中）
+        row_cells[1].text = cited_by
+        for p in row_cells[1].paragraphs:
+            p.alignment = 1  # 居中对齐
+            for run in p.runs:
+                run.font.name = "Arial"
+                run.font.size = Pt(9)
+
+        # 第3列：负责人（居中）
+        row_cells[2].text = assignee
+        for p in row_cells[2].paragraphs:
+            p.alignment = 1  # 居中对齐
+            for run in p.runs:
+                run.font.name = "Arial"
+                run.font.size = Pt(9)
+
+    doc.save(output_file_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate the citation assignment table."
+    )
+    parser.add_argument(
+        "--author-info",
+        nargs="+",
+        default=None,
+        help="author_info JSON file(s) to include (default: every file in ./author_info).",
+    )
+    parser.add_argument(
+        "--members",
+        nargs="+",
+        default=None,
+        help="Team members to assign papers to, balancing the estimated workload. "
+        "Without it the 负责人 column is left empty.",
+    )
+    parser.add_argument(
+        "--year",
+        type=int,
+        default=time.localtime().tm_year,
+        help="Year shown in the heading and default output name.",
+    )
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="Output .docx path (default: <year>年引用摘录分工.docx).",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["python-docx", "ooxml"],
+        default="python-docx",
+        help="Word rendering engine, 'ooxml' writes the .docx directly (faster).",
+    )
+    args = parser.parse_args()
+
+    # 加载 JSON 数据
+    json_files = args.author_info or sorted(glob.glob("author_info/*.json"))
+    if not json_files:
+        print("No author_info files found, run step1_spider.py first.")
+        return
+    data = load_author_papers(json_files)
+
+    assignees = None
+    if args.members:
+        costs = estimate_costs(data)
+        assignees, loads = balance_assignment(costs, args.members)
+        for member, load in loads.items():
+            count = assignees.count(member)
+            print(f"{member}: {count} 篇论文, 预估工作量 {load:.0f}")
+
+    heading = f"{args.year}年引用摘录分工"
+    output_file_path = args.output or f"{args.year}年引用摘录分工.docx"
+    rows = table_rows(data, assignees)
+    if args.engine == "ooxml":
+        write_assignment_table(output_file_path, heading, HEADERS, rows)
+    else:
+        write_table_docx(output_file_path, heading, HEADERS, rows)
+
+    print(f"文档已保存到 {output_file_path}")
+
+
+if __name__ == "__main__":
+    main()
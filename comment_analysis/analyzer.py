@@ -1,20 +1,49 @@
 import os
+import hashlib
 import json
 import logging
+import threading
 import time
 import traceback
-import fitz  # PyMuPDF
+from collections import defaultdict
+from concurrent.futures import Future
 import openai
 import config
 from .citation_utils import (
     loadPaperInfo,
     extract_references,
     extract_citation_positions,
-    extract_citation_snippets,
+    citation_snippet_ranges,
+    normalize_output,
     validate_output,
+    validate_batch_output,
+    batch_citations,
     load_citation_info,
     PaperInfo,
+    SNIPPET_VERSION,
 )
+from . import prompts
+from .llm_executor import LLMExecutor, estimate_tokens, pack_batches
+from .multi_target import CitationTarget, MultiTargetMatcher
+from .prefetch import ANALYSIS_EXTRACT_JOBS, TextPrefetcher, list_analysis_pdfs
+from .preclassifier import LOCAL_ANALYSIS, PRECLASSIFIER, Preclassifier
+from .references import PARSER_VERSION, get_reference_index
+from .response_cache import get_response_cache, request_key
+from .result_log import ResultLog, replay, write_json_atomic
+from .text_cache import EXTRACTOR_VERSION, PdfTextCache, extract_text, get_text_cache
+
+# Version of the text, reference and snippet extraction; stored analyses made
+# with another one are redone
+EXTRACTION_VERSION = f"{EXTRACTOR_VERSION}.{PARSER_VERSION}.{SNIPPET_VERSION}"
+
+
+def same_source(a, b):
+    """Whether two fingerprints are of the same PDF, paper info and extraction."""
+    return all(a.get(key) == b.get(key) for key in ("Pdf", "PaperInfo", "Extractor"))
+
+
+class ResponseError(Exception):
+    """The model answered, but not with a complete response in the expected format."""
 
 
 class CitationAnalyzer:
@@ -25,18 +54,64 @@ class CitationAnalyzer:
             "completion_tokens": 0,
             "total_tokens": 0,
         }
+        self._usage_lock = threading.Lock()
+        # Responses taken from the response cache, and the tokens they had cost
+        self.response_cache = get_response_cache()
+        self.cache_hits = 0
+        self.cached_tokens = 0
+        self._paper_infos = {}
+        # paper_dir -> citing PDFs whose analysis is not complete and current
+        self._pending_pdfs = {}
+        # analysis_path -> stored analysis loaded by pending_pdfs, taken by
+        # analyze_paper_folder
+        self._loaded_analyses = {}
+        self._targets = {}
+        # Citing PDFs that are in several folders: sha256 -> [paper_dir]
+        self.shared_pdfs = {}
+        # (sha256, paper_dir) -> (reference_number, positions) found by the
+        # scan of another folder
+        self.position_memo = {}
+        self._hasher = get_text_cache() or PdfTextCache()
         # Initialize client here to reuse connection
         if self.config.api_key:
+            # Retries are done by the executor, within the rate limits
             self.client = openai.OpenAI(
-                api_key=self.config.api_key, base_url=self.config.base_url
+                api_key=self.config.api_key,
+                base_url=self.config.base_url,
+                max_retries=0,
             )
         else:
             self.client = None
             logging.warning(
                 "No API key provided for CitationAnalyzer. Analysis will fail if attempted."
             )
-
-    def json_model_query(self, system, user):
+        self.executor = LLMExecutor(self.config)
+        # Answers clearly non-positive snippets without a query
+        self.preclassifier = Preclassifier() if PRECLASSIFIER else None
+
+    def json_model_query(self, system, user, validate=validate_output):
+        """Validated JSON response to a request, from the response cache if possible."""
+        cache = self.response_cache
+        if not cache:
+            return self._query(system, user, validate)[0]
+
+        key = request_key(self.config, system, user)
+        with cache.lock(key):
+            entry = cache.get(key)
+            if entry:
+                with self._usage_lock:
+                    self.cache_hits += 1
+                    self.cached_tokens += (entry.get("usage") or {}).get(
+                        "total_tokens", 0
+                    )
+                logging.info(f"Response cache hit: {key}")
+                return entry["result"]
+            result, usage = self._query(system, user, validate)
+            cache.put(key, result, usage)
+            return result
+
+    def _query(self, system, user, validate):
+        """Send a request; returns the validated result and the token usage."""
         if not self.client:
             raise Exception("OpenAI client not initialized (missing API key?)")
 
@@ -46,30 +121,42 @@ class CitationAnalyzer:
         logging.info("Sending request with system message:\n %s", system)
         logging.info("Sending request with user message:\n %s", user)
 
-        response = self.client.chat.completions.create(
-            model=self.config.model,
-            messages=[
-                {"role": "system", "content": system},
-                {"role": "user", "content": user},
-            ],
-            response_format=self.config.response_format,
-            temperature=0.2,
+        response = self.executor.call(
+            lambda: self.client.chat.completions.create(
+                model=self.config.model,
+                messages=[
+                    {"role": "system", "content": system},
+                    {"role": "user", "content": user},
+                ],
+                response_format=self.config.response_format,
+                temperature=self.config.temperature,
+            ),
+            estimate_tokens(system, user),
         )
 
         # Log full response content from the model
         logging.info("Received response: %s", response.choices[0].message.content)
 
+        usage = None
         if response.usage:
-            self.total_tokens["prompt_tokens"] += response.usage.prompt_tokens
-            self.total_tokens["completion_tokens"] += response.usage.completion_tokens
-            self.total_tokens["total_tokens"] += response.usage.total_tokens
+            usage = {
+                "prompt_tokens": response.usage.prompt_tokens,
+                "completion_tokens": response.usage.completion_tokens,
+                "total_tokens": response.usage.total_tokens,
+            }
+            with self._usage_lock:
+                self.total_tokens["prompt_tokens"] += response.usage.prompt_tokens
+                self.total_tokens[
+                    "completion_tokens"
+                ] += response.usage.completion_tokens
+                self.total_tokens["total_tokens"] += response.usage.total_tokens
             logging.info(
                 f"Token usage for this request: Prompt: {response.usage.prompt_tokens}, "
                 f"Completion: {response.usage.completion_tokens}, Total: {response.usage.total_tokens}"
             )
 
         if response.choices[0].finish_reason != "stop":
-            raise Exception(
+            raise ResponseError(
                 f"OpenAI API response did not finish normally: {response.choices[0].finish_reason}"
             )
         try:
@@ -80,23 +167,92 @@ class CitationAnalyzer:
             if start_idx != -1 and end_idx != -1:
                 msg = msg[start_idx : end_idx + 1]
 
-            result = json.loads(msg)
             # Normalize keys if needed (case sensitivity)
-            if "citations" in result and "Citations" not in result:
-                result["Citations"] = []
-                for c in result["citations"]:
-                    new_c = {}
-                    new_c["Text"] = c.get("text", "")
-                    new_c["Analysis"] = c.get("analysis", "")
-                    new_c["Positive"] = c.get("positive", False)
-                    result["Citations"].append(new_c)
-
-            validate_output(result)
+            result = normalize_output(json.loads(msg))
+
+            validate(result)
         except Exception as e:
-            raise Exception(
+            raise ResponseError(
                 f"Parsing failed.\nResponse:\n{response.choices[0].message.content}\nMessage:\n{str(e)}"
             )
-        return result
+        return result, usage
+
+    def approach_name(self, paper_info):
+        if isinstance(paper_info.approach_name, list):
+            return ", 或者".join(paper_info.approach_name)
+        return paper_info.approach_name
+
+    def snippet_query(self, paper_info, reference_number, snippet):
+        """Analyze one snippet in its own request."""
+        user_prompt = self.config.user_prompt_template.format(
+            paper=paper_info.citation(),
+            reference_number=reference_number,
+            approach_name=self.approach_name(paper_info),
+            text=snippet,
+        )
+        return self.json_model_query(self.config.system_prompt, user_prompt)
+
+    def batch_query(self, paper_info, snippets):
+        """
+        Analyze [(reference_number, snippet)] in one request.
+        Returns one {"Citations": [...]} result per snippet, in order, or the
+        exception raised for that snippet.
+
+        Snippets whose item is missing or malformed in the response are
+        queried on their own. If the whole request fails, each half of the
+        batch is retried, down to single snippets.
+        """
+        user_prompt = prompts.batch_user_template.format(
+            paper=paper_info.citation(),
+            approach_name=self.approach_name(paper_info),
+            count=len(snippets),
+            snippets="\n".join(
+                prompts.batch_snippet_template.format(
+                    index=index, reference_number=reference_number, text=snippet
+                )
+                for index, (reference_number, snippet) in enumerate(snippets, start=1)
+            ),
+        )
+        try:
+            result = self.json_model_query(
+                self.config.system_prompt + prompts.batch_instructions,
+                user_prompt,
+                validate_batch_output,
+            )
+        except ResponseError as e:
+            if len(snippets) == 1:
+                logging.warning(f"Batched request failed, querying it alone: {e}")
+                return [self._single_result(paper_info, *snippets[0])]
+            half = len(snippets) // 2
+            logging.warning(
+                f"Batched request of {len(snippets)} snippets failed, "
+                f"retrying it as {half} + {len(snippets) - half}: {e}"
+            )
+            return self.batch_query(paper_info, snippets[:half]) + self.batch_query(
+                paper_info, snippets[half:]
+            )
+
+        by_index = batch_citations(result, len(snippets))
+        results = []
+        for index, (reference_number, snippet) in enumerate(snippets, start=1):
+            if index in by_index:
+                results.append({"Citations": by_index[index]})
+            else:
+                logging.warning(
+                    f"Snippet {index} of a batched request is missing or malformed, "
+                    "querying it alone"
+                )
+                results.append(
+                    self._single_result(paper_info, reference_number, snippet)
+                )
+        return results
+
+    def _single_result(self, paper_info, reference_number, snippet):
+        """snippet_query, returning the exception instead of raising it."""
+        try:
+            return self.snippet_query(paper_info, reference_number, snippet)
+        except Exception as e:
+            return e
 
     def pdf_to_text(self, pdf_path):
         """Extracts text from PDF without saving to disk."""
@@ -105,28 +261,18 @@ class CitationAnalyzer:
             return None
 
         try:
-            with fitz.open(pdf_path) as pdf_document:
-                text = ""
-                for page_num in range(len(pdf_document)):
-                    page = pdf_document.load_page(page_num)
-                    text += page.get_text()
-                logging.info(f"Extracted text from {pdf_path}")
-                return text
+            text = extract_text(pdf_path)
+            logging.info(f"Extracted text from {pdf_path}")
+            return text
         except Exception as e:
             logging.error(f"Error reading {pdf_path}: {e}")
             return None
 
-    def analyze_paper_folder(self, paper_dir):
-        """
-        Analyzes all citations for a given paper directory.
-        """
-        logging.info(f"Starting analysis for paper directory: {paper_dir}")
-
-        # Prepare output directory
-        analysis_output_dir = os.path.join(paper_dir, "comment_analysis")
-        os.makedirs(analysis_output_dir, exist_ok=True)
+    def load_paper_info(self, paper_dir):
+        """PaperInfo of the cited paper of a folder, loaded once per run."""
+        if paper_dir in self._paper_infos:
+            return self._paper_infos[paper_dir]
 
-        # Load target paper info
         paper_info = loadPaperInfo(paper_dir)
         if not paper_info:
             logging.warning(
@@ -154,9 +300,7 @@ class CitationAnalyzer:
                                     # Relaxed matching: check if dirname is contained in title (case-insensitive)
                                     # or if title is contained in dirname (handles cases where dirname has extra info)
                                     # Using simple inclusion for now as per "according to dirname"
-                                    if (
-                                        dirname == p_dirname
-                                    ):
+                                    if dirname == p_dirname:
                                         found_info = p
                                         break
                         except Exception as e:
@@ -201,6 +345,225 @@ class CitationAnalyzer:
                     publication=None,
                 )
 
+        self._paper_infos[paper_dir] = paper_info
+        return paper_info
+
+    def plan_shared_pdfs(self, paper_dirs):
+        """Find the citing PDFs that several folders have, by content hash."""
+        folders = defaultdict(list)
+        for paper_dir in paper_dirs:
+            for pdf_path in self.pending_pdfs(paper_dir):
+                dirs = folders[self._hasher.file_hash(pdf_path)]
+                if paper_dir not in dirs:
+                    dirs.append(paper_dir)
+        self.shared_pdfs = {sha: dirs for sha, dirs in folders.items() if len(dirs) > 1}
+        if self.shared_pdfs:
+            logging.info(
+                f"{len(self.shared_pdfs)} citing PDFs are shared between folders"
+            )
+
+    def target_of(self, paper_dir):
+        """CitationTarget of the cited paper of a folder."""
+        if paper_dir not in self._targets:
+            paper_info = self.load_paper_info(paper_dir)
+            self._targets[paper_dir] = CitationTarget(
+                paper_dir, paper_info.authors, paper_info.approach_name
+            )
+        return self._targets[paper_dir]
+
+    def reference_of(self, paper_info, pdf_path, paper_text):
+        """(reference_number, year) of the cited paper in a citing paper."""
+        # Identify references to target paper in the parsed bibliography,
+        # falling back to the title search when it cannot be segmented
+        reference = get_reference_index(pdf_path, paper_text).lookup(paper_info.title)
+        if reference:
+            reference_number = reference.label
+        else:
+            reference_number = extract_references(paper_info.title, paper_text)
+        # The bibliography entry gives the year for author-year citations
+        year = paper_info.year or (reference.year if reference else None)
+        return reference_number, year
+
+    def citation_positions(self, paper_dir, pdf_path, paper_text):
+        """
+        (reference_number, positions) of the citations of the paper of
+        paper_dir in a citing paper. A PDF shared with other folders is scanned
+        once for all their papers, and their results are kept until they
+        reach it.
+        """
+        sha = self._hasher.file_hash(pdf_path) if self.shared_pdfs else None
+        if (sha, paper_dir) in self.position_memo:
+            return self.position_memo.pop((sha, paper_dir))
+
+        if sha not in self.shared_pdfs:
+            paper_info = self.load_paper_info(paper_dir)
+            reference_number, year = self.reference_of(paper_info, pdf_path, paper_text)
+            positions = extract_citation_positions(
+                paper_text,
+                paper_info.authors,
+                year,
+                reference_number,
+                paper_info.approach_name,
+            )
+            return reference_number, positions
+
+        targets, params = [], {}
+        for other_dir in self.shared_pdfs[sha]:
+            targets.append(self.target_of(other_dir))
+            params[other_dir] = self.reference_of(
+                self.load_paper_info(other_dir), pdf_path, paper_text
+            )
+        results = MultiTargetMatcher(targets).scan(paper_text, params)
+        for other_dir in self.shared_pdfs[sha]:
+            if other_dir != paper_dir:
+                self.position_memo[(sha, other_dir)] = (
+                    params[other_dir][0],
+                    results[other_dir],
+                )
+        return params[paper_dir][0], results[paper_dir]
+
+    def paper_info_hash(self, paper_dir):
+        paper_info = self.load_paper_info(paper_dir)
+        data = json.dumps(
+            vars(paper_info), sort_keys=True, ensure_ascii=False, default=str
+        )
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def fingerprint(self, paper_dir, pdf_path, stored=None):
+        """
+        What the analysis of a citing PDF depends on: the PDF content, the info
+        of the cited paper and EXTRACTION_VERSION. The PDF hash of a stored
+        fingerprint is reused while the size and mtime of the PDF match.
+        """
+        stat = os.stat(pdf_path)
+        if (
+            stored
+            and stored.get("PdfSize") == stat.st_size
+            and stored.get("PdfMtimeNs") == stat.st_mtime_ns
+        ):
+            digest = stored.get("Pdf")
+        else:
+            digest = self._hasher.file_hash(pdf_path)
+        return {
+            "Pdf": digest,
+            "PdfSize": stat.st_size,
+            "PdfMtimeNs": stat.st_mtime_ns,
+            "PaperInfo": self.paper_info_hash(paper_dir),
+            "Extractor": EXTRACTION_VERSION,
+        }
+
+    def load_analysis(self, paper_dir, pdf_path, analysis_path):
+        """
+        The stored analysis of a citing PDF, or None. The result log of an
+        interrupted run is compacted into it first.
+        """
+        data = None
+        if os.path.exists(analysis_path):
+            try:
+                with open(analysis_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except Exception as e:
+                logging.warning(
+                    f"Failed to load existing analysis {analysis_path}: {e}"
+                )
+
+        log = ResultLog(analysis_path)
+        records = log.read()
+        if not records:
+            # Nothing usable, e.g. only a header cut short by a crash
+            log.remove()
+            return data
+        state = replay(data, records, same_source)
+        ranges = state.pop("SnippetRanges", None)
+        if ranges is not None:
+            # The offsets are into the text of the PDF the log was written for
+            current = self.fingerprint(paper_dir, pdf_path, state["Fingerprint"])
+            if not same_source(state["Fingerprint"], current):
+                logging.warning(f"Discarding result log of a changed PDF: {log.path}")
+                log.remove()
+                return data
+            paper_text = extract_text(pdf_path)
+            state["Snippets"] = [paper_text[start:end] for start, end in ranges]
+        write_json_atomic(analysis_path, state)
+        log.remove()
+        logging.info(f"Recovered {analysis_path} from its result log")
+        return state
+
+    def preclassifier_settings(self):
+        return self.preclassifier.settings() if self.preclassifier else None
+
+    def local_results_stale(self, data):
+        """Whether snippets of data were answered locally with other settings."""
+        return (
+            bool(data.get("LocallyAnalyzedSnippetIndices"))
+            and data.get("Preclassifier") != self.preclassifier_settings()
+        )
+
+    def is_current(self, existing_data, fingerprint):
+        """
+        Whether a stored analysis is complete, has the same fingerprint and
+        no snippet answered by the pre-classifier with other settings.
+        """
+        if not existing_data or not existing_data.get("Fingerprint"):
+            return False
+        if self.local_results_stale(existing_data):
+            return False
+        analyzed = set(existing_data.get("AnalyzedSnippetIndices", []))
+        return same_source(
+            existing_data["Fingerprint"], fingerprint
+        ) and analyzed.issuperset(range(1, len(existing_data.get("Snippets", [])) + 1))
+
+    def pending_pdfs(self, paper_dir):
+        """Citing PDFs of a folder that analyze_paper_folder will read, in order."""
+        if paper_dir not in self._pending_pdfs:
+            pending = []
+            for pdf_path in list_analysis_pdfs(paper_dir):
+                filename = os.path.splitext(os.path.basename(pdf_path))[0]
+                analysis_path = os.path.join(
+                    paper_dir, "comment_analysis", f"{filename}.json"
+                )
+                existing_data = self.load_analysis(paper_dir, pdf_path, analysis_path)
+                self._loaded_analyses[analysis_path] = existing_data
+                stored = existing_data.get("Fingerprint") if existing_data else None
+                fingerprint = self.fingerprint(paper_dir, pdf_path, stored)
+                if not self.is_current(existing_data, fingerprint):
+                    pending.append(pdf_path)
+            self._pending_pdfs[paper_dir] = pending
+        return self._pending_pdfs[paper_dir]
+
+    def save_analysis(self, pending, encountered_exceptions):
+        """Compact the results of a citing PDF into its analysis JSON."""
+        write_json_atomic(
+            pending["AnalysisPath"],
+            {
+                "Filename": pending["Filename"],
+                "PaperInfo": pending["Citation"].get("info", ""),
+                "Citations": pending["Citations"],
+                "AnalyzedSnippetIndices": list(pending["AnalyzedSnippetIndices"]),
+                "LocallyAnalyzedSnippetIndices": list(
+                    pending["LocallyAnalyzedSnippetIndices"]
+                ),
+                "Preclassifier": self.preclassifier_settings(),
+                "EncounteredExceptions": encountered_exceptions,
+                "Snippets": pending["Snippets"],
+                "Fingerprint": pending["Fingerprint"],
+            },
+        )
+
+    def analyze_paper_folder(self, paper_dir, prefetcher=None):
+        """
+        Analyzes all citations for a given paper directory.
+        If given, PDF texts are taken from a TextPrefetcher running ahead.
+        """
+        logging.info(f"Starting analysis for paper directory: {paper_dir}")
+
+        # Prepare output directory
+        analysis_output_dir = os.path.join(paper_dir, "comment_analysis")
+        os.makedirs(analysis_output_dir, exist_ok=True)
+
+        # Load target paper info
+        paper_info = self.load_paper_info(paper_dir)
+
         # Load citation list
         citation_info_path = os.path.join(paper_dir, "citation_info.json")
         if not os.path.exists(citation_info_path):
@@ -210,7 +573,11 @@ class CitationAnalyzer:
         with open(citation_info_path, "r", encoding="utf-8") as f:
             citations = json.load(f)
 
-        analyzed_results = []
+        # Queries of all citing papers are submitted first and run concurrently;
+        # their results are then written back in citation and snippet order
+        pending_citations = []
+        # Snippets left for batched requests: (queries, index, reference_number, snippet)
+        batch_items = []
 
         for i, citation in enumerate(citations):
             # Identify PDF file
@@ -220,93 +587,182 @@ class CitationAnalyzer:
 
             pdf_path = os.path.join(paper_dir, f"{filename}.pdf")
             analysis_path = os.path.join(analysis_output_dir, f"{filename}.json")
+            if not os.path.exists(pdf_path):
+                logging.warning(f"PDF not found: {pdf_path}")
+                continue
+
+            # Load existing analysis to resume/avoid re-analysis
+            if analysis_path in self._loaded_analyses:
+                existing_data = self._loaded_analyses.pop(analysis_path)
+            else:
+                existing_data = self.load_analysis(paper_dir, pdf_path, analysis_path)
+            stored = existing_data.get("Fingerprint") if existing_data else None
+            fingerprint = self.fingerprint(paper_dir, pdf_path, stored)
+            pending = {
+                "ID": i + 1,
+                "Citation": citation,
+                "Filename": filename,
+                "AnalysisPath": analysis_path,
+                "Fingerprint": fingerprint,
+                "Save": stored != fingerprint,
+                "Queries": [],
+            }
+            pending_citations.append(pending)
+
+            if self.is_current(existing_data, fingerprint):
+                # Fully analyzed with the same PDF, paper info and extraction
+                pending["Citations"] = existing_data.get("Citations", [])
+                if pending["Save"]:
+                    # Same content with a new size or mtime (touched, copied or
+                    # downloaded again): store them so it is not hashed again
+                    write_json_atomic(
+                        analysis_path, dict(existing_data, Fingerprint=fingerprint)
+                    )
+                continue
 
             # 1. Convert PDF to Text (In Memory)
-            paper_text = self.pdf_to_text(pdf_path)
+            if prefetcher:
+                paper_text = prefetcher.take(pdf_path)
+            else:
+                paper_text = self.pdf_to_text(pdf_path)
             if not paper_text:
+                pending_citations.pop()
                 continue
 
             # 2. Extract Snippets
-            # Identify references to target paper
-            reference_number = extract_references(paper_info.title, paper_text)
-
-            positions = extract_citation_positions(
-                paper_text,
-                paper_info.authors,
-                paper_info.year,
-                reference_number,
-                paper_info.approach_name,
+            reference_number, positions = self.citation_positions(
+                paper_dir, pdf_path, paper_text
             )
-            snippets = extract_citation_snippets(paper_text, positions)
-
-            # 3. Analyze Snippets
-            # Load existing analysis to resume/avoid re-analysis
+            pending["SnippetRanges"] = citation_snippet_ranges(paper_text, positions)
+            snippets = [
+                paper_text[start:end] for start, end in pending["SnippetRanges"]
+            ]
+            pending["Snippets"] = snippets
+
+            # Resume only the analysis of these same snippets: an analysis
+            # without fingerprint, of another PDF, paper info or extraction
+            # version, or of other snippets is started over
             citation_results = []
             analyzed_snippet_indices = set()
-            encountered_exceptions = []
-
-            if os.path.exists(analysis_path):
-                try:
-                    with open(analysis_path, "r", encoding="utf-8") as f:
-                        existing_data = json.load(f)
-                        analyzed_snippet_indices = set(
-                            existing_data.get("AnalyzedSnippetIndices", [])
-                        )
-                        citation_results = existing_data.get("Citations", [])
-                except Exception as e:
-                    logging.warning(
-                        f"Failed to load existing analysis for {filename}: {e}"
-                    )
-
-            updated = False
+            local_indices = set()
+            if (
+                stored
+                and same_source(stored, fingerprint)
+                and existing_data.get("Snippets") == snippets
+            ):
+                analyzed_snippet_indices = set(
+                    existing_data.get("AnalyzedSnippetIndices", [])
+                )
+                citation_results = existing_data.get("Citations", [])
+                local_indices = set(
+                    existing_data.get("LocallyAnalyzedSnippetIndices", [])
+                )
+                if self.local_results_stale(existing_data):
+                    # Queue the snippets answered locally again
+                    analyzed_snippet_indices -= local_indices
+                    local_indices = set()
+                    citation_results = [
+                        c
+                        for c in citation_results
+                        if c.get("Analysis") != LOCAL_ANALYSIS
+                    ]
+            pending["Citations"] = citation_results
+            pending["AnalyzedSnippetIndices"] = analyzed_snippet_indices
+            pending["LocallyAnalyzedSnippetIndices"] = local_indices
+            if existing_data and (
+                analyzed_snippet_indices
+                != set(existing_data.get("AnalyzedSnippetIndices", []))
+                or citation_results != existing_data.get("Citations", [])
+            ):
+                # The result log is replayed on top of the JSON file, which
+                # must not hold the dropped results
+                self.save_analysis(pending, [])
 
+            # 3. Analyze Snippets
+            queries = pending["Queries"]
             for index, snippet in enumerate(snippets, start=1):
                 if index in analyzed_snippet_indices:
                     continue
+                if self.preclassifier:
+                    result = self.preclassifier.classify(
+                        snippet, self.target_of(paper_dir), reference_number
+                    )
+                    if result:
+                        future = Future()
+                        future.set_result(result)
+                        queries.append((index, future, None))
+                        pending["LocallyAnalyzedSnippetIndices"].add(index)
+                        continue
+                if self.config.batch_size > 1:
+                    batch_items.append((queries, index, reference_number, snippet))
+                    continue
+
+                future = self.executor.submit(
+                    self.snippet_query, paper_info, reference_number, snippet
+                )
+                queries.append((index, future, None))
+
+        # Batches of consecutive snippets, across the citing papers of the folder
+        for batch in pack_batches(
+            [item[3] for item in batch_items],
+            self.config.batch_size,
+            self.config.batch_max_tokens,
+        ):
+            items = [batch_items[k] for k in batch]
+            future = self.executor.submit(
+                self.batch_query,
+                paper_info,
+                [
+                    (reference_number, snippet)
+                    for _, _, reference_number, snippet in items
+                ],
+            )
+            for slot, (queries, index, _, _) in enumerate(items):
+                queries.append((index, future, slot))
+
+        analyzed_results = []
+
+        for pending in pending_citations:
+            citation = pending["Citation"]
+            filename = pending["Filename"]
+            citation_results = pending["Citations"]
+            encountered_exceptions = []
 
-                user_prompt = self.config.user_prompt_template.format(
-                    paper=paper_info.citation(),
-                    reference_number=reference_number,
-                    approach_name=(
-                        ", 或者".join(paper_info.approach_name)
-                        if isinstance(paper_info.approach_name, list)
-                        else paper_info.approach_name
-                    ),
-                    text=snippet,
+            # Results are appended to the result log as they come, and
+            # compacted into the analysis JSON once the citing paper is done
+            log = ResultLog(pending["AnalysisPath"])
+            if "Snippets" in pending and (pending["Save"] or pending["Queries"]):
+                log.header(
+                    pending["Fingerprint"],
+                    pending["SnippetRanges"],
+                    self.preclassifier_settings(),
                 )
 
+            for index, future, slot in pending["Queries"]:
                 try:
-                    result = self.json_model_query(
-                        self.config.system_prompt, user_prompt
-                    )
+                    result = future.result()
+                    if slot is not None:
+                        result = result[slot]
+                        if isinstance(result, Exception):
+                            raise result
                     citation_results.extend(result["Citations"])
-                    analyzed_snippet_indices.add(index)
-                    updated = True
+                    pending["AnalyzedSnippetIndices"].add(index)
+                    log.result(
+                        index,
+                        result["Citations"],
+                        local=index in pending["LocallyAnalyzedSnippetIndices"],
+                    )
                     logging.info(f"Analyzed snippet {index} of {filename}")
                 except Exception as e:
                     logging.error(
                         f"Error analyzing snippet {index} of {filename}:\n{traceback.format_exc()}"
                     )
                     encountered_exceptions.append((index, str(e)))
+                    log.error(index, str(e))
 
-                # Save intermediate results (including Snippets inside)
-                if updated:
-                    with open(analysis_path, "w", encoding="utf-8") as f:
-                        json.dump(
-                            {
-                                "Filename": filename,
-                                "PaperInfo": citation.get("info", ""),
-                                "Citations": citation_results,
-                                "AnalyzedSnippetIndices": list(
-                                    analyzed_snippet_indices
-                                ),
-                                "EncounteredExceptions": encountered_exceptions,
-                                "Snippets": snippets,
-                            },
-                            f,
-                            ensure_ascii=False,
-                            indent=2,
-                        )
+            if log.written:
+                self.save_analysis(pending, encountered_exceptions)
+                log.remove()
 
             # Sort results by Positive=True first
             citation_results.sort(key=lambda x: not x["Positive"])
@@ -320,7 +776,7 @@ class CitationAnalyzer:
                 {
                     "Citations": citation_results,
                     "Paper": display_text,
-                    "ID": i + 1,
+                    "ID": pending["ID"],
                     "Filename": filename,
                 }
             )
@@ -345,7 +801,7 @@ class CitationAnalyzer:
         )
 
 
-def run_analysis(paper_list_dir=None):
+def run_analysis(paper_list_dir=None, analyzer=None):
     if paper_list_dir is None:
         paper_list_dir = config.PAPER_LIST_DIR
 
@@ -353,7 +809,7 @@ def run_analysis(paper_list_dir=None):
         print("Paper list directory not found.")
         return
 
-    analyzer = CitationAnalyzer()
+    analyzer = analyzer or CitationAnalyzer()
 
     paper_dirs = [
         os.path.join(paper_list_dir, d)
@@ -361,11 +817,31 @@ def run_analysis(paper_list_dir=None):
         if os.path.isdir(os.path.join(paper_list_dir, d))
     ]
 
-    for paper_dir in sorted(paper_dirs):
-        analyzer.analyze_paper_folder(paper_dir)
+    paper_dirs = sorted(paper_dirs)
+    analyzer.plan_shared_pdfs(paper_dirs)
+    if ANALYSIS_EXTRACT_JOBS > 0:
+        # Extract the PDFs of all folders in parallel ahead of the queries
+        pdf_paths = [
+            p for paper_dir in paper_dirs for p in analyzer.pending_pdfs(paper_dir)
+        ]
+        with TextPrefetcher(pdf_paths) as prefetcher:
+            for paper_dir in paper_dirs:
+                analyzer.analyze_paper_folder(paper_dir, prefetcher)
+    else:
+        for paper_dir in paper_dirs:
+            analyzer.analyze_paper_folder(paper_dir)
+
+    analyzer.executor.shutdown()
 
     logging.info(
         f"Total token usage for this run: Prompt: {analyzer.total_tokens['prompt_tokens']}, "
         f"Completion: {analyzer.total_tokens['completion_tokens']}, "
         f"Total: {analyzer.total_tokens['total_tokens']}"
     )
+    if analyzer.preclassifier:
+        logging.info(analyzer.preclassifier.report())
+    if analyzer.cache_hits:
+        logging.info(
+            f"Response cache: {analyzer.cache_hits} responses reused, "
+            f"{analyzer.cached_tokens} tokens saved"
+        )
@@ -0,0 +1,302 @@
+"""
+Offline benchmark of the citation analysis against comment_analysis.mock_server.
+
+Synthetic paper folders (paper_info.json, citation_info.json and citing PDFs
+with list, enumeration, neutral and positive citations) are written to a
+temporary directory and analyzed with run_analysis. Each pass reports
+snippets per second, p50/p99 request latency and tokens per snippet; passes
+after the first reuse the response cache of the first. The text cache is
+also kept in the temporary directory, so that runs do not fill the project's
+cache or reuse each other's extractions.
+
+    python -m comment_analysis.benchmark --papers 3 --citing 20 --latency lognormal:-0.7,0.5 \\
+        --concurrency 8 --batch-size 4 --passes 2
+"""
+
+import argparse
+import copy
+import json
+import logging
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+
+import config
+
+from .analyzer import CitationAnalyzer, run_analysis
+from .mock_server import MockChatServer
+from .preclassifier import Preclassifier
+from .response_cache import ResponseCache
+from .text_cache import PdfTextCache, set_text_cache
+
+WORDS = (
+    "model training data robust adversarial graph network method results accuracy "
+    "performance benchmark evaluation attack defense learning feature class sample "
+    "optimization gradient loss dataset baseline approach framework analysis"
+).split()
+CITATION_TEMPLATES = [
+    "Prior work on this problem includes [{others}, {ref}].",
+    "We compare against ALP [{a}], TRADES [{b}], {method} [{ref}] and MART [{c}].",
+    "{method} [{ref}] studies a related problem in a different setting.",
+    "{method} [{ref}] is a novel approach that significantly improves robustness.",
+    "We build on {method} [{ref}] to design our training objective.",
+]
+# Characters of filler between two citations, more than a snippet, so that
+# each citation is a snippet of its own
+CITATION_SPACING = 1500
+PAGE_CHARS = 3000
+
+
+def filler(rng, length):
+    words = []
+    size = 0
+    while size < length:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 18)))
+        words.append(sentence.capitalize() + ".")
+        size += len(sentence) + 2
+    return " ".join(words)
+
+
+def write_pdf(path, text):
+    with fitz.open() as pdf_document:
+        for start in range(0, len(text), PAGE_CHARS):
+            page = pdf_document.new_page()
+            page.insert_textbox(
+                page.rect + (36, 36, -36, -36),
+                text[start : start + PAGE_CHARS],
+                fontsize=6,
+            )
+        pdf_document.save(path)
+
+
+def write_synthetic_papers(paper_list_dir, papers, citing, citations_per_pdf=3, seed=0):
+    """Folders of `papers` cited papers with `citing` citing PDFs each."""
+    rng = random.Random(seed)
+    for p in range(papers):
+        method = f"Method{p}"
+        title = f"{method}: A Study of {' '.join(rng.choice(WORDS).capitalize() for _ in range(4))}"
+        authors = [f"Author{p} Surname{p}", "Second Author"]
+        paper_dir = os.path.join(paper_list_dir, f"paper_{p}")
+        os.makedirs(paper_dir, exist_ok=True)
+        with open(
+            os.path.join(paper_dir, "paper_info.json"), "w", encoding="utf-8"
+        ) as f:
+            json.dump(
+                {
+                    "authors": authors,
+                    "title": title,
+                    "year": 2023,
+                    "approach_name": method,
+                    "publication": "Synthetic Conference",
+                },
+                f,
+                ensure_ascii=False,
+            )
+
+        citations = []
+        for c in range(citing):
+            ref = rng.randint(5, 40)
+            parts = [filler(rng, CITATION_SPACING)]
+            for _ in range(citations_per_pdf):
+                template = rng.choice(CITATION_TEMPLATES)
+                parts.append(
+                    template.format(
+                        method=method,
+                        ref=ref,
+                        others=f"{ref - 4}-{ref - 1}",
+                        a=ref - 3,
+                        b=ref - 2,
+                        c=ref + 1,
+                    )
+                )
+                parts.append(filler(rng, CITATION_SPACING))
+            references = [
+                f"[{n}] Other Author. Unrelated Paper Number {n}. Venue, 2020."
+                for n in range(1, 46)
+            ]
+            references[ref - 1] = (
+                f"[{ref}] {', '.join(authors)}. {title}. Synthetic Conference, 2023."
+            )
+            text = " ".join(parts) + "\nReferences\n" + "\n".join(references)
+
+            filename = f"citing_{p}_{c}"
+            write_pdf(os.path.join(paper_dir, f"{filename}.pdf"), text)
+            citations.append(
+                {
+                    "filename": filename,
+                    "title": f"Citing paper {c}",
+                    "info": "Synthetic, 2024.",
+                }
+            )
+        with open(
+            os.path.join(paper_dir, "citation_info.json"), "w", encoding="utf-8"
+        ) as f:
+            json.dump(citations, f, ensure_ascii=False)
+
+
+class TimedAnalyzer(CitationAnalyzer):
+    """CitationAnalyzer recording the latency of each request, retries included."""
+
+    def __init__(self, model_config):
+        super().__init__(model_config)
+        self.latencies = []
+
+    def _query(self, system, user, validate):
+        start = time.perf_counter()
+        try:
+            return super()._query(system, user, validate)
+        finally:
+            with self._usage_lock:
+                self.latencies.append(time.perf_counter() - start)
+
+
+def count_snippets(paper_list_dir):
+    """(analyzed snippets, snippets) in the analysis files of all folders."""
+    analyzed = total = 0
+    for paper in os.listdir(paper_list_dir):
+        analysis_dir = os.path.join(paper_list_dir, paper, "comment_analysis")
+        if not os.path.isdir(analysis_dir):
+            continue
+        for name in os.listdir(analysis_dir):
+            if name.endswith(".json") and name != "all_snippets.json":
+                with open(os.path.join(analysis_dir, name), "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                analyzed += len(data.get("AnalyzedSnippetIndices", []))
+                total += len(data.get("Snippets", []))
+    return analyzed, total
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def run_pass(
+    paper_list_dir, model_config, response_cache, preclassifier_threshold=None
+):
+    """Analyze all folders from scratch; returns the statistics of the pass."""
+    for paper in os.listdir(paper_list_dir):
+        shutil.rmtree(
+            os.path.join(paper_list_dir, paper, "comment_analysis"), ignore_errors=True
+        )
+
+    analyzer = TimedAnalyzer(model_config)
+    analyzer.response_cache = response_cache
+    if preclassifier_threshold is not None:
+        analyzer.preclassifier = Preclassifier(preclassifier_threshold)
+    start = time.perf_counter()
+    run_analysis(paper_list_dir, analyzer)
+    elapsed = time.perf_counter() - start
+
+    analyzed, total = count_snippets(paper_list_dir)
+    tokens = analyzer.total_tokens
+    return {
+        "snippets": total,
+        "analyzed": analyzed,
+        "seconds": elapsed,
+        "snippets_per_second": analyzed / elapsed if elapsed else 0.0,
+        "requests": len(analyzer.latencies),
+        "p50": percentile(analyzer.latencies, 50),
+        "p99": percentile(analyzer.latencies, 99),
+        "prompt_tokens_per_snippet": tokens["prompt_tokens"] / max(1, analyzed),
+        "completion_tokens_per_snippet": tokens["completion_tokens"] / max(1, analyzed),
+        "cache_hits": analyzer.cache_hits,
+        "local": analyzer.preclassifier.skipped if analyzer.preclassifier else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the analysis against a mock server."
+    )
+    parser.add_argument("--papers", type=int, default=2, help="Cited paper folders")
+    parser.add_argument("--citing", type=int, default=10, help="Citing PDFs per folder")
+    parser.add_argument(
+        "--citations", type=int, default=3, help="Citations per citing PDF"
+    )
+    parser.add_argument(
+        "--latency", default="uniform:0.2,0.6", help="See mock_server --latency"
+    )
+    parser.add_argument(
+        "--rate-limit", type=float, default=0.0, help="Probability of a 429"
+    )
+    parser.add_argument(
+        "--truncate", type=float, default=0.0, help='Probability of "length"'
+    )
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--rpm", type=int, default=0, help="Requests per minute limit")
+    parser.add_argument("--tpm", type=int, default=0, help="Tokens per minute limit")
+    parser.add_argument(
+        "--preclassifier", type=float, help="Pre-classifier threshold (default: off)"
+    )
+    parser.add_argument(
+        "--passes", type=int, default=2, help="Passes (2nd+ hit the cache)"
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Disable the response cache"
+    )
+    parser.add_argument(
+        "--keep", action="store_true", help="Keep the synthetic folders"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    random.seed(args.seed)
+    root = tempfile.mkdtemp(prefix="citegen_bench_")
+    paper_list_dir = os.path.join(root, "paper_list")
+    server = MockChatServer(
+        latency=args.latency, rate_limit=args.rate_limit, truncate=args.truncate
+    )
+    server.start()
+    text_cache = set_text_cache(PdfTextCache(os.path.join(root, "pdf_text")))
+    try:
+        print(
+            f"Writing {args.papers} x {args.citing} synthetic citing papers to {root}"
+        )
+        write_synthetic_papers(
+            paper_list_dir, args.papers, args.citing, args.citations, args.seed
+        )
+
+        model_config = copy.copy(config.ANALYSIS_MODEL)
+        model_config.api_key = "mock"
+        model_config.base_url = server.base_url
+        model_config.pause_seconds = 0
+        model_config.max_concurrency = args.concurrency
+        model_config.batch_size = args.batch_size
+        model_config.requests_per_minute = args.rpm
+        model_config.tokens_per_minute = args.tpm
+        response_cache = (
+            None if args.no_cache else ResponseCache(os.path.join(root, "responses"))
+        )
+
+        for n in range(1, args.passes + 1):
+            stats = run_pass(
+                paper_list_dir, model_config, response_cache, args.preclassifier
+            )
+            print(
+                f"Pass {n}: {stats['analyzed']}/{stats['snippets']} snippets in "
+                f"{stats['seconds']:.1f}s ({stats['snippets_per_second']:.2f} snippets/s), "
+                f"{stats['requests']} requests, latency p50 {stats['p50']:.2f}s "
+                f"p99 {stats['p99']:.2f}s, tokens/snippet: prompt "
+                f"{stats['prompt_tokens_per_snippet']:.0f} completion "
+                f"{stats['completion_tokens_per_snippet']:.0f}, cache hits "
+                f"{stats['cache_hits']}, answered locally {stats['local']}"
+            )
+        print(f"Mock server: {server.stats}")
+    finally:
+        server.shutdown()
+        set_text_cache(text_cache)
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,10 @@ import json
 import os
 import time
 import re
-from fuzzywuzzy import fuzz
 import jsonschema
 
+from .title_locator import locate_title
+
 
 class PaperInfo:
     def __init__(self, authors, approach_name, title, year, publication):
@@ -77,27 +78,17 @@ def extract_references(title, paper_text):
         # print("No references section found.")
         reference_start = 0
 
-    # Sliding window to find the title in the references section
+    # Find the title in the references section
     window_size = len(title)
-    max_similarity = 0
-    match_position = -1
 
     # Optimize search range: assume references are at the end, search last 30% if text is long
     start_search = reference_start
     if start_search == 0 and len(paper_text) > 10000:
         start_search = int(len(paper_text) * 0.7)
 
-    for i in range(start_search, len(paper_text) - window_size + 1):
-        window_text = paper_text[i : i + window_size]
-        # Quick check first char match to speed up? No, fuzzy matching handles it.
-        # But for large text, fuzz is slow.
-        # Let's trust the original implementation for now, but be aware of performance.
-        # Original: search from reference_start.
-        similarity = fuzz.ratio(title.lower(), window_text.lower())
-
-        if similarity > max_similarity:
-            max_similarity = similarity
-            match_position = i
+    # Same result as sliding a len(title) window scored with fuzz.ratio over
+    # every position, but only scores the regions the title n-grams point to
+    match_position, max_similarity = locate_title(title, paper_text, start_search)
 
     if max_similarity < 80:  # Threshold
         return None
@@ -178,6 +169,63 @@ def extract_references(title, paper_text):
     return reference_number
 
 
+NUMERIC_CITATION_PATTERN = r"\[([0-9\,\-\–\s\[\]]+)\]"
+
+
+def parse_numeric_citation(group):
+    """Cited number ranges [(first, last)] of a bracket like "[3, 5-7][9]"."""
+    elements = (
+        group.replace(" ", "")
+        .replace("][", ",")
+        .replace("]-[", "-")
+        .replace("]–[", "–")
+        .split(",")
+    )
+    ranges = []
+    for elem in elements:
+        if "-" in elem or "–" in elem:
+            parts = re.split(r"[-–]", elem)
+            if len(parts) != 2:
+                continue
+            try:
+                ranges.append((int(parts[0].strip()), int(parts[1].strip())))
+            except ValueError:
+                continue
+        else:
+            try:
+                num = int(elem.strip())
+            except ValueError:
+                continue
+            ranges.append((num, num))
+    return ranges
+
+
+def author_citation_pattern(authors, year):
+    """Regex of "Surname et al. (year)" style citations, or None."""
+    if not (authors and year):
+        return None
+    # Ensure authors is a list
+    if isinstance(authors, str):
+        authors = [authors]
+
+    surnames = [name.split()[-1] for name in authors]
+    if not surnames:
+        return None
+    separator = r"(?:\s+and\s+|\s*&\s*|\s*,\s*|\s+)"
+    author_pattern = rf"(?P<name0>{surnames[0]}){separator}+"
+    for i in range(1, len(surnames)):
+        author_pattern += rf"((?P<name{i}>{surnames[i]}){separator}+)?"
+    author_pattern += (
+        rf"(?P<etal>et\s+al\.?)?\s*(,\s*)?(?:\(\s*{year}\s*\)|{year}|\[\s*{year}\s*\])"
+    )
+    return author_pattern
+
+
+# Bump when citation positions or snippets change, so that analyses stored
+# with other snippets are redone
+SNIPPET_VERSION = "1"
+
+
 def extract_citation_positions(
     paper_text, authors, year, reference_number=None, methodNames=[]
 ):
@@ -185,64 +233,23 @@ def extract_citation_positions(
 
     # Match numeric citations
     if reference_number is not None:
-        numeric_pattern = r"\[([0-9\,\-\–\s\[\]]+)\]"
-        numeric_matches = re.finditer(numeric_pattern, paper_text)
+        numeric_matches = re.finditer(NUMERIC_CITATION_PATTERN, paper_text)
         for match in numeric_matches:
-            elements = (
-                match.group(1)
-                .replace(" ", "")
-                .replace("][", ",")
-                .replace("]-[", "-")
-                .replace("]–[", "–")
-                .split(",")
-            )
-            found = False
-            for elem in elements:
-                if "-" in elem or "–" in elem:
-                    parts = re.split(r"[-–]", elem)
-                    if len(parts) != 2:
-                        continue
-                    try:
-                        start_num = int(parts[0].strip())
-                        end_num = int(parts[1].strip())
-                    except ValueError:
-                        continue
-                    if start_num <= reference_number <= end_num:
-                        found = True
-                        break
-                else:
-                    try:
-                        num = int(elem.strip())
-                    except ValueError:
-                        continue
-                    if num == reference_number:
-                        found = True
-                        break
-            if found:
+            ranges = parse_numeric_citation(match.group(1))
+            if any(first <= reference_number <= last for first, last in ranges):
                 results.append((match.start(), match.end()))
 
     # Match author and year citations
-    if authors and year:
-        # Ensure authors is a list
-        if isinstance(authors, str):
-            authors = [authors]
-
-        surnames = [name.split()[-1] for name in authors]
-        if surnames:
-            separator = r"(?:\s+and\s+|\s*&\s*|\s*,\s*|\s+)"
-            author_pattern = rf"(?P<name0>{surnames[0]}){separator}+"
-            for i in range(1, len(surnames)):
-                author_pattern += rf"((?P<name{i}>{surnames[i]}){separator}+)?"
-            author_pattern += rf"(?P<etal>et\s+al\.?)?\s*(,\s*)?(?:\(\s*{year}\s*\)|{year}|\[\s*{year}\s*\])"
-
-            try:
-                author_regex = re.compile(author_pattern, re.IGNORECASE)
-                for match in author_regex.finditer(paper_text):
-                    # Basic check to ensure we matched something valid
-                    # If using grouped regex, ensure we aren't matching empty strings inadvertently
-                    results.append((match.start(), match.end()))
-            except re.error:
-                pass  # Pattern compilation failed
+    author_pattern = author_citation_pattern(authors, year)
+    if author_pattern:
+        try:
+            author_regex = re.compile(author_pattern, re.IGNORECASE)
+            for match in author_regex.finditer(paper_text):
+                # Basic check to ensure we matched something valid
+                # If using grouped regex, ensure we aren't matching empty strings inadvertently
+                results.append((match.start(), match.end()))
+        except re.error:
+            pass  # Pattern compilation failed
 
     # Match method name citations
     if methodNames:
@@ -262,7 +269,8 @@ def extract_citation_positions(
     return results
 
 
-def extract_citation_snippets(paper_text, citation_positions):
+def citation_snippet_ranges(paper_text, citation_positions):
+    """(start, end) offsets in paper_text of the snippets around the citations."""
     snippet_length = 1000
     snippets = []
     for start, end in citation_positions:
@@ -281,31 +289,115 @@ def extract_citation_snippets(paper_text, citation_positions):
                 max(merged_snippets[-1][1], snippet[1]),
             )
 
-    snippet_strings = [paper_text[start:end] for start, end in merged_snippets]
+    return merged_snippets
+
+
+def extract_citation_snippets(paper_text, citation_positions):
+    snippet_ranges = citation_snippet_ranges(paper_text, citation_positions)
+    snippet_strings = [paper_text[start:end] for start, end in snippet_ranges]
     return snippet_strings
 
 
+# One citation sentence of a model response
+CITATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "Text": {"type": "string"},
+        "Analysis": {"type": "string"},
+        "Positive": {"type": "boolean"},
+    },
+    "required": ["Text", "Analysis", "Positive"],
+    "additionalProperties": False,
+}
+
+# One snippet of the response to a batched request
+BATCH_ITEM_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "Index": {"type": "integer"},
+        "Citations": {"type": "array", "items": CITATION_SCHEMA},
+    },
+    "required": ["Index", "Citations"],
+    "additionalProperties": False,
+}
+
+
+def normalize_citations(result):
+    """Rename the lowercase keys some models answer with, in place."""
+    if "citations" in result and "Citations" not in result:
+        result["Citations"] = []
+        for c in result.pop("citations"):
+            new_c = {}
+            new_c["Text"] = c.get("text", "")
+            new_c["Analysis"] = c.get("analysis", "")
+            new_c["Positive"] = c.get("positive", False)
+            result["Citations"].append(new_c)
+    return result
+
+
+def normalize_output(result):
+    """normalize_citations on a response, or on each snippet of a batched one."""
+    if not isinstance(result, dict):
+        return result
+    if "snippets" in result and "Snippets" not in result:
+        result["Snippets"] = result.pop("snippets")
+    if isinstance(result.get("Snippets"), list):
+        for item in result["Snippets"]:
+            if isinstance(item, dict):
+                if "index" in item and "Index" not in item:
+                    item["Index"] = item.pop("index")
+                normalize_citations(item)
+        return result
+    return normalize_citations(result)
+
+
 def validate_output(json_result):
     schema = {
         "$schema": "http://json-schema.org/draft-07/schema#",
         "type": "object",
-        "properties": {
-            "Citations": {
-                "type": "array",
-                "items": {
-                    "type": "object",
-                    "properties": {
-                        "Text": {"type": "string"},
-                        "Analysis": {"type": "string"},
-                        "Positive": {"type": "boolean"},
-                    },
-                    "required": ["Text", "Analysis", "Positive"],
-                    "additionalProperties": False,
-                },
-            }
-        },
+        "properties": {"Citations": {"type": "array", "items": CITATION_SCHEMA}},
         "required": ["Citations"],
         "additionalProperties": False,
     }
 
     jsonschema.validate(instance=json_result, schema=schema)
+
+
+def validate_batch_output(json_result):
+    """
+    Validate the envelope of the output of a batched request. The snippets
+    themselves are checked one by one by batch_citations, so that one bad
+    item does not discard the others.
+    """
+    schema = {
+        "$schema": "http://json-schema.org/draft-07/schema#",
+        "type": "object",
+        "properties": {"Snippets": {"type": "array"}},
+        "required": ["Snippets"],
+        "additionalProperties": False,
+    }
+
+    jsonschema.validate(instance=json_result, schema=schema)
+
+
+def batch_citations(json_result, count):
+    """
+    {index: citations} of the valid snippets of a batched output, for the
+    indices 1..count. Malformed items, other indices and indices given
+    more than once are left out.
+    """
+    by_index = {}
+    repeated = set()
+    for item in json_result["Snippets"]:
+        try:
+            jsonschema.validate(instance=item, schema=BATCH_ITEM_SCHEMA)
+        except jsonschema.ValidationError:
+            continue
+        index = item["Index"]
+        if index in by_index:
+            repeated.add(index)
+        elif 1 <= index <= count:
+            by_index[index] = item["Citations"]
+    for index in repeated:
+        by_index.pop(index, None)
+    return by_index
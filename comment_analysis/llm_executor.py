@@ -0,0 +1,139 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import openai
+
+# Backoff between retries: BACKOFF_BASE * 2^attempt seconds with jitter, at most BACKOFF_MAX
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+
+def estimate_tokens(*texts):
+    """Rough token count of prompt texts (Chinese is about one token per character)."""
+    return sum(len(text) for text in texts) // 2 + 1
+
+
+def pack_batches(texts, max_count, max_tokens):
+    """
+    Split texts, in order, into batches of at most max_count texts and
+    max_tokens estimated tokens (a longer text is a batch of its own).
+    Returns lists of indices into texts.
+    """
+    batches, batch, tokens = [], [], 0
+    for i, text in enumerate(texts):
+        size = estimate_tokens(text)
+        if batch and (len(batch) == max_count or tokens + size > max_tokens):
+            batches.append(batch)
+            batch, tokens = [], 0
+        batch.append(i)
+        tokens += size
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def is_retryable(error):
+    """Rate limiting, server errors and connection failures are worth a retry."""
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, openai.APIConnectionError)
+
+
+def retry_after(error):
+    """Delay requested by the server in a Retry-After header, or None."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Allows `per_minute` units per minute, in bursts of at most one minute's worth."""
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1):
+        """Wait until `amount` units are available and take them."""
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def adjust(self, amount):
+        """Take (or give back, if negative) units without waiting."""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class LLMExecutor:
+    """
+    Runs model queries in a thread pool of model_config.max_concurrency workers.
+    call() applies the requests-per-minute and tokens-per-minute limits of the
+    model and retries rate limited and failed requests with exponential backoff.
+    """
+
+    def __init__(self, model_config):
+        self.max_retries = model_config.max_retries
+        self.pool = ThreadPoolExecutor(max_workers=max(1, model_config.max_concurrency))
+        rpm = model_config.requests_per_minute
+        tpm = model_config.tokens_per_minute
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+
+    def submit(self, fn, *args):
+        """Run fn(*args) in the pool; returns a Future."""
+        return self.pool.submit(fn, *args)
+
+    def call(self, request, estimated_tokens):
+        """
+        Send request() within the rate limits; its response.usage corrects the
+        token estimate. Returns the response or raises the last error.
+        """
+        for attempt in range(self.max_retries + 1):
+            if self.requests:
+                self.requests.acquire()
+            if self.tokens:
+                self.tokens.acquire(estimated_tokens)
+            try:
+                response = request()
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                delay = retry_after(e)
+                if delay is None:
+                    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt)
+                    delay *= random.uniform(0.5, 1.0)
+                logging.warning(
+                    f"Request failed ({e.__class__.__name__}), retry {attempt + 1}/"
+                    f"{self.max_retries} in {delay:.1f}s"
+                )
+                time.sleep(delay)
+                continue
+            if self.tokens and getattr(response, "usage", None):
+                self.tokens.adjust(response.usage.total_tokens - estimated_tokens)
+            return response
+
+    def shutdown(self):
+        self.pool.shutdown()
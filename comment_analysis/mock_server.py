@@ -0,0 +1,267 @@
+"""
+Local stand-in for an OpenAI-compatible chat completions API, to run the
+analysis offline (see comment_analysis.benchmark).
+
+Responses follow the prompts' output format: scripted contents, cycled in
+order, or by default a heuristic answer that extracts the sentences citing
+the reference number and marks those with praise words as positive.
+Latency, HTTP 429 rate limiting and truncated responses
+(finish_reason "length") can be injected.
+
+    python -m comment_analysis.mock_server --port 8000 --latency uniform:0.5,2 --rate-limit 0.05
+
+then set base_url="http://127.0.0.1:8000" (any api_key) in the ModelConfig.
+"""
+
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .citation_utils import NUMERIC_CITATION_PATTERN, parse_numeric_citation
+from .llm_executor import estimate_tokens
+from .preclassifier import POSITIVE_CUES_RE, USAGE_CUES_RE, split_sentences
+
+REFERENCE_RE = re.compile(r"引用编号：\[([^\]]*)\]")
+BATCH_SNIPPET_RE = re.compile(r"^### 文本 (\d+)\n", re.MULTILINE)
+
+
+def parse_latency(spec):
+    """
+    A latency sampler from "fixed:S", "uniform:A,B", "normal:MU,SIGMA" or
+    "lognormal:MU,SIGMA" (seconds; lognormal parameters of the log).
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda: max(0.0, random.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(values[0], values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def heuristic_citations(text, reference_number):
+    """Citations of reference_number in text, as the prompts ask for."""
+    try:
+        number = int(reference_number)
+    except (TypeError, ValueError):
+        number = None
+    citations = []
+    for sentence in split_sentences(text):
+        cited = number is not None and any(
+            first <= number <= last
+            for match in re.finditer(NUMERIC_CITATION_PATTERN, sentence)
+            for first, last in parse_numeric_citation(match.group(1))
+        )
+        if not cited:
+            continue
+        positive = bool(
+            POSITIVE_CUES_RE.search(sentence) or USAGE_CUES_RE.search(sentence)
+        )
+        citations.append(
+            {
+                "Text": " ".join(sentence.split()),
+                "Analysis": (
+                    "称赞或参考了被引论文。" if positive else "仅作为相关工作提及。"
+                ),
+                "Positive": positive,
+            }
+        )
+    return citations
+
+
+def heuristic_response(user):
+    """Response to a single or batched user prompt."""
+    starts = list(BATCH_SNIPPET_RE.finditer(user))
+    if not starts:
+        match = REFERENCE_RE.search(user)
+        text = user.split("待分析文本：", 1)[-1]
+        return {
+            "Citations": heuristic_citations(text, match.group(1) if match else None)
+        }
+
+    snippets = []
+    for i, start in enumerate(starts):
+        end = starts[i + 1].start() if i + 1 < len(starts) else len(user)
+        section = user[start.end() : end]
+        match = REFERENCE_RE.search(section)
+        text = section[match.end() :] if match else section
+        snippets.append(
+            {
+                "Index": int(start.group(1)),
+                "Citations": heuristic_citations(
+                    text, match.group(1) if match else None
+                ),
+            }
+        )
+    return {"Snippets": snippets}
+
+
+class MockChatServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address=("127.0.0.1", 0),
+        latency="fixed:0",
+        rate_limit=0.0,
+        truncate=0.0,
+        script=None,
+    ):
+        super().__init__(address, MockChatHandler)
+        self.sample_latency = parse_latency(latency)
+        # Probabilities of answering 429 and of cutting the response short
+        self.rate_limit = rate_limit
+        self.truncate = truncate
+        self.script = itertools.cycle(script) if script else None
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "rate_limited": 0, "truncated": 0}
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def next_content(self, user):
+        if self.script:
+            with self.lock:
+                content = next(self.script)
+            return (
+                content
+                if isinstance(content, str)
+                else json.dumps(content, ensure_ascii=False)
+            )
+        return json.dumps(heuristic_response(user), ensure_ascii=False)
+
+    def start(self):
+        """Serve in a background thread; returns the thread."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+class MockChatHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        server = self.server
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        server.count("requests")
+        time.sleep(server.sample_latency())
+
+        if random.random() < server.rate_limit:
+            server.count("rate_limited")
+            self._send_json(
+                429,
+                {
+                    "error": {
+                        "message": "Rate limit reached",
+                        "type": "rate_limit_error",
+                    }
+                },
+                {"Retry-After": "1"},
+            )
+            return
+
+        messages = request.get("messages", [])
+        user = next((m["content"] for m in messages if m.get("role") == "user"), "")
+        content = server.next_content(user)
+        finish_reason = "stop"
+        if random.random() < server.truncate:
+            server.count("truncated")
+            content = content[: len(content) // 2]
+            finish_reason = "length"
+
+        prompt_tokens = estimate_tokens(*(m.get("content", "") for m in messages))
+        completion_tokens = estimate_tokens(content)
+        self._send_json(
+            200,
+            {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "mock"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": finish_reason,
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            },
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI chat completions server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--latency",
+        default="fixed:0",
+        help='"fixed:S", "uniform:A,B", "normal:MU,SIGMA" or "lognormal:MU,SIGMA" seconds',
+    )
+    parser.add_argument(
+        "--rate-limit", type=float, default=0.0, help="Probability of a 429"
+    )
+    parser.add_argument(
+        "--truncate",
+        type=float,
+        default=0.0,
+        help='Probability of finish_reason "length"',
+    )
+    parser.add_argument(
+        "--script", help="JSON file with a list of response contents, returned in turn"
+    )
+    args = parser.parse_args()
+
+    script = None
+    if args.script:
+        with open(args.script, "r", encoding="utf-8") as f:
+            script = json.load(f)
+    server = MockChatServer(
+        (args.host, args.port), args.latency, args.rate_limit, args.truncate, script
+    )
+    print(f"Mock chat completions server at {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(server.stats)
+
+
+if __name__ == "__main__":
+    main()
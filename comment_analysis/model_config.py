@@ -8,6 +8,13 @@ class ModelConfig:
         system_prompt,
         user_prompt_template,
         response_format,
+        temperature=0.2,
+        max_concurrency=4,
+        requests_per_minute=0,
+        tokens_per_minute=0,
+        max_retries=5,
+        batch_size=1,
+        batch_max_tokens=4000,
     ):
         self.api_key = api_key
         self.base_url = base_url
@@ -16,4 +23,15 @@ class ModelConfig:
         self.system_prompt = system_prompt
         self.user_prompt_template = user_prompt_template
         self.response_format = response_format
-
+        self.temperature = temperature
+        # Queries in flight at once
+        self.max_concurrency = max_concurrency
+        # Rate limits of the API account (0: unlimited)
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        # Retries on rate limiting (429), server errors (5xx) and connection errors
+        self.max_retries = max_retries
+        # Snippets analyzed per request (1: one request per snippet), and the
+        # estimated tokens of snippet text a batch may hold
+        self.batch_size = batch_size
+        self.batch_max_tokens = batch_max_tokens
@@ -0,0 +1,145 @@
+"""
+Citation positions of several cited papers in one pass over a citing paper.
+
+A citing PDF often appears under several paper_list folders. Instead of
+running extract_citation_positions once per target, MultiTargetMatcher scans
+the numeric brackets of the text once for all targets, and finds the
+occurrences of every first-author surname and method name with plain string
+search on the lowercased text; each target's own pattern is only tried at
+those positions. The positions are the same as extract_citation_positions
+gives for each target.
+"""
+
+import re
+
+from .citation_utils import (
+    NUMERIC_CITATION_PATTERN,
+    author_citation_pattern,
+    parse_numeric_citation,
+)
+
+# Characters that re.IGNORECASE matches to an ASCII letter but str.lower()
+# does not map to it (dotless i, long s)
+_CASE_EQUIVALENTS = ("ı", "ſ")
+
+
+def _literal(pattern):
+    """Lowercase form of an ASCII pattern without regex syntax, else None."""
+    if pattern and pattern.isascii() and re.escape(pattern) == pattern:
+        return pattern.lower()
+    return None
+
+
+class CitationTarget:
+    """A cited paper; its author regex is compiled once per year."""
+
+    def __init__(self, key, authors, approach_name):
+        self.key = key
+        self.authors = authors
+        if isinstance(approach_name, str):
+            approach_name = [approach_name]
+        self.method_names = [name for name in approach_name or [] if name]
+        self.methods = [
+            (re.compile(re.escape(name), re.IGNORECASE), _literal(re.escape(name)))
+            for name in self.method_names
+        ]
+        # Every author citation starts with the surname of the first author
+        author_list = [authors] if isinstance(authors, str) else authors
+        try:
+            self.author_anchor = (
+                _literal(author_list[0].split()[-1]) if author_list else None
+            )
+        except IndexError:
+            self.author_anchor = None
+        self._author_regexes = {}
+
+    def __repr__(self):
+        return f"CitationTarget(key={self.key})"
+
+    def author_regex(self, year):
+        """Compiled author-year pattern, or None (no authors/year or invalid)."""
+        if year not in self._author_regexes:
+            pattern = author_citation_pattern(self.authors, year)
+            regex = None
+            if pattern:
+                try:
+                    regex = re.compile(pattern, re.IGNORECASE)
+                except re.error:
+                    pass  # Pattern compilation failed
+            self._author_regexes[year] = regex
+        return self._author_regexes[year]
+
+
+class _AnchorIndex:
+    """Occurrences of literals in a lowercased text, computed once per literal."""
+
+    def __init__(self, text):
+        low = text.lower()
+        usable = len(low) == len(text) and not any(c in text for c in _CASE_EQUIVALENTS)
+        self.low = low if usable else None
+        self._positions = {}
+
+    def positions(self, literal):
+        if literal not in self._positions:
+            found = []
+            p = self.low.find(literal)
+            while p != -1:
+                found.append(p)
+                p = self.low.find(literal, p + 1)
+            self._positions[literal] = found
+        return self._positions[literal]
+
+
+def _find_all(regex, text, anchors, literal):
+    """Same matches as regex.finditer(text), only tried where literal occurs."""
+    if anchors.low is None or literal is None:
+        return [(m.start(), m.end()) for m in regex.finditer(text)]
+    found, end = [], 0
+    for pos in anchors.positions(literal):
+        # finditer does not return overlapping matches
+        if pos < end:
+            continue
+        match = regex.match(text, pos)
+        if match and match.end() > pos:
+            found.append((pos, match.end()))
+            end = match.end()
+    return found
+
+
+class MultiTargetMatcher:
+    """Find the citations of several targets in a text with shared scans."""
+
+    def __init__(self, targets):
+        self.targets = targets
+
+    def scan(self, text, params):
+        """
+        params maps target key to (reference_number, year) for this text.
+        Returns {key: sorted [(start, end)]}, as extract_citation_positions.
+        """
+        results = {t.key: [] for t in self.targets}
+
+        numbered = [
+            (t.key, params[t.key][0])
+            for t in self.targets
+            if params[t.key][0] is not None
+        ]
+        if numbered:
+            for match in re.finditer(NUMERIC_CITATION_PATTERN, text):
+                ranges = parse_numeric_citation(match.group(1))
+                for key, number in numbered:
+                    if any(first <= number <= last for first, last in ranges):
+                        results[key].append((match.start(), match.end()))
+
+        anchors = _AnchorIndex(text)
+        for t in self.targets:
+            positions = results[t.key]
+            author_regex = t.author_regex(params[t.key][1])
+            if author_regex:
+                positions.extend(
+                    _find_all(author_regex, text, anchors, t.author_anchor)
+                )
+            for regex, literal in t.methods:
+                positions.extend(_find_all(regex, text, anchors, literal))
+            positions.sort(key=lambda x: x[0])
+        return results
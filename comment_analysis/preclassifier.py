@@ -0,0 +1,316 @@
+"""
+Local pre-classifier for citation snippets.
+
+Most snippets only cite the target paper in a list ("[1, 18-25]") or an
+enumeration of baselines, which the model always judges as not positive.
+Preclassifier finds the sentences of a snippet that cite the target and
+scores them with a linear model over features taken from the criteria of
+the prompts (list citations, praise, building on the work, criticism).
+A snippet whose citing sentences are all confidently not positive is
+answered locally, without a model query.
+
+The weights below are hand set. `python -m comment_analysis.preclassifier
+train [paper_list_dir]` fits them on the labels of past analyses
+(comment_analysis/all_snippets.json) and saves them to PRECLASSIFIER_MODEL;
+`report` shows how many labeled citations would be skipped.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import sys
+
+import config
+
+from .citation_utils import NUMERIC_CITATION_PATTERN, parse_numeric_citation
+
+# Answer confidently non-positive snippets locally
+PRECLASSIFIER = getattr(config, "PRECLASSIFIER", False)
+# Minimum probability of "not positive" for every citing sentence of a snippet
+PRECLASSIFIER_THRESHOLD = getattr(config, "PRECLASSIFIER_THRESHOLD", 0.95)
+# Weights fitted by `python -m comment_analysis.preclassifier train`, if present
+PRECLASSIFIER_MODEL = getattr(
+    config, "PRECLASSIFIER_MODEL", "./.cache/preclassifier.json"
+)
+
+# Bump when the features or the rules change, so that snippets answered
+# locally are classified again
+PRECLASSIFIER_VERSION = "1"
+
+LOCAL_ANALYSIS = "本地预分类判定为非正面引用（如列举式引用），未调用大模型。"
+
+SENTENCE_END_RE = re.compile(
+    r"(?<!\bal\.)(?<!\be\.g\.)(?<!\bi\.e\.)(?<=[.!?])\s+(?=[A-Z\[(])"
+)
+# Parenthesized author-year citations, "(Sun et al., 2023; Lee, 2019)"
+AUTHOR_YEAR_GROUP_RE = re.compile(r"\(([^()]*?(?:19|20)\d{2}[^()]*)\)")
+POSITIVE_CUES_RE = re.compile(
+    r"\b(novel|first to|for the first time|pioneer\w*|seminal|significant\w*|"
+    r"remarkabl\w*|impressive\w*|excellent|outstanding|effective\w*|promising|powerful|"
+    r"state[- ]of[- ]the[- ]art|superior|successful\w*|elegant\w*|notabl\w*|well[- ]known)\b",
+    re.IGNORECASE,
+)
+USAGE_CUES_RE = re.compile(
+    r"\b(we|our)\b[^.]{0,40}\b(use[ds]?|adopt\w*|(?<!the )follow\w*|buil[dt]\w*|extend\w*|"
+    r"appl\w*|leverag\w*|employ\w*|inherit\w*|borrow\w*)\b|"
+    r"\b(based on|built (on|upon)|inspired by|motivated by|extends?)\b",
+    re.IGNORECASE,
+)
+CONTRAST_CUES_RE = re.compile(
+    r"\b(however|but|although|unlike|limit\w*|fail\w*|suffer\w*|cannot|unable|drawback\w*)\b",
+    re.IGNORECASE,
+)
+
+FEATURES = [
+    "list_citation",  # the citing bracket or group holds 3+ references
+    "pair_citation",  # ... exactly 2
+    "enumeration",  # 3+ separate citations in the sentence
+    "positive_cues",
+    "usage_cues",
+    "contrast_cues",
+    "method_named",
+]
+# Logit of "positive" derived from the prompts: lists and enumerations are
+# never positive, praise and building on the work are
+RULE_WEIGHTS = {
+    "list_citation": -2.5,
+    "pair_citation": -0.8,
+    "enumeration": -3.0,
+    "positive_cues": 2.5,
+    "usage_cues": 2.5,
+    "contrast_cues": -0.5,
+    "method_named": 0.5,
+}
+RULE_BIAS = -1.0
+
+
+def split_sentences(text):
+    return [s for s in SENTENCE_END_RE.split(text) if s.strip()]
+
+
+def _citation_groups(sentence):
+    """Sizes of the numeric and author-year citation groups of a sentence."""
+    sizes = []
+    for match in re.finditer(NUMERIC_CITATION_PATTERN, sentence):
+        ranges = parse_numeric_citation(match.group(1))
+        if ranges:
+            sizes.append(sum(last - first + 1 for first, last in ranges))
+    for match in AUTHOR_YEAR_GROUP_RE.finditer(sentence):
+        sizes.append(match.group(1).count(";") + 1)
+    return sizes
+
+
+def sentence_features(sentence, group_size=None, method_named=False):
+    """
+    Feature values of a citing sentence. group_size is the number of
+    references cited together with the target, the largest group if unknown.
+    """
+    sizes = _citation_groups(sentence)
+    if group_size is None:
+        group_size = max(sizes, default=1)
+    return {
+        "list_citation": 1.0 if group_size >= 3 else 0.0,
+        "pair_citation": 1.0 if group_size == 2 else 0.0,
+        "enumeration": 1.0 if len(sizes) >= 3 else 0.0,
+        "positive_cues": float(min(2, len(POSITIVE_CUES_RE.findall(sentence)))),
+        "usage_cues": 1.0 if USAGE_CUES_RE.search(sentence) else 0.0,
+        "contrast_cues": 1.0 if CONTRAST_CUES_RE.search(sentence) else 0.0,
+        "method_named": 1.0 if method_named else 0.0,
+    }
+
+
+class LinearModel:
+    """Logistic model of the probability that a citing sentence is positive."""
+
+    def __init__(self, weights, bias):
+        self.weights = weights
+        self.bias = bias
+
+    def positive_probability(self, features):
+        z = self.bias + sum(
+            self.weights.get(name, 0.0) * value for name, value in features.items()
+        )
+        return 1 / (1 + math.exp(-z))
+
+    def to_dict(self):
+        return {"weights": self.weights, "bias": self.bias}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["weights"], data["bias"])
+
+
+def load_model(path=PRECLASSIFIER_MODEL):
+    """The trained model at path, or the hand set rule weights."""
+    if path and os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return LinearModel.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Ignoring broken pre-classifier model {path}: {e}")
+    return LinearModel(dict(RULE_WEIGHTS), RULE_BIAS)
+
+
+def train(samples, epochs=300, learning_rate=0.5, l2=0.01):
+    """
+    Fit a LinearModel on [(sentence, positive)] by gradient descent, starting
+    from the rule weights.
+    """
+    model = LinearModel(dict(RULE_WEIGHTS), RULE_BIAS)
+    data = [
+        (sentence_features(text), 1.0 if positive else 0.0)
+        for text, positive in samples
+    ]
+    if not data:
+        return model
+    for _ in range(epochs):
+        grad = dict.fromkeys(FEATURES, 0.0)
+        grad_bias = 0.0
+        for features, label in data:
+            error = model.positive_probability(features) - label
+            grad_bias += error
+            for name in FEATURES:
+                grad[name] += error * features[name]
+        model.bias -= learning_rate * grad_bias / len(data)
+        for name in FEATURES:
+            model.weights[name] -= learning_rate * (
+                grad[name] / len(data) + l2 * model.weights[name]
+            )
+    return model
+
+
+def load_labeled_sentences(paper_list_dir):
+    """[(text, positive)] of the citations in past analyses."""
+    samples = []
+    for paper in sorted(os.listdir(paper_list_dir)):
+        path = os.path.join(
+            paper_list_dir, paper, "comment_analysis", "all_snippets.json"
+        )
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            for citing_paper in json.load(f):
+                for citation in citing_paper.get("Citations", []):
+                    if citation.get("Analysis") != LOCAL_ANALYSIS:
+                        samples.append((citation["Text"], citation["Positive"]))
+    return samples
+
+
+class Preclassifier:
+    """Answers the snippets whose citations of the target are clearly not positive."""
+
+    def __init__(self, threshold=PRECLASSIFIER_THRESHOLD, model=None):
+        self.threshold = threshold
+        self.model = model or load_model()
+        self.checked = 0
+        self.skipped = 0
+
+    def settings(self):
+        """What the local answers depend on, stored with the analyses."""
+        model = json.dumps(self.model.to_dict(), sort_keys=True)
+        return {
+            "Version": PRECLASSIFIER_VERSION,
+            "Threshold": self.threshold,
+            "Model": hashlib.sha256(model.encode("utf-8")).hexdigest(),
+        }
+
+    def citing_sentences(self, snippet, target, reference_number):
+        """
+        [(sentence, features)] of the sentences citing target, and whether the
+        target was found at all (also counting bibliography entries).
+        """
+        author_re = (
+            re.compile(rf"\b{re.escape(target.author_anchor)}\b")
+            if target.author_anchor
+            else None
+        )
+        found = False
+        sentences = []
+        for sentence in split_sentences(snippet):
+            low = sentence.lower()
+            method_named = any(name.lower() in low for name in target.method_names)
+            cited = bibliography = False
+            group_size = None
+            for match in re.finditer(NUMERIC_CITATION_PATTERN, sentence):
+                ranges = parse_numeric_citation(match.group(1))
+                if reference_number is None or not any(
+                    first <= reference_number <= last for first, last in ranges
+                ):
+                    continue
+                # "[20] Yican Sun, ..." at the start of a line is the bibliography entry
+                line_start = sentence.rfind("\n", 0, match.start()) + 1
+                if sentence[line_start : match.start()].strip():
+                    cited = True
+                    group_size = sum(last - first + 1 for first, last in ranges)
+                else:
+                    bibliography = True
+                break
+            if bibliography:
+                found = True
+                continue
+            if not (cited or method_named or (author_re and author_re.search(low))):
+                continue
+            found = True
+            sentences.append(
+                (sentence, sentence_features(sentence, group_size, method_named))
+            )
+        return sentences, found
+
+    def classify(self, snippet, target, reference_number):
+        """A local {"Citations": [...]} result, or None if the model should decide."""
+        self.checked += 1
+        sentences, found = self.citing_sentences(snippet, target, reference_number)
+        if not found:
+            return None
+        for _, features in sentences:
+            if 1 - self.model.positive_probability(features) < self.threshold:
+                return None
+        self.skipped += 1
+        return {
+            "Citations": [
+                {
+                    "Text": " ".join(sentence.split()),
+                    "Analysis": LOCAL_ANALYSIS,
+                    "Positive": False,
+                }
+                for sentence, _ in sentences
+            ]
+        }
+
+    def report(self):
+        rate = self.skipped / self.checked * 100 if self.checked else 0.0
+        return f"Pre-classifier: {self.skipped} of {self.checked} snippets ({rate:.1f}%) answered locally"
+
+
+def evaluate(model, samples, threshold=PRECLASSIFIER_THRESHOLD):
+    """(skipped, positives skipped) among labeled [(sentence, positive)]."""
+    skipped = wrong = 0
+    for text, positive in samples:
+        if 1 - model.positive_probability(sentence_features(text)) >= threshold:
+            skipped += 1
+            wrong += bool(positive)
+    return skipped, wrong
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "report"
+    paper_list_dir = sys.argv[2] if len(sys.argv) > 2 else config.PAPER_LIST_DIR
+    samples = load_labeled_sentences(paper_list_dir)
+    if command == "train":
+        model = train(samples)
+        os.makedirs(os.path.dirname(PRECLASSIFIER_MODEL) or ".", exist_ok=True)
+        with open(PRECLASSIFIER_MODEL, "w", encoding="utf-8") as f:
+            json.dump(model.to_dict(), f, indent=2)
+        print(f"Trained on {len(samples)} citations, saved to {PRECLASSIFIER_MODEL}")
+    else:
+        model = load_model()
+    skipped, wrong = evaluate(model, samples)
+    positives = sum(1 for _, positive in samples if positive)
+    print(
+        f"{len(samples)} labeled citations ({positives} positive): "
+        f"{skipped} would be skipped at threshold {PRECLASSIFIER_THRESHOLD}, "
+        f"{wrong} of them positive"
+    )
@@ -0,0 +1,95 @@
+import json
+import logging
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import config
+
+from .text_cache import PdfTextCache, extract_text, get_text_cache, set_text_cache
+
+# Worker processes extracting PDF text ahead of the LLM queries (0: inline)
+ANALYSIS_EXTRACT_JOBS = getattr(config, "ANALYSIS_EXTRACT_JOBS", os.cpu_count() or 1)
+# Maximum number of PDFs extracted ahead; bounds the texts held in memory
+PREFETCH_WINDOW = getattr(config, "PREFETCH_WINDOW", 2 * ANALYSIS_EXTRACT_JOBS)
+
+
+def list_analysis_pdfs(paper_dir):
+    """Citing PDFs of a folder, in the order analyze_paper_folder reads them."""
+    citation_info_path = os.path.join(paper_dir, "citation_info.json")
+    if not os.path.exists(citation_info_path):
+        return []
+    with open(citation_info_path, "r", encoding="utf-8") as f:
+        citations = json.load(f)
+    pdf_paths = []
+    for citation in citations:
+        filename = citation.get("filename")
+        if not filename:
+            continue
+        pdf_path = os.path.join(paper_dir, f"{filename}.pdf")
+        if os.path.exists(pdf_path):
+            pdf_paths.append(pdf_path)
+    return pdf_paths
+
+
+def _init_worker(cache_dir, max_bytes):
+    """Use the text cache of the parent process, which may not be the default."""
+    set_text_cache(PdfTextCache(cache_dir, max_bytes))
+
+
+def _extract(pdf_path):
+    try:
+        return extract_text(pdf_path)
+    except Exception as e:
+        logging.error(f"Error reading {pdf_path}: {e}")
+        return None
+
+
+class TextPrefetcher:
+    """
+    Extract the text of a known sequence of PDFs in a process pool, keeping
+    at most `window` extractions queued or finished but not yet taken.
+    take() must be called in the same order as pdf_paths; a path that is not
+    next in the sequence is extracted inline instead.
+    """
+
+    def __init__(self, pdf_paths, jobs=ANALYSIS_EXTRACT_JOBS, window=PREFETCH_WINDOW):
+        self.pending = iter(pdf_paths)
+        self.window = max(1, window)
+        self.queue = deque()
+        text_cache = get_text_cache()
+        if text_cache:
+            self.pool = ProcessPoolExecutor(
+                max_workers=jobs,
+                initializer=_init_worker,
+                initargs=(text_cache.cache_dir, text_cache.max_bytes),
+            )
+        else:
+            self.pool = ProcessPoolExecutor(max_workers=jobs)
+        self._fill()
+
+    def _fill(self):
+        while len(self.queue) < self.window:
+            pdf_path = next(self.pending, None)
+            if pdf_path is None:
+                return
+            self.queue.append((pdf_path, self.pool.submit(_extract, pdf_path)))
+
+    def take(self, pdf_path):
+        """Text of pdf_path (None if it cannot be read)."""
+        if not self.queue or self.queue[0][0] != pdf_path:
+            return _extract(pdf_path)
+        _, future = self.queue.popleft()
+        self._fill()
+        return future.result()
+
+    def close(self):
+        for _, future in self.queue:
+            future.cancel()
+        self.pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
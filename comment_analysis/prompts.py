@@ -1,3 +1,7 @@
+# Bump when the prompts or the parsing of responses change, so that cached
+# responses are not reused
+PROMPT_VERSION = "1"
+
 long_system = """用户将提供给你一段某篇论文（称为“引用论文”）中的待分析文本和另一篇论文（称为“被引论文”）的信息，请从文本中提取引用被引论文的句子，并分析这些句子是否正面评价了被引论文。接下来用一个例子说明什么样的句子引用了被引论文，什么样的句子对被引论文进行了正面评价。
 
 ## 示例被引论文信息
@@ -149,3 +153,39 @@ user_template = """* 论文信息：{paper}
 * 待分析文本：
 {text}
 """
+
+# Batched mode (ModelConfig.batch_size > 1): appended to the system prompt
+batch_instructions = """
+## 多段文本
+本次输入包含多段编号的待分析文本，各段可能来自不同的引用论文，每段单独给出其中被引论文的引用编号。请对每段文本分别按上述要求提取和分析，不要混用不同段落的内容。
+请按照如下JSON格式输出，每段文本对应一项，Index为文本编号，所有编号都必须出现：
+{
+    "Snippets": [
+        {
+            "Index": 1,
+            "Citations": [
+                {
+                    "Text": "提取的句子",
+                    "Analysis": "对句子是否是正面评价的分析",
+                    "Positive": true
+                }
+            ]
+        },
+        {
+            "Index": 2,
+            "Citations": []
+        }
+    ]
+}
+"""
+
+batch_user_template = """* 论文信息：{paper}
+* 方法名称：{approach_name}
+* 待分析文本（共{count}段）：
+{snippets}
+"""
+
+batch_snippet_template = """### 文本 {index}
+* 引用编号：[{reference_number}]
+{text}
+"""
@@ -0,0 +1,241 @@
+"""
+Reference list parser.
+
+parse_references() segments the bibliography of a paper once into entries
+(numeric label or none, authors, year, text). The ReferenceIndex is cached
+next to the PDF's text in the text cache, so each cited paper only costs a
+lookup over the entries, and author-year bibliographies without numeric
+labels are handled as well.
+"""
+
+import json
+import logging
+import os
+import re
+
+from fuzzywuzzy import fuzz
+
+from .text_cache import get_text_cache
+
+# Bump when parsing changes, so that cached indices are rebuilt
+PARSER_VERSION = "1"
+INDEX_SUFFIX = f".refs{PARSER_VERSION}.json"
+
+REFERENCE_HEADERS = ["References", "Bibliography", "Works Cited", "参考文献"]
+# Numbering styles: "[12] ...", "12. ..." and "12" alone on its line
+LABEL_PATTERNS = [
+    re.compile(r"^\s*\[\s*(\d{1,4})\s*\]", re.MULTILINE),
+    re.compile(r"^\s*(\d{1,4})\s*\.\s", re.MULTILINE),
+    re.compile(r"^\s*(\d{1,4})\s*$", re.MULTILINE),
+]
+# Start of an author-year entry: "Surname, I." / "Surname, Given" / "Given Surname",
+# the first word capitalized or a name particle
+AUTHOR_START_RE = re.compile(r"^[^\W\d_][\w'’\-]*\.?,?\s+(?:[A-Z]\.|[^\W\d_][\w'’\-]+)")
+NAME_PARTICLES = ("van ", "von ", "de ", "del ", "di ", "le ", "la ")
+# End of the author list in numeric entries: a period that does not follow an initial
+AUTHORS_END_RE = re.compile(r"(?<!\b[A-Z])\.\s")
+YEAR_RE = re.compile(r"\b((?:19|20)\d{2})[a-z]?\b")
+# Longest text kept for an entry (the last one runs to the end of the paper)
+MAX_ENTRY_CHARS = 1000
+# Minimum fuzz.partial_ratio between a title and an entry
+TITLE_MATCH_THRESHOLD = 80
+
+
+def normalize(text):
+    """Lowercase, join words hyphenated across lines, keep letters and digits."""
+    text = re.sub(r"-\s*\n\s*", "", text.lower())
+    return " ".join(re.findall(r"[^\W_]+", text))
+
+
+def find_reference_section(text):
+    """Offset of the last references header, or None."""
+    for header in REFERENCE_HEADERS:
+        matches = list(
+            re.finditer(rf"^\s*{header}\s*$", text, re.IGNORECASE | re.MULTILINE)
+        )
+        if matches:
+            return matches[-1].start()
+    return None
+
+
+class ReferenceEntry:
+    """One bibliography entry."""
+
+    def __init__(self, label, authors, year, text, start):
+        # Numeric label, or None in author-year bibliographies
+        self.label = label
+        self.authors = authors
+        self.year = year
+        self.text = text
+        # Offset of the entry in the paper text
+        self.start = start
+        self.normalized = normalize(text)
+
+    def __repr__(self):
+        return f"ReferenceEntry(label={self.label}, year={self.year}, text={self.text[:60]!r})"
+
+    def to_dict(self):
+        return {
+            "label": self.label,
+            "authors": self.authors,
+            "year": self.year,
+            "text": self.text,
+            "start": self.start,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data["label"], data["authors"], data["year"], data["text"], data["start"]
+        )
+
+    @classmethod
+    def from_text(cls, label, text, start):
+        text = text.strip()[:MAX_ENTRY_CHARS]
+        body = re.sub(r"^\s*(\[\s*\d+\s*\]|\d+\s*\.?)\s*", "", text) if label else text
+        year_match = YEAR_RE.search(body)
+        year = int(year_match.group(1)) if year_match else None
+        # Authors come first, up to the year (author-year) or the first sentence end
+        end_match = AUTHORS_END_RE.search(body)
+        end = end_match.start() if end_match else 0
+        if year_match and (not end_match or year_match.start() < end):
+            end = year_match.start()
+        authors = " ".join(body[:end].split()).strip(" ,(")
+        return cls(label, authors, year, text, start)
+
+
+def _numeric_labels(section, pattern):
+    """The longest run of labels 1, 2, 3... in order: [(label, offset)]."""
+    expected, run = 1, []
+    for match in pattern.finditer(section):
+        label = int(match.group(1))
+        if label == expected:
+            run.append((label, match.start()))
+            expected += 1
+        elif label == 1 and len(run) < 3:
+            # A stray "1." before the list started
+            run, expected = [(1, match.start())], 2
+    return run
+
+
+def _author_year_starts(section):
+    """Offsets of the lines that start an author-year entry."""
+    starts, offset, current = [], 0, ""
+    for line in section.splitlines(keepends=True):
+        stripped = line.strip()
+        # A new entry starts with an author once the previous one has its year
+        # and ends a sentence
+        is_author = stripped[:1].isupper() or stripped.startswith(NAME_PARTICLES)
+        if (
+            is_author
+            and AUTHOR_START_RE.match(stripped)
+            and (
+                not starts
+                or (YEAR_RE.search(current) and current.rstrip().endswith("."))
+            )
+        ):
+            starts.append(offset)
+            current = ""
+        current += line
+        offset += len(line)
+    return starts
+
+
+class ReferenceIndex:
+    """The parsed bibliography of a paper."""
+
+    def __init__(self, style, section_start, entries):
+        # "numeric", "author-year" or "none"
+        self.style = style
+        self.section_start = section_start
+        self.entries = entries
+
+    def __repr__(self):
+        return f"ReferenceIndex(style={self.style}, entries={len(self.entries)})"
+
+    def lookup(self, title, threshold=TITLE_MATCH_THRESHOLD):
+        """The entry that best contains title, or None below threshold."""
+        target = normalize(title)
+        if not target:
+            return None
+        best, best_score = None, threshold - 1
+        for entry in self.entries:
+            if len(entry.normalized) < len(target) * 0.8:
+                continue
+            score = fuzz.partial_ratio(target, entry.normalized)
+            if score > best_score:
+                best, best_score = entry, score
+        return best
+
+    def to_dict(self):
+        return {
+            "style": self.style,
+            "section_start": self.section_start,
+            "entries": [entry.to_dict() for entry in self.entries],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data["style"],
+            data["section_start"],
+            [ReferenceEntry.from_dict(e) for e in data["entries"]],
+        )
+
+
+def parse_references(text):
+    """Segment the bibliography of a paper into a ReferenceIndex."""
+    section_start = find_reference_section(text)
+    if section_start is None:
+        # Same assumption as extract_references: references are at the end
+        section_start = int(len(text) * 0.7) if len(text) > 10000 else 0
+    section = text[section_start:]
+
+    runs = [_numeric_labels(section, pattern) for pattern in LABEL_PATTERNS]
+    labels = max(runs, key=len)
+    if len(labels) >= 3:
+        bounds = [offset for _, offset in labels] + [len(section)]
+        entries = [
+            ReferenceEntry.from_text(
+                label, section[bounds[i] : bounds[i + 1]], section_start + bounds[i]
+            )
+            for i, (label, _) in enumerate(labels)
+        ]
+        return ReferenceIndex("numeric", section_start, entries)
+
+    starts = _author_year_starts(section)
+    if len(starts) >= 3:
+        bounds = starts + [len(section)]
+        entries = [
+            ReferenceEntry.from_text(
+                None, section[bounds[i] : bounds[i + 1]], section_start + bounds[i]
+            )
+            for i in range(len(starts))
+        ]
+        return ReferenceIndex("author-year", section_start, entries)
+
+    return ReferenceIndex("none", section_start, [])
+
+
+def get_reference_index(pdf_path, text):
+    """ReferenceIndex of a PDF, cached next to its text when the cache is on."""
+    text_cache = get_text_cache()
+    if not text_cache:
+        return parse_references(text)
+
+    digest = text_cache.file_hash(pdf_path)
+    path = text_cache.entry_path(digest, INDEX_SUFFIX)
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                index = ReferenceIndex.from_dict(json.load(f))
+            os.utime(path)
+            return index
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Discarding broken reference index {path}: {e}")
+
+    index = parse_references(text)
+    text_cache.put_file(
+        path, json.dumps(index.to_dict(), ensure_ascii=False).encode("utf-8")
+    )
+    return index
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import config
+
+from .prompts import PROMPT_VERSION
+
+RESPONSE_CACHE_DIR = getattr(config, "RESPONSE_CACHE_DIR", "./.cache/llm_responses")
+# Reuse validated model responses for identical requests across runs
+RESPONSE_CACHE = getattr(config, "RESPONSE_CACHE", True)
+
+
+def request_key(model_config, system, user):
+    """SHA-256 of everything that determines the response to a request."""
+    payload = json.dumps(
+        {
+            "prompt_version": PROMPT_VERSION,
+            "base_url": model_config.base_url,
+            "model": model_config.model,
+            "temperature": model_config.temperature,
+            "response_format": model_config.response_format,
+            "system": system,
+            "user": user,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    On-disk cache of validated model responses, one JSON file per request key
+    holding the result, its token usage and when it was stored.
+    """
+
+    def __init__(self, cache_dir=RESPONSE_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def lock(self, key):
+        """Lock held while a key is queried, so identical requests are sent once."""
+        with self._locks_lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get(self, key):
+        """The cached entry of a key, or None."""
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            if entry.get("prompt_version") == PROMPT_VERSION and "result" in entry:
+                return entry
+        except (OSError, ValueError) as e:
+            logging.warning(f"Discarding broken response cache entry {path}: {e}")
+        return None
+
+    def put(self, key, result, usage):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {
+            "prompt_version": PROMPT_VERSION,
+            "result": result,
+            "usage": usage,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+_cache = None
+
+
+def get_response_cache():
+    """The shared ResponseCache, or None if RESPONSE_CACHE is off."""
+    global _cache
+    if _cache is None and RESPONSE_CACHE:
+        _cache = ResponseCache()
+    return _cache
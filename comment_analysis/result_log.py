@@ -0,0 +1,132 @@
+"""
+Append-only log of the analysis of one citing paper.
+
+While a citing paper is analyzed, each snippet result is appended as one
+JSON line to comment_analysis/<filename>.jsonl instead of rewriting
+<filename>.json. The log starts with a header holding the fingerprint, the
+(start, end) offsets of the snippets in the extracted text, not the
+snippets themselves, and the pre-classifier settings; results answered by
+the pre-classifier are marked as local. Once the paper is done the log is
+compacted: the JSON file is replaced atomically in its usual shape and the
+log removed. A log left by an interrupted run is replayed on top of the
+JSON file; a line cut short by a crash is ignored, and a log without any
+complete line is removed.
+"""
+
+import json
+import logging
+import os
+import threading
+
+LOG_SUFFIX = ".jsonl"
+
+
+def write_json_atomic(path, data):
+    """Write data as JSON to a temporary file and rename it over path."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+class ResultLog:
+    """The result log next to an analysis JSON file."""
+
+    def __init__(self, analysis_path):
+        self.path = os.path.splitext(analysis_path)[0] + LOG_SUFFIX
+        self._file = None
+        self.written = False
+
+    def _append(self, record):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self.written = True
+
+    def header(self, fingerprint, snippet_ranges, preclassifier=None):
+        # A log starts with its header: truncate what a crash may have left
+        self.close()
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._append(
+            {
+                "Type": "header",
+                "Fingerprint": fingerprint,
+                "SnippetRanges": snippet_ranges,
+                "Preclassifier": preclassifier,
+            }
+        )
+
+    def result(self, index, citations, local=False):
+        record = {"Type": "result", "Index": index, "Citations": citations}
+        if local:
+            record["Local"] = True
+        self._append(record)
+
+    def error(self, index, message):
+        self._append({"Type": "error", "Index": index, "Message": message})
+
+    def read(self):
+        """The records of the log, without a last line cut short."""
+        if not os.path.exists(self.path):
+            return []
+        records = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    logging.warning(f"Ignoring a broken line in {self.path}")
+                    break
+        return records
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def replay(data, records, same_source):
+    """
+    Analysis state from the JSON data (or None) and the log records. A header
+    whose fingerprint is not of the same source as the state starts over.
+    The state has "SnippetRanges" instead of "Snippets" if the log has a header.
+    """
+    state = dict(data or {})
+    state.setdefault("Citations", [])
+    state.setdefault("AnalyzedSnippetIndices", [])
+    state.setdefault("LocallyAnalyzedSnippetIndices", [])
+    errors = []
+    for record in records:
+        kind = record.get("Type")
+        if kind == "header":
+            stored = state.get("Fingerprint")
+            if stored and not same_source(stored, record["Fingerprint"]):
+                state["Citations"] = []
+                state["AnalyzedSnippetIndices"] = []
+                state["LocallyAnalyzedSnippetIndices"] = []
+            state["Fingerprint"] = record["Fingerprint"]
+            state["SnippetRanges"] = record["SnippetRanges"]
+            state["Preclassifier"] = record.get("Preclassifier")
+            state.pop("Snippets", None)
+        elif (
+            kind == "result" and record["Index"] not in state["AnalyzedSnippetIndices"]
+        ):
+            state["Citations"] = state["Citations"] + record["Citations"]
+            state["AnalyzedSnippetIndices"] = state["AnalyzedSnippetIndices"] + [
+                record["Index"]
+            ]
+            if record.get("Local"):
+                state["LocallyAnalyzedSnippetIndices"] = state[
+                    "LocallyAnalyzedSnippetIndices"
+                ] + [record["Index"]]
+        elif kind == "error":
+            errors.append((record["Index"], record["Message"]))
+    if records:
+        state["EncounteredExceptions"] = errors
+    return state
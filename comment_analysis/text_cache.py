@@ -0,0 +1,214 @@
+import hashlib
+import json
+import logging
+import os
+import struct
+import threading
+import zlib
+
+import fitz  # PyMuPDF
+
+import config
+
+# Bump when the extraction below changes, so that old entries are not reused
+EXTRACTOR_VERSION = "1"
+
+TEXT_CACHE_DIR = getattr(config, "TEXT_CACHE_DIR", "./.cache/pdf_text")
+# Total size of the cache before the least recently used entries are evicted;
+# 0 disables the cache
+TEXT_CACHE_MAX_MB = getattr(config, "TEXT_CACHE_MAX_MB", 1024)
+
+# Entry layout: MAGIC, header length (uint32), JSON header, then one zlib
+# block per page. The header lists the (offset, length) of each block
+# relative to the end of the header.
+MAGIC = b"CGTX"
+ENTRY_SUFFIX = ".txtc"
+
+
+def extract_pages(pdf_path):
+    """Text of each page of a PDF."""
+    with fitz.open(pdf_path) as pdf_document:
+        return [page.get_text() for page in pdf_document]
+
+
+class CachedText:
+    """A cache entry; pages are decompressed only when read."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Not a text cache entry: {path}")
+            (header_len,) = struct.unpack("<I", f.read(4))
+            self.header = json.loads(f.read(header_len))
+        self.data_start = len(MAGIC) + 4 + header_len
+
+    @property
+    def page_count(self):
+        return len(self.header["pages"])
+
+    def read_pages(self, start=0, stop=None):
+        """Text of pages [start, stop), reading only their blocks."""
+        blocks = self.header["pages"][start:stop]
+        if not blocks:
+            return ""
+        first, last = blocks[0], blocks[-1]
+        with open(self.path, "rb") as f:
+            f.seek(self.data_start + first[0])
+            data = f.read(last[0] + last[1] - first[0])
+        return "".join(
+            zlib.decompress(
+                data[offset - first[0] : offset - first[0] + length]
+            ).decode("utf-8")
+            for offset, length in blocks
+        )
+
+    def text(self):
+        return self.read_pages()
+
+
+class PdfTextCache:
+    """
+    On-disk cache of extracted PDF text keyed by the SHA-256 of the PDF and
+    EXTRACTOR_VERSION, so the same PDF is parsed once across runs and across
+    the folders of different cited papers.
+    Entries are evicted least recently used first (by mtime, refreshed on each
+    hit) once the cache exceeds max_bytes.
+    """
+
+    def __init__(
+        self, cache_dir=TEXT_CACHE_DIR, max_bytes=TEXT_CACHE_MAX_MB * 1024 * 1024
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # abspath -> ((size, mtime_ns), sha256)
+        self._hashes = {}
+        self._total_bytes = None
+
+    def file_hash(self, pdf_path):
+        """SHA-256 of a file, memoized while its size and mtime are unchanged."""
+        key = os.path.abspath(pdf_path)
+        stat = os.stat(pdf_path)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        cached = self._hashes.get(key)
+        if cached and cached[0] == signature:
+            return cached[1]
+        sha = hashlib.sha256()
+        with open(pdf_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        self._hashes[key] = (signature, digest)
+        return digest
+
+    def entry_path(self, digest, suffix=ENTRY_SUFFIX):
+        """Path of the text entry of a PDF, or of a file derived from it."""
+        return os.path.join(
+            self.cache_dir, digest[:2], f"{digest}-v{EXTRACTOR_VERSION}{suffix}"
+        )
+
+    def get(self, pdf_path):
+        """Return the CachedText of a PDF, extracting and storing it on a miss."""
+        digest = self.file_hash(pdf_path)
+        path = self.entry_path(digest)
+        if os.path.exists(path):
+            try:
+                entry = CachedText(path)
+                os.utime(path)
+                return entry
+            except (OSError, ValueError) as e:
+                logging.warning(f"Discarding broken text cache entry {path}: {e}")
+        pages = extract_pages(pdf_path)
+        self.put(digest, pages)
+        return CachedText(path)
+
+    def text(self, pdf_path):
+        return self.get(pdf_path).text()
+
+    def put(self, digest, pages):
+        blocks, offsets, offset = [], [], 0
+        for page in pages:
+            block = zlib.compress(page.encode("utf-8"), 6)
+            blocks.append(block)
+            offsets.append([offset, len(block)])
+            offset += len(block)
+        header = json.dumps(
+            {"extractor": EXTRACTOR_VERSION, "pages": offsets}, separators=(",", ":")
+        ).encode("utf-8")
+
+        self.put_file(
+            self.entry_path(digest),
+            b"".join([MAGIC, struct.pack("<I", len(header)), header] + blocks),
+        )
+
+    def put_file(self, path, data):
+        """Atomically write a cache file and evict old entries if needed."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self._account(len(data))
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".tmp"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield stat.st_mtime_ns, stat.st_size, path
+
+    def _account(self, added):
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._total_bytes += added
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Remove the least recently used entries down to 90% of max_bytes."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._total_bytes = total
+        logging.info(f"Text cache evicted down to {total / 1024 / 1024:.1f} MB")
+
+
+_cache = None
+
+
+def get_text_cache():
+    """The shared PdfTextCache, or None if TEXT_CACHE_MAX_MB is 0."""
+    global _cache
+    if _cache is None and TEXT_CACHE_MAX_MB > 0:
+        _cache = PdfTextCache()
+    return _cache
+
+
+def set_text_cache(text_cache):
+    """Replace the shared PdfTextCache; returns the previous one."""
+    global _cache
+    previous, _cache = _cache, text_cache
+    return previous
+
+
+def extract_text(pdf_path):
+    """Text of a PDF, through the shared cache when it is enabled."""
+    text_cache = get_text_cache()
+    if text_cache:
+        return text_cache.text(pdf_path)
+    return "".join(extract_pages(pdf_path))
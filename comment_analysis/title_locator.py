@@ -0,0 +1,316 @@
+"""
+Locate a paper title in the text of a citing paper.
+
+scan_title() is the original exhaustive search: a window of len(title) slid
+over the text one character at a time, scored with fuzz.ratio. locate_title()
+returns the same result while scoring only a few hundred windows: character
+n-grams of the title that are rare in the text vote for the window start they
+imply, and only the neighbourhood of the best supported starts is scanned.
+
+Run `python -m comment_analysis.title_locator [paper_list_dir]` to compare
+both on the local PDFs, or add `--synthetic N` to compare them on N generated
+reference lists (see synthetic_corpus), which needs no PDF.
+"""
+
+import argparse
+import glob
+import json
+import os
+import random
+import time
+from collections import defaultdict
+
+from fuzzywuzzy import fuzz
+
+try:
+    # fuzz.ratio(a, b) is round(100 * Levenshtein.ratio(a, b)) when
+    # python-Levenshtein is installed; calling it directly skips fuzzywuzzy's
+    # argument checks and matcher object, most of the cost of a short window
+    from Levenshtein import ratio as _levenshtein_ratio
+except ImportError:
+    _levenshtein_ratio = None
+
+# Length of the title n-grams used as anchors
+ANCHOR_SIZE = 5
+# n-grams more frequent than this in the text carry little position information
+MAX_ANCHOR_HITS = 20
+# Implied window starts are grouped in buckets of this many characters
+BUCKET_SIZE = 8
+# At most this many regions are scanned with fuzz.ratio, those supported by
+# at least half as many anchors as the best one
+MAX_REGIONS = 5
+
+
+def scan_title(title, text, start=0):
+    """Exhaustive search: (position, similarity) of the first best window."""
+    window_size = len(title)
+    max_similarity = 0
+    match_position = -1
+    for i in range(start, len(text) - window_size + 1):
+        similarity = fuzz.ratio(title.lower(), text[i : i + window_size].lower())
+        if similarity > max_similarity:
+            max_similarity = similarity
+            match_position = i
+    return match_position, max_similarity
+
+
+def _find_all(text, gram, start, stop, limit=None):
+    """Positions of gram in text[start:stop], None if there are more than limit."""
+    hits = []
+    p = text.find(gram, start, stop)
+    while p != -1:
+        if limit is not None and len(hits) == limit:
+            return None
+        hits.append(p)
+        p = text.find(gram, p + 1, stop)
+    return hits
+
+
+def _anchor_votes(title, text, start, stop, step):
+    """{bucket: set of title offsets} voted by the title n-grams found in text."""
+    offsets = list(range(0, len(title) - ANCHOR_SIZE + 1, step))
+    if offsets[-1] != len(title) - ANCHOR_SIZE:
+        offsets.append(len(title) - ANCHOR_SIZE)
+    grams = defaultdict(list)
+    for j in offsets:
+        grams[title[j : j + ANCHOR_SIZE]].append(j)
+
+    anchors = []
+    for gram, gram_offsets in grams.items():
+        hits = _find_all(text, gram, start, stop, MAX_ANCHOR_HITS)
+        if hits:
+            anchors.append((hits, gram_offsets))
+    if not anchors:
+        # Only frequent n-grams (e.g. a short title made of common words)
+        anchors = [(_find_all(text, gram, start, stop), o) for gram, o in grams.items()]
+
+    votes = defaultdict(set)
+    for hits, gram_offsets in anchors:
+        for p in hits:
+            for j in gram_offsets:
+                votes[(p - j) // BUCKET_SIZE].add(j)
+    return votes
+
+
+def locate_title(title, text, start=0):
+    """
+    Same result as scan_title when the best similarity is at least 80, the
+    threshold extract_references uses, which is when the title is in the text.
+    """
+    window_size = len(title)
+    last = len(text) - window_size
+    if window_size < ANCHOR_SIZE or last < start:
+        return scan_title(title, text, start)
+
+    # Offsets below are relative to start
+    low_title = title.lower()
+    low_text = text[start:].lower()
+    if len(low_text) != len(text) - start:
+        # Lowercasing changed offsets (rare non-ASCII letters)
+        return scan_title(title, text, start)
+
+    # Non-overlapping n-grams are enough to place a lightly damaged title;
+    # all of them are needed when line breaks and extraction errors cut
+    # most words
+    for step in (ANCHOR_SIZE, 1):
+        votes = _anchor_votes(low_title, low_text, 0, len(low_text), step)
+        # Merge each bucket with its neighbours: indels shift the implied start
+        support = {
+            b: len(votes[b] | votes.get(b - 1, set()) | votes.get(b + 1, set()))
+            for b in votes
+        }
+        regions = sorted(support, key=lambda b: (-support[b], b))[:MAX_REGIONS]
+        # Most of the sampled n-grams agree: the title is barely damaged
+        if regions and support[regions[0]] * 2 * step >= window_size:
+            break
+
+    # A match above the threshold has at most ~20% of its characters changed,
+    # so its start is within a quarter of the title of the implied one
+    margin = window_size // 4
+    positions = set()
+    for b in regions:
+        if 2 * support[b] < support[regions[0]]:
+            break
+        lo = max(0, b * BUCKET_SIZE - margin)
+        hi = min(last - start, (b + 1) * BUCKET_SIZE + margin)
+        positions.update(range(lo, hi + 1))
+
+    max_similarity = 0
+    match_position = -1
+    for i in sorted(positions):
+        window = low_text[i : i + window_size]
+        if _levenshtein_ratio is not None:
+            similarity = round(100 * _levenshtein_ratio(low_title, window))
+        else:
+            similarity = fuzz.ratio(low_title, window)
+        if similarity > max_similarity:
+            max_similarity = similarity
+            match_position = start + i
+            if similarity == 100:
+                break
+    return match_position, max_similarity
+
+
+def check_queries(queries, threshold=80):
+    """
+    Compare locate_title with scan_title on (name, text, title, start) queries.
+    Results must be equal whenever either similarity reaches the threshold;
+    below it extract_references finds no reference either way.
+    Returns (queries checked, mismatches, scan seconds, locate seconds).
+    """
+    mismatches = []
+    scan_time = locate_time = 0.0
+    checked = 0
+    for name, text, title, start in queries:
+        t = time.perf_counter()
+        expected = scan_title(title, text, start)
+        scan_time += time.perf_counter() - t
+        t = time.perf_counter()
+        got = locate_title(title, text, start)
+        locate_time += time.perf_counter() - t
+        checked += 1
+        if expected[1] >= threshold or got[1] >= threshold:
+            if expected != got:
+                mismatches.append((name, title, expected, got))
+    return checked, mismatches, scan_time, locate_time
+
+
+def check_locator(pdf_texts, titles, threshold=80):
+    """Compare locate_title with scan_title for every (text, title) pair."""
+    return check_queries(
+        ((name, text, title, 0) for name, text in pdf_texts for title in titles),
+        threshold,
+    )
+
+
+# --- synthetic corpus ---
+
+LIGATURES = [("fi", "\ufb01"), ("fl", "\ufb02"), ("ff", "\ufb00")]
+
+
+def corpus_titles(root="."):
+    """Titles of author_info/*.json and paper_list/*/citation_info.json."""
+    paths = glob.glob(os.path.join(root, "author_info", "*.json"))
+    paths += glob.glob(os.path.join(root, "paper_list", "*", "citation_info.json"))
+    titles = set()
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            titles.update(item.get("title", "") for item in json.load(f))
+    titles.discard("")
+    return sorted(titles)
+
+
+def damage(rng, title):
+    """Title as a PDF extractor may return it: ligatures, dropped/extra chars."""
+    for plain, ligature in LIGATURES:
+        if rng.random() < 0.3:
+            title = title.replace(plain, ligature)
+    chars = list(title)
+    for _ in range(rng.choice([0, 0, 1, 2, 4])):
+        k = rng.randrange(len(chars))
+        if rng.random() < 0.5:
+            del chars[k]
+        else:
+            chars.insert(k, rng.choice("abcdefghijklmnopqrstuvwxyz .,-"))
+    return "".join(chars)
+
+
+def wrap(rng, text, width=80):
+    """Break text into lines as pdf text extraction does, hyphenating words."""
+    lines, line = [], ""
+    for word in text.split(" "):
+        if line and len(line) + 1 + len(word) > width:
+            if len(word) > 6 and rng.random() < 0.3:
+                cut = rng.randrange(3, len(word) - 2)
+                lines.append(f"{line} {word[:cut]}-")
+                word = word[cut:]
+            else:
+                lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    lines.append(line)
+    return "\n".join(lines)
+
+
+def synthetic_corpus(titles, num_docs, seed=0):
+    """
+    (name, text, title, start) queries over generated citing papers: body
+    text, then a numbered reference list of 20-60 titles in various damaged
+    forms. Each document is queried for one listed title and one absent one,
+    from the References header as extract_references does.
+    """
+    rng = random.Random(seed)
+    words = [w for title in titles for w in title.split()]
+    queries = []
+    for n in range(num_docs):
+        listed = rng.sample(titles, min(len(titles), rng.randint(20, 60)))
+        body = " ".join(rng.choice(words) for _ in range(rng.randint(200, 1500)))
+        references = []
+        for k, title in enumerate(listed, start=1):
+            year = rng.randint(1995, 2025)
+            entry = (
+                f"[{k}] A. Author and B. Author. {damage(rng, title)}. In Proc. {year}."
+            )
+            references.append(wrap(rng, entry))
+        header = f"{wrap(rng, body)}\nReferences\n"
+        text = header + "\n".join(references)
+        absent = [
+            t for t in rng.sample(titles, min(len(titles), 80)) if t not in listed
+        ]
+        name = f"synthetic-{n}"
+        start = len(header) - len("References\n")
+        queries.append((name, text, rng.choice(listed), start))
+        if absent:
+            queries.append((name, text, absent[0], start))
+    return queries
+
+
+def _local_queries(paper_list_dir):
+    from .text_cache import extract_text
+
+    texts, titles = [], set()
+    for paper in sorted(os.listdir(paper_list_dir)):
+        paper_dir = os.path.join(paper_list_dir, paper)
+        info_path = os.path.join(paper_dir, "paper_info.json")
+        if os.path.exists(info_path):
+            with open(info_path, "r", encoding="utf-8") as f:
+                titles.add(json.load(f).get("title", ""))
+        if not os.path.isdir(paper_dir):
+            continue
+        for name in sorted(os.listdir(paper_dir)):
+            if name.lower().endswith(".pdf"):
+                text = extract_text(os.path.join(paper_dir, name))
+                if text:
+                    texts.append((name, text))
+    titles.discard("")
+    return [(name, text, title, 0) for name, text in texts for title in sorted(titles)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check that locate_title returns the same as the full scan."
+    )
+    parser.add_argument("paper_list_dir", nargs="?", default="./paper_list")
+    parser.add_argument(
+        "--synthetic",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Check N generated reference lists instead of the local PDFs.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        titles = corpus_titles(os.path.dirname(os.path.abspath(args.paper_list_dir)))
+        queries = synthetic_corpus(titles, args.synthetic, args.seed)
+    else:
+        queries = _local_queries(args.paper_list_dir)
+    checked, failed, scan_time, locate_time = check_queries(queries)
+    for name, title, expected, got in failed:
+        print(f"[FAILED] {name} / {title}\n  scan:   {expected}\n  locate: {got}")
+    print(
+        f"{checked} queries checked, {len(failed)} mismatches. "
+        f"scan: {scan_time:.2f}s, locate: {locate_time:.2f}s"
+    )
@@ -18,6 +18,29 @@ author_name = ""  # For author crawler
 
 NUM_WORDS_IN_FILENAME = 8  # Number of words to keep in the filename
 
+# arXiv fallback: titles per batched OR-query, and an optional local metadata
+# snapshot (JSON lines with "id" and "title") for offline resolution
+ARXIV_BATCH_SIZE = 10
+ARXIV_METADATA_PATH = ""
+
+# PDF download: max concurrent requests per host, and hedged mode which races
+# the sources of a citation (next source starts after HEDGE_DELAY seconds
+# without any bytes received)
+PER_HOST_CONCURRENCY = 2
+HEDGED_DOWNLOAD = False
+HEDGE_DELAY = 2.0
+
+# PDF validation (--validate): minimum fuzzy score of the citation title
+# against the first pages of the PDF
+PDF_TITLE_MATCH_THRESHOLD = 80
+
+# Word report: also save the document every K citations (0: only at the end)
+DOCX_CHECKPOINT_EVERY = 0
+# Word rendering engine: "python-docx" or "ooxml" (direct XML, for large reports)
+DOCX_ENGINE = "python-docx"
+# Title of the report written by `step2_docx_gen.py --combined`
+COMBINED_REPORT_TITLE = "引用摘录汇总"
+
 # Paper List for crawler (example)
 paper_list = [
     "CFA: Class-wise Calibrated Fair Adversarial Training",
@@ -34,7 +57,38 @@ deepseek_short = ModelConfig(
     system_prompt=prompts.short_system,
     user_prompt_template=prompts.user_template,
     response_format={"type": "json_object"},
+    temperature=0.2,
+    # Concurrent queries, and the rate limits of the account (0: unlimited)
+    max_concurrency=4,
+    requests_per_minute=0,
+    tokens_per_minute=0,
+    # Retries with exponential backoff on 429/5xx and connection errors
+    max_retries=5,
+    # Snippets sent per request, across the citing papers of a folder (1: one
+    # per request), and the estimated tokens of snippet text per request
+    batch_size=1,
+    batch_max_tokens=4000,
 )
 
 # Active model configuration
 ANALYSIS_MODEL = deepseek_short
+
+# Cache of text extracted from PDFs for the analysis, keyed by file content
+TEXT_CACHE_DIR = "./.cache/pdf_text"
+# Least recently used entries are evicted above this size (0 disables the cache)
+TEXT_CACHE_MAX_MB = 1024
+# Processes extracting PDF text ahead of the LLM queries (0: extract inline)
+ANALYSIS_EXTRACT_JOBS = 4
+# Maximum number of PDF texts extracted ahead and kept in memory
+PREFETCH_WINDOW = 8
+# Validated model responses, reused for identical requests (model, temperature,
+# response format, prompts and prompts.PROMPT_VERSION)
+RESPONSE_CACHE = True
+RESPONSE_CACHE_DIR = "./.cache/llm_responses"
+# Local pre-classifier: snippets whose citations are clearly not positive
+# (e.g. "[1, 18-25]" lists) are answered without a model query when the
+# probability of "not positive" reaches the threshold
+PRECLASSIFIER = False
+PRECLASSIFIER_THRESHOLD = 0.95
+# Weights fitted with `python -m comment_analysis.preclassifier train`
+PRECLASSIFIER_MODEL = "./.cache/preclassifier.json"
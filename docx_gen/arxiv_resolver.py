@@ -0,0 +1,179 @@
+import json
+import logging
+import os
+import pickle
+import re
+import threading
+from collections import defaultdict
+
+import arxiv
+from fuzzywuzzy import fuzz
+
+import config
+
+# Same threshold as the per-title fallback in downloader.download_pdf_in_arxiv_search
+ARXIV_MATCH_THRESHOLD = 85
+
+# Titles per OR-query. arXiv rejects very long query strings, ~10 phrases is safe.
+ARXIV_BATCH_SIZE = getattr(config, "ARXIV_BATCH_SIZE", 10)
+
+# Optional local arXiv metadata snapshot (JSON lines with "id" and "title",
+# e.g. the Kaggle arxiv-metadata-oai-snapshot.json)
+ARXIV_METADATA_PATH = getattr(config, "ARXIV_METADATA_PATH", "")
+
+# arXiv identifiers: new style (2301.01234v2) and old style (cs.LG/0601001)
+_ARXIV_ID = r"(\d{4}\.\d{4,5}(?:v\d+)?|[a-z\-]+(?:\.[A-Z]{2})?/\d{7}(?:v\d+)?)"
+_URL_ID_RE = re.compile(rf"arxiv\.org/(?:abs|pdf|html)/{_ARXIV_ID}", re.IGNORECASE)
+_INFO_ID_RE = re.compile(rf"arxiv\s*:?\s*{_ARXIV_ID}", re.IGNORECASE)
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# A single client so that its delay_seconds throttling applies across all
+# queries; the lock keeps concurrent callers from bypassing it
+_client = arxiv.Client(page_size=100, delay_seconds=3.0, num_retries=3)
+_client_lock = threading.Lock()
+_local_index = None
+
+
+def extract_arxiv_id(cit):
+    """Return the arXiv ID found in the link, PDF or info field of a citation."""
+    for field in ("link", "PDF"):
+        match = _URL_ID_RE.search(cit.get(field, "") or "")
+        if match:
+            return match.group(1)
+    match = _INFO_ID_RE.search(cit.get("info", "") or "")
+    if match:
+        return match.group(1)
+    return None
+
+
+def arxiv_pdf_url(arxiv_id):
+    return f"https://arxiv.org/pdf/{arxiv_id}"
+
+
+def normalize_title(title):
+    """Lowercase a title and keep only its alphanumeric tokens."""
+    return " ".join(_TOKEN_RE.findall(title.lower()))
+
+
+class ArxivTitleIndex:
+    """Offline title -> arXiv ID lookup over a local metadata snapshot."""
+
+    def __init__(self, ids, titles):
+        self.ids = ids
+        self.titles = titles
+        self.exact = {}
+        self.postings = defaultdict(list)
+        for i, title in enumerate(titles):
+            self.exact.setdefault(title, i)
+            for token in set(title.split()):
+                self.postings[token].append(i)
+
+    @classmethod
+    def from_snapshot(cls, path):
+        """Load the index for a snapshot, reusing a pickled copy when up to date."""
+        index_path = path + ".index.pkl"
+        if os.path.exists(index_path) and os.path.getmtime(
+            index_path
+        ) >= os.path.getmtime(path):
+            with open(index_path, "rb") as file:
+                ids, titles = pickle.load(file)
+            return cls(ids, titles)
+
+        ids, titles = [], []
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("id") and record.get("title"):
+                    ids.append(record["id"])
+                    titles.append(normalize_title(record["title"]))
+        with open(index_path, "wb") as file:
+            pickle.dump((ids, titles), file)
+        logging.info(f"Indexed {len(ids)} arXiv titles from {path}")
+        return cls(ids, titles)
+
+    def lookup(self, title, num_anchor_tokens=3):
+        norm = normalize_title(title)
+        if norm in self.exact:
+            return self.ids[self.exact[norm]]
+
+        # Candidates are the entries sharing one of the rarest query tokens
+        tokens = [t for t in set(norm.split()) if t in self.postings]
+        tokens.sort(key=lambda t: len(self.postings[t]))
+        candidates = set()
+        for token in tokens[:num_anchor_tokens]:
+            candidates.update(self.postings[token])
+
+        best_id, best_score = None, 0
+        for i in candidates:
+            score = fuzz.ratio(norm, self.titles[i])
+            if score > best_score:
+                best_id, best_score = self.ids[i], score
+        if best_score >= ARXIV_MATCH_THRESHOLD:
+            return best_id
+        return None
+
+
+def get_local_index():
+    """Return the local snapshot index, or None if no snapshot is configured."""
+    global _local_index
+    if _local_index is None and ARXIV_METADATA_PATH:
+        if os.path.exists(ARXIV_METADATA_PATH):
+            _local_index = ArxivTitleIndex.from_snapshot(ARXIV_METADATA_PATH)
+        else:
+            logging.warning(f"arXiv metadata snapshot not found: {ARXIV_METADATA_PATH}")
+    return _local_index
+
+
+def search_arxiv(query, max_results):
+    """Results of an arXiv API search, through the shared throttled client."""
+    search = arxiv.Search(query=query, max_results=max_results)
+    with _client_lock:
+        return list(_client.results(search))
+
+
+def _search_batch(titles):
+    """Resolve a group of titles with a single OR-query to the arXiv API."""
+    query = " OR ".join(f'ti:"{normalize_title(title)}"' for title in titles)
+    results = search_arxiv(query, min(len(titles) * 5, 50))
+
+    resolved = {}
+    for title in titles:
+        best_id, best_score = None, 0
+        for result in results:
+            score = fuzz.ratio(title.lower(), result.title.lower())
+            if score > best_score:
+                best_id, best_score = result.get_short_id(), score
+        resolved[title] = best_id if best_score >= ARXIV_MATCH_THRESHOLD else None
+    return resolved
+
+
+def resolve_arxiv_ids(titles):
+    """
+    Map each title to an arXiv ID (or None) using the local snapshot first and
+    batched arXiv searches for the remaining titles.
+    """
+    resolved = {}
+    pending = []
+    index = get_local_index()
+    for title in dict.fromkeys(t for t in titles if t):
+        arxiv_id = index.lookup(title) if index else None
+        if arxiv_id:
+            resolved[title] = arxiv_id
+        else:
+            pending.append(title)
+
+    for start in range(0, len(pending), ARXIV_BATCH_SIZE):
+        batch = pending[start : start + ARXIV_BATCH_SIZE]
+        try:
+            resolved.update(_search_batch(batch))
+        except Exception as e:
+            # Leave the batch unresolved so the per-title search still runs
+            logging.error(f"[FAILED] Error in batched arXiv search: {e}")
+            continue
+
+    found = sum(1 for v in resolved.values() if v)
+    logging.info(f"Resolved {found}/{len(resolved)} titles to arXiv IDs")
+    return resolved
@@ -0,0 +1,113 @@
+import heapq
+import json
+import logging
+import os
+
+import config
+from utils import get_filename
+
+from .model import load_paper_report
+
+
+def load_author_papers(paths):
+    """Load and merge author_info files, dropping papers listed twice."""
+    papers, seen = [], set()
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as file:
+            for paper in json.load(file):
+                key = paper.get("cite_id") or paper.get("title")
+                if key in seen:
+                    continue
+                seen.add(key)
+                papers.append(paper)
+    return papers
+
+
+def snippet_count(paper_dir):
+    """
+    Average number of citation snippets per analyzed citing paper, or None.
+    Counts the Snippets of each comment_analysis/<filename>.json, including
+    the snippets the model found no citation in.
+    """
+    analysis_dir = os.path.join(paper_dir, "comment_analysis")
+    if not os.path.isdir(analysis_dir):
+        return None
+    counts = []
+    for name in sorted(os.listdir(analysis_dir)):
+        if not name.endswith(".json") or name == "all_snippets.json":
+            continue
+        path = os.path.join(analysis_dir, name)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                analysis = json.load(file)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Failed to read {path}: {e}")
+            continue
+        if isinstance(analysis, dict) and "Snippets" in analysis:
+            counts.append(len(analysis["Snippets"]))
+    if not counts:
+        return None
+    return sum(counts) / len(counts)
+
+
+class PaperCost:
+    """Estimated processing cost of one cited paper."""
+
+    def __init__(self, paper, citations, missing_rate, avg_snippets):
+        self.paper = paper
+        self.citations = citations
+        self.missing_rate = missing_rate
+        self.avg_snippets = avg_snippets
+
+    def __repr__(self):
+        return f"PaperCost(title={self.paper.get('title')}, cost={self.cost:.1f})"
+
+    @property
+    def cost(self):
+        # Each citing paper is reviewed once per snippet; a missing PDF also
+        # has to be found by hand, which roughly doubles its cost.
+        return self.citations * (1 + self.missing_rate) * self.avg_snippets
+
+
+def estimate_costs(papers, base_dir=None):
+    """
+    Estimate the cost of each paper from its citation count, the share of
+    citing PDFs still missing in paper_list and the average snippet count of
+    earlier analyses. Papers never analyzed use the mean over those that were.
+    """
+    if base_dir is None:
+        base_dir = config.PAPER_LIST_DIR
+
+    stats = []
+    for paper in papers:
+        paper_dir = os.path.join(base_dir, get_filename(paper.get("title", "")))
+        report = load_paper_report(paper_dir)
+        citations = paper.get("cite_num_within_time", 0) or report.num_citations
+        # Nothing crawled yet: every PDF is missing
+        missing_rate = 1 - report.coverage if report.entries else 1.0
+        stats.append((paper, citations, missing_rate, snippet_count(paper_dir)))
+
+    known = [s for *_, s in stats if s is not None]
+    default_snippets = sum(known) / len(known) if known else 1.0
+    return [
+        PaperCost(paper, citations, missing_rate, default_snippets if s is None else s)
+        for paper, citations, missing_rate, s in stats
+    ]
+
+
+def balance_assignment(costs, members):
+    """
+    Assign papers to members with the LPT rule: largest cost first, each to
+    the member with the lowest load so far.
+    Returns (the member of each item of costs, {member: load}).
+    """
+    heap = [(0.0, i, member) for i, member in enumerate(members)]
+    heapq.heapify(heap)
+    assignment = [""] * len(costs)
+    order = sorted(range(len(costs)), key=lambda k: costs[k].cost, reverse=True)
+    for k in order:
+        load, i, member = heapq.heappop(heap)
+        assignment[k] = member
+        heapq.heappush(heap, (load + costs[k].cost, i, member))
+    loads = {member: load for load, _, member in heap}
+    return assignment, {member: loads[member] for member in members}
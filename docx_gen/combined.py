@@ -0,0 +1,47 @@
+import logging
+import os
+import time
+
+import config
+from utils import get_filename
+
+from .model import load_paper_report
+from .ooxml_writer import CombinedReport
+
+COMBINED_REPORT_TITLE = getattr(config, "COMBINED_REPORT_TITLE", "引用摘录汇总")
+
+
+def generate_combined_report(
+    paper_ls, output, title=COMBINED_REPORT_TITLE, base_dir=None
+):
+    """
+    Write the citations of every paper into one .docx with a table of contents,
+    per-paper citation counts and PDF coverage, and a bookmark per paper.
+    Built from citation_info.json and the local PDFs; nothing is downloaded.
+    Returns the list of PaperReport.
+    """
+    if base_dir is None:
+        base_dir = config.PAPER_LIST_DIR
+    output_dir = os.path.dirname(os.path.abspath(output))
+    os.makedirs(output_dir, exist_ok=True)
+
+    report = CombinedReport(title, subtitle=time.strftime("%Y-%m-%d"))
+    paper_reports = []
+    for paper in paper_ls:
+        paper_dir = os.path.join(base_dir, get_filename(paper))
+        paper_report = load_paper_report(paper_dir)
+        paper_report.name = paper
+        report.add_paper(paper_report, base_dir=output_dir)
+        paper_reports.append(paper_report)
+        logging.info(
+            f"Added {paper}: {paper_report.num_pdfs}/{paper_report.num_citations} PDFs"
+        )
+
+    report.save(output)
+    citations = sum(r.num_citations for r in paper_reports)
+    pdfs = sum(r.num_pdfs for r in paper_reports)
+    logging.info(
+        f"[SUCCESS] Combined report {output}: {len(paper_reports)} papers, "
+        f"{citations} citations, {pdfs} PDFs"
+    )
+    return paper_reports
@@ -1,52 +1,91 @@
 import logging
 import requests
-import arxiv
 import os
-import re
-from bs4 import BeautifulSoup
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
 from utils import are_strings_almost_matching
+import config
 from config import TIMEOUT
+from .url_rules import rewrite_pdf_url
+from .landing import read_head, extract_pdf_links
+from .arxiv_resolver import (
+    ARXIV_MATCH_THRESHOLD,
+    extract_arxiv_id,
+    arxiv_pdf_url,
+    search_arxiv,
+)
+from .host_limiter import get_host_limiter
+
+# Hedged mode: race sources, starting the next one after HEDGE_DELAY seconds
+# without any bytes from the running ones
+HEDGED_DOWNLOAD = getattr(config, "HEDGED_DOWNLOAD", False)
+HEDGE_DELAY = getattr(config, "HEDGE_DELAY", 2.0)
+
+# Host of the arXiv API, for the per-host limit of title searches
+ARXIV_API_URL = "https://export.arxiv.org/api/query"
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+
+def _write_stream(response, save_path, first_chunk=b"", cancel=None, progress=None):
+    """Write a streamed response to save_path, aborting if cancel is set."""
+    if progress is not None:
+        progress.set()
+    with open(save_path, "wb") as pdf_file:
+        pdf_file.write(first_chunk)
+        for chunk in response.iter_content(chunk_size=8192):
+            if cancel is not None and cancel.is_set():
+                break
+            pdf_file.write(chunk)
+    if cancel is not None and cancel.is_set():
+        _remove_quietly(save_path)
+        return False
+    return True
 
 
-def download_file(url, save_path):
-    """Download file from a direct URL."""
+def _remove_quietly(path):
     try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-        response = requests.get(url, stream=True, timeout=TIMEOUT, headers=headers)
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def download_file(url, save_path, cancel=None, progress=None):
+    """Download file from a direct URL.
+
+    cancel is an optional threading.Event that aborts the transfer, progress
+    an optional threading.Event set once PDF bytes start arriving.
+    """
+    try:
+        with get_host_limiter().slot(url), requests.get(
+            url, stream=True, timeout=TIMEOUT, headers=HEADERS
+        ) as response:
+            # Check status code and content type
+            if response.status_code != 200:
+                logging.info(
+                    f"[FAILED] Download failed from URL (status: {response.status_code}): {url}"
+                )
+                return False
 
-        # Check status code and content type
-        if response.status_code == 200:
             # Check for PDF content type or magic numbers
-            is_pdf = "application/pdf" in response.headers.get("Content-Type", "")
+            first_chunk = next(response.iter_content(chunk_size=1024), b"")
+            is_pdf = "application/pdf" in response.headers.get(
+                "Content-Type", ""
+            ) or first_chunk.startswith(b"%PDF")
             if not is_pdf:
-                # Peek at the first few bytes
-                chunk = next(response.iter_content(chunk_size=4), b"")
-                if chunk.startswith(b"%PDF"):
-                    is_pdf = True
-                else:
-                    # Put back the chunk? iter_content is a generator.
-                    # Simpler to just re-request or assume if content-type fails it might be wrong.
-                    # But let's trust Content-Type or file extension in URL mostly.
-                    pass
-
-            if is_pdf:
-                with open(save_path, "wb") as pdf_file:
-                    for chunk in response.iter_content(chunk_size=128):
-                        pdf_file.write(chunk)
-                logging.info(f"[SUCCESS] PDF has been downloaded from URL: {save_path}")
-                return True
-            else:
                 logging.info(
                     f"[FAILED] URL content is not PDF: {url} (Type: {response.headers.get('Content-Type')})"
                 )
                 return False
-        else:
-            logging.info(
-                f"[FAILED] Download failed from URL (status: {response.status_code}): {url}"
-            )
-            return False
+
+            if not _write_stream(response, save_path, first_chunk, cancel, progress):
+                logging.info(f"Download cancelled: {url}")
+                return False
+            logging.info(f"[SUCCESS] PDF has been downloaded from URL: {save_path}")
+            return True
 
     except requests.Timeout:
         logging.info(f"[FAILED] Request timed out for {url}.")
@@ -56,111 +95,87 @@ def download_file(url, save_path):
         return False
 
 
-# --- Source Specific Downloaders ---
+def is_pdf_file(path):
+    """Check that a downloaded file is non-empty and starts with the PDF magic."""
+    try:
+        with open(path, "rb") as file:
+            return file.read(5).startswith(b"%PDF")
+    except OSError:
+        return False
 
 
-def download_arxiv_direct(cit, save_path):
-    """Try to convert arXiv abstract URL to PDF URL."""
-    url = cit.get("link", "")
-    if "arxiv.org/abs" in url:
-        pdf_url = url.replace("arxiv.org/abs", "arxiv.org/pdf")
-        if not pdf_url.endswith(
-            ".pdf"
-        ):  # Sometimes pdf link needs .pdf but arxiv works without usually
-            # arXiv pdf links usually don't need .pdf suffix but let's be safe if redirection handles it
-            pass
-        return download_file(pdf_url, save_path)
-    return False
+# --- Source Specific Downloaders ---
 
 
-def download_acm(cit, save_path):
-    """Download from ACM Digital Library."""
-    url = cit.get("link", "")
-    pdf_url = None
-    if "dl.acm.org/doi/abs" in url:
-        pdf_url = url.replace("dl.acm.org/doi/abs", "dl.acm.org/doi/pdf")
-    elif "dl.acm.org/doi/pdf" in url:
-        pdf_url = url
-
-    if pdf_url:
-        return download_file(pdf_url, save_path)
+def download_rewritten(cit, save_path, cancel=None, progress=None):
+    """Rewrite known landing pages (arXiv, ACM, IEEE, OpenReview, ...) to PDF URLs."""
+    # The provided PDF link itself is already tried first by get_pdf
+    tried = {cit.get("PDF", "")}
+    for field in ("link", "PDF"):
+        rule, pdf_url = rewrite_pdf_url(cit.get(field, ""))
+        if not pdf_url or pdf_url in tried:
+            continue
+        tried.add(pdf_url)
+        logging.info(f"Rewrote {field} with rule [{rule}]: {pdf_url}")
+        if download_file(pdf_url, save_path, cancel, progress):
+            return True
     return False
 
 
-def download_ieee(cit, save_path):
-    """Download from IEEE Xplore."""
-    url = cit.get("link", "")
-    if (
-        "ieeexplore.ieee.org/abstract/document/" not in url
-        and "ieeexplore.ieee.org/document/" not in url
-    ):
-        return False
-
-    match = re.search(r"document/(\d+)", url)
-    if not match:
-        return False
-
-    ieee_number = match.group(1)
-    pdf_url = (
-        f"https://ieeexplore.ieee.org/stampPDF/getPDF.jsp?tp=&arnumber={ieee_number}"
-    )
-    return download_file(pdf_url, save_path)
-
-
-def download_springer(cit, save_path):
-    """Download from Springer (Article or Chapter)."""
+def download_landing_page(cit, save_path, cancel=None, progress=None):
+    """
+    Fetch the page link, saving it directly if it is already a PDF, otherwise
+    read only its <head> and follow the PDF link it declares
+    (citation_pdf_url, <link rel=alternate type=application/pdf>, og: tags).
+    Works for Springer, Elsevier, Wiley, OJS and most other publishers.
+    """
     url = cit.get("link", "")
-    if "link.springer.com" not in url:
+    if not url or url == cit.get("PDF", ""):
         return False
 
     try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-        response = requests.get(url, headers=headers, timeout=TIMEOUT)
-        if response.status_code != 200:
-            return False
-
-        soup = BeautifulSoup(response.text, "html.parser")
-
-        # Try finding PDF link in different common Springer layouts
-        pdf_link = None
-
-        # Method 1: c-pdf-container
-        div_tag = soup.find("div", class_="c-pdf-container")
-        if div_tag:
-            a_tag = div_tag.find("a", href=True)
-            if a_tag:
-                pdf_link = a_tag["href"]
-
-        # Method 2: c-article-access-provider (Chapters)
-        if not pdf_link:
-            div_tag = soup.find("div", class_="c-article-access-provider")
-            if div_tag:
-                a_tag = div_tag.find("a", href=True)
-                if a_tag:
-                    pdf_link = a_tag["href"]
+        with get_host_limiter().slot(url), requests.get(
+            url, headers=HEADERS, stream=True, timeout=TIMEOUT
+        ) as response:
+            if response.status_code != 200:
+                logging.info(
+                    f"[FAILED] Landing page failed (status: {response.status_code}): {url}"
+                )
+                return False
 
-        if pdf_link:
-            if not pdf_link.startswith("http"):
-                pdf_link = "http://link.springer.com" + pdf_link
-            return download_file(pdf_link, save_path)
+            first_chunk = next(response.iter_content(chunk_size=1024), b"")
+            content_type = response.headers.get("Content-Type", "")
+            if "application/pdf" in content_type or first_chunk.startswith(b"%PDF"):
+                if not _write_stream(
+                    response, save_path, first_chunk, cancel, progress
+                ):
+                    return False
+                logging.info(f"[SUCCESS] Page link is a PDF: {save_path}")
+                return True
 
-    except Exception as e:
-        logging.info(f"[FAILED] Error parsing Springer page: {e}")
+            head_html = read_head(response, first_chunk)
+            pdf_links = extract_pdf_links(head_html, response.url)
+    except requests.RequestException as e:
+        logging.info(f"[FAILED] Network error for {url}: {e}")
+        return False
 
+    for pdf_link in pdf_links:
+        logging.info(f"Found PDF link in landing page head: {pdf_link}")
+        if download_file(pdf_link, save_path, cancel, progress):
+            return True
     return False
 
 
-def download_pdf_in_arxiv_search(title, abstract, save_path):
+def download_pdf_in_arxiv_search(
+    title, abstract, save_path, cancel=None, progress=None
+):
     """Search and download PDF from arXiv (Fallback)."""
-    client = arxiv.Client()
-
     try:
         # Enclose title in quotes to perform an exact phrase search for the title
-        search = arxiv.Search(query=f'ti:"{title}"', max_results=3)
-        # Handle empty iterator safely
-        results = list(client.results(search))
+        with get_host_limiter().slot(ARXIV_API_URL):
+            if cancel is not None and cancel.is_set():
+                return False
+            results = search_arxiv(f'ti:"{title}"', 3)
         if not results:
             logging.info(f"[FAILED] find nothing in arXiv search for {title}.")
             return False
@@ -169,75 +184,143 @@ def download_pdf_in_arxiv_search(title, abstract, save_path):
         logging.error(f"[FAILED] Error searching arXiv: {e}")
         return False
 
-    ismatch = are_strings_almost_matching(title, result.title, 85)
+    ismatch = are_strings_almost_matching(title, result.title, ARXIV_MATCH_THRESHOLD)
 
     if ismatch:
-        try:
-            result.download_pdf(
-                dirpath=os.path.dirname(save_path), filename=os.path.basename(save_path)
-            )
-            logging.info(
-                f"[SUCCESS] PDF has been downloaded from arXiv search: {save_path}"
-            )
-            return True
-        except Exception as e:
-            logging.info(f"[FAILED] Network error downloading from arXiv search: {e}")
+        if cancel is not None and cancel.is_set():
             return False
+        logging.info(f"Found {title} in arXiv search: {result.pdf_url}")
+        return download_file(result.pdf_url, save_path, cancel, progress)
     else:
         logging.info("[FAILED] Found result in arXiv but title mismatch.")
         return False
 
 
-def get_pdf(cit, pth):
-    """Try to get PDF from various sources."""
+def download_arxiv(cit, save_path, arxiv_ids=None, cancel=None, progress=None):
+    """Download from arXiv, by known ID if possible, otherwise by title search."""
+    title = cit.get("title", "")
+    abstract = cit.get("abstract", "")
+    arxiv_id = extract_arxiv_id(cit)
+    if not arxiv_id and arxiv_ids and title in arxiv_ids:
+        arxiv_id = arxiv_ids[title]
+        if not arxiv_id:
+            logging.info(f"[FAILED] find nothing in batched arXiv search for {title}.")
+            return False
+    if arxiv_id:
+        return download_file(arxiv_pdf_url(arxiv_id), save_path, cancel, progress)
+    if title:
+        return download_pdf_in_arxiv_search(
+            title, abstract, save_path, cancel, progress
+        )
+    logging.warning("No title provided for citation, skipping arXiv search.")
+    return False
+
+
+def pdf_sources(cit, arxiv_ids=None):
+    """Candidate sources for a citation's PDF, most reliable first.
 
-    # 1. Try explicit PDF link provided in citation
+    Each source is (name, fn) where fn(save_path, cancel, progress) -> bool.
+    """
+    sources = []
+
+    # 1. Explicit PDF link provided in citation
     link = cit.get("PDF", "")
     if link:
-        logging.info(
-            "+==============try to get pdf from provided PDF link=============+"
-        )
-        if download_file(link, pth):
-            logging.info(f"[SUCCESS] Success with provided PDF link")
-            return True
-        else:
-            logging.info(f"[FAILED] Failed with provided PDF link")
+        sources.append(("provided PDF link", partial(download_file, link)))
 
-    # 2. Try specialized downloaders based on the 'link' (Page Link)
-    logging.info("+==============try to get pdf from page link=============+")
+    # 2. Specialized downloaders based on the 'link' (Page Link)
+    sources.append(("download_rewritten", partial(download_rewritten, cit)))
+    sources.append(("download_landing_page", partial(download_landing_page, cit)))
 
-    downloaders = [
-        download_arxiv_direct,  # Fast check if link is arxiv abs
-        download_acm,
-        download_ieee,
-        download_springer,
-    ]
+    # 3. Fallback: arXiv
+    sources.append(
+        ("download_arxiv", partial(download_arxiv, cit, arxiv_ids=arxiv_ids))
+    )
+    return sources
+
+
+def race_sources(sources, pth, hedge_delay=HEDGE_DELAY):
+    """
+    Hedged download: start the first source, and start the next one whenever
+    hedge_delay seconds pass without any running source receiving bytes, or a
+    running source fails. The first verified PDF wins, the others are cancelled.
+    """
+    cancel = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=len(sources))
+    pending = list(enumerate(sources))
+    running = {}  # future -> (name, temp path, progress event)
+
+    def launch():
+        i, (name, fn) = pending.pop(0)
+        logging.info(f"+==============hedged: start {name}=============+")
+        tmp_path = f"{pth}.part{i}"
+        progress = threading.Event()
+
+        def discard(_):
+            # Losers finishing after cancellation clean up their own temp file
+            if cancel.is_set():
+                _remove_quietly(tmp_path)
+
+        future = pool.submit(fn, tmp_path, cancel=cancel, progress=progress)
+        future.add_done_callback(discard)
+        running[future] = (name, tmp_path, progress)
 
-    for downloader in downloaders:
+    try:
+        launch()
+        while running:
+            done, _ = wait(running, timeout=hedge_delay, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, tmp_path, _ = running.pop(future)
+                try:
+                    ok = future.result()
+                except Exception as e:
+                    logging.info(f"[FAILED] {name} failed: {e}")
+                    ok = False
+                if ok and is_pdf_file(tmp_path):
+                    os.replace(tmp_path, pth)
+                    cancel.set()
+                    logging.info(f"[SUCCESS] Success with {name} (hedged)")
+                    return True
+                logging.info(f"[FAILED] Failed with {name}")
+                _remove_quietly(tmp_path)
+
+            stalled = not any(progress.is_set() for _, _, progress in running.values())
+            if pending and (done or stalled):
+                launch()
+        return False
+    finally:
+        cancel.set()
+        for future, (_, tmp_path, _) in running.items():
+            if future.done():
+                _remove_quietly(tmp_path)
+        pool.shutdown(wait=False)
+
+
+def get_pdf(cit, pth, arxiv_ids=None, hedged=None):
+    """Try to get PDF from various sources.
+
+    arxiv_ids maps titles to arXiv IDs resolved in batch beforehand
+    (see arxiv_resolver.resolve_arxiv_ids). Titles present in it are not
+    searched again one by one.
+
+    With hedged=True the sources are raced (see race_sources) instead of
+    being tried strictly one after another. None uses config.HEDGED_DOWNLOAD.
+    """
+    sources = pdf_sources(cit, arxiv_ids)
+    if hedged is None:
+        hedged = HEDGED_DOWNLOAD
+    if hedged:
+        return race_sources(sources, pth)
+
+    for name, source in sources:
+        logging.info(f"+==============try to get pdf with {name}=============+")
         try:
-            if downloader(cit, pth):
-                logging.info(f"[SUCCESS] Success with {downloader.__name__}")
+            if source(pth):
+                logging.info(f"[SUCCESS] Success with {name}")
                 return True
             else:
-                logging.info(f"[FAILED] Failed with {downloader.__name__}")
+                logging.info(f"[FAILED] Failed with {name}")
         except Exception as e:
-            logging.info(f"[FAILED] {downloader.__name__} failed: {e}")
-
-    # 3. Fallback: Try general link as a direct PDF download (sometimes link is a PDF)
-    page_link = cit.get("link", "")
-    if page_link and page_link != link:
-        logging.info("+==============try to download page link as PDF=============+")
-        if download_file(page_link, pth):
-            return True
-
-    # 4. Fallback: Search arXiv
-    logging.info("+==============search pdf in arxiv=============+")
-    title = cit.get("title", "")
-    abstract = cit.get("abstract", "")
-    if title:
-        if download_pdf_in_arxiv_search(title, abstract, pth):
-            return True
-    else:
-        logging.warning("No title provided for citation, skipping arXiv search.")
+            logging.info(f"[FAILED] {name} failed: {e}")
 
     return False
@@ -1,16 +1,44 @@
+import hashlib
 import json
 import os
 import logging
+from concurrent.futures import ProcessPoolExecutor
 import docx
 from docx import Document
 from docx.shared import Pt, RGBColor
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
 from docx.oxml import OxmlElement
 
-from utils import get_filename, list_data_in_directory, are_strings_almost_matching
+from utils import (
+    get_filename,
+    list_data_in_directory,
+    setup_logging,
+    LocalPdfIndex,
+)
 from .downloader import get_pdf
+from .model import CitationEntry
+from .ooxml_writer import OoxmlBuilder
+from .host_limiter import (
+    PER_HOST_CONCURRENCY,
+    HostLimiter,
+    HostLimiterManager,
+    set_host_limiter,
+)
+from .arxiv_resolver import extract_arxiv_id, resolve_arxiv_ids
+from .validator import quarantined_filenames, validate_pdf
+import config
 from config import PAPER_LIST_DIR
 
+# Save the in-memory document every K entries (0: only once at the end)
+DOCX_CHECKPOINT_EVERY = getattr(config, "DOCX_CHECKPOINT_EVERY", 0)
+# Rendering engine: "python-docx", or "ooxml" to write the .docx directly
+DOCX_ENGINE = getattr(config, "DOCX_ENGINE", "python-docx")
+
+# Bump when the report layout or the local PDF matching changes so that
+# manifests force a rebuild
+GENERATOR_VERSION = "2"
+MANIFEST_FILE = ".docx_manifest.json"
+
 
 def display_cit(cit):
     logging.info(
@@ -85,67 +113,116 @@ def get_or_create_hyperlink_style(d):
     return "Hyperlink"
 
 
-def get_locallink(cit, pdf_list):
-    # paper_file=get_filename(paper.title)
-    for pdf in pdf_list:
-        ismatch = are_strings_almost_matching(cit["filename"], pdf[:-4], threshold=90)
-        if ismatch:
-            return pdf
-    return ""
-
-
-def input_docx(cit, doc_pth, is_pdf, pdf_list=None):
-    if pdf_list is None:
-        pdf_list = []
-
-    logging.info("+======writing item======+")
-
-    doc = Document(doc_pth)
-    is_written = bool(len(doc.paragraphs))
+def write_entry(doc, entry, is_first):
+    """Append one citation entry as a paragraph to an in-memory document."""
     para = doc.add_paragraph()
     # set the space before the paragraph
-    if is_written:
+    if not is_first:
         para.paragraph_format.space_before = Pt(16)
     # set the first line indent
     para.paragraph_format.first_line_indent = Pt(0)
     # set the hanging indent
     para.paragraph_format.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
 
-    line1_text = cit["title"] + "\n"
-    if is_pdf:
-        line1_link = cit["filename"] + ".pdf"
-    else:
-        pdf_link = get_locallink(cit, pdf_list)
-        if pdf_link:
-            line1_link = pdf_link
-        else:
-            line0 = "[PDF not downloaded]\n"
-            run0 = para.add_run(line0)
-            run0.font.name = "Arial"
-            run0.font.size = Pt(12)
-            run0.font.color.rgb = RGBColor(200, 0, 0)  # red
-            line1_link = cit["link"]
+    line1_text = entry.title + "\n"
+    if not entry.has_pdf:
+        line0 = "[PDF not downloaded]\n"
+        run0 = para.add_run(line0)
+        run0.font.name = "Arial"
+        run0.font.size = Pt(12)
+        run0.font.color.rgb = RGBColor(200, 0, 0)  # red
 
-    add_hyperlink(para, line1_text, line1_link)
+    add_hyperlink(para, line1_text, entry.link)
 
-    line2 = cit["info"] + "\n"
+    line2 = entry.info + "\n"
     run2 = para.add_run(line2)
     run2.font.name = "Arial"
     run2.font.size = Pt(10)
     run2.font.color.rgb = RGBColor(0, 102, 33)  # green
 
-    line3 = cit["abstract"]
+    line3 = entry.abstract
     run3 = para.add_run(line3)
     run3.font.name = "Arial"
     run3.font.size = Pt(10)
     run3.font.color.rgb = RGBColor(34, 34, 34)  # black
 
-    doc.save(doc_pth)
 
-    logging.info("+======item done======+")
+class DocxBuilder:
+    """
+    Keeps one Document in memory for a paper and saves it once at the end,
+    instead of re-opening and re-saving the .docx for every citation.
+    With checkpoint_every=K the document is also saved every K entries so
+    that a crash during a long download run loses little work.
+    """
+
+    def __init__(self, doc_pth, checkpoint_every=DOCX_CHECKPOINT_EVERY):
+        self.doc_pth = doc_pth
+        self.checkpoint_every = checkpoint_every
+        self.doc = Document()
+        self.num_entries = 0
+
+    def add_entry(self, entry):
+        logging.info("+======writing item======+")
+        write_entry(self.doc, entry, is_first=self.num_entries == 0)
+        self.num_entries += 1
+        if self.checkpoint_every and self.num_entries % self.checkpoint_every == 0:
+            self.save()
+        logging.info("+======item done======+")
+
+    def save(self):
+        self.doc.save(self.doc_pth)
+
+
+def docx_inputs_hash(paper_dir, json_path, get_pdf_flag, engine):
+    """Hash everything a paper's docx depends on: citations, PDF set, generator."""
+    digest = hashlib.sha256()
+    digest.update(f"{GENERATOR_VERSION}\0{get_pdf_flag}\0{engine}\0".encode("utf-8"))
+    with open(json_path, "rb") as file:
+        digest.update(file.read())
+    for name in sorted(os.listdir(paper_dir)):
+        if name.endswith(".pdf"):
+            size = os.path.getsize(os.path.join(paper_dir, name))
+            digest.update(f"{name}\0{size}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def load_manifest(paper_dir):
+    manifest_path = os.path.join(paper_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(paper_dir, manifest):
+    with open(os.path.join(paper_dir, MANIFEST_FILE), "w", encoding="utf-8") as file:
+        json.dump(manifest, file, ensure_ascii=False, indent=2)
+
+
+def docx_worker(
+    paper_title,
+    get_pdf_flag=True,
+    hedged=None,
+    engine=None,
+    force=False,
+    validate=False,
+    retry_quarantined=False,
+):
+    """
+    Write the docx of one paper and return its summary statistics.
 
+    The docx is skipped when the manifest shows that its inputs (citation
+    list, set of local PDFs, generator version) are unchanged since it was
+    last written, unless force=True. In download mode it is rebuilt while
+    citations still lack a PDF, since a new attempt may find them.
 
-def docx_worker(paper_title, get_pdf_flag=True):
+    In download mode, citations whose PDF was quarantined by the validator
+    are not downloaded again unless retry_quarantined=True. With
+    validate=True every new download is checked before it is linked.
+    """
     print(
         f"***++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++***"
     )
@@ -164,6 +241,12 @@ def docx_worker(paper_title, get_pdf_flag=True):
         cit_list = []
 
     isPDF = 0
+    stats = {
+        "paper": dir_name,
+        "citations": len(cit_list),
+        "with_pdf": 0,
+        "downloaded": 0,
+    }
 
     logging.info("\n\n\n")
     logging.info(
@@ -179,23 +262,59 @@ def docx_worker(paper_title, get_pdf_flag=True):
             f"***++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++***"
         )
         print()
-        return
+        return stats
 
     if get_pdf_flag:
         doc_pth = os.path.join(PAPER_LIST_DIR, dir_name, f"(temp) {dir_name}.docx")
     else:
         doc_pth = os.path.join(PAPER_LIST_DIR, dir_name, f"{dir_name}.docx")
 
+    paper_dir = os.path.join(PAPER_LIST_DIR, dir_name)
+    engine = engine or DOCX_ENGINE
+    doc_name = os.path.basename(doc_pth)
+    manifest = load_manifest(paper_dir)
+    previous = manifest.get(doc_name)
+    if (
+        not force
+        and previous
+        and os.path.exists(doc_pth)
+        and previous["inputs"]
+        == docx_inputs_hash(paper_dir, json_path, get_pdf_flag, engine)
+        and not (get_pdf_flag and previous["stats"]["with_pdf"] < len(cit_list))
+    ):
+        logging.info(f"Paper: [{dir_name}] is unchanged, skipping.")
+        print(f"Paper: [{dir_name}] is unchanged, skipping.\n")
+        return dict(previous["stats"], downloaded=0, skipped=True)
+
     # Always overwrite for fresh generation
-    doc = Document()
-    doc.save(doc_pth)
+    if engine == "ooxml":
+        builder = OoxmlBuilder(doc_pth, DOCX_CHECKPOINT_EVERY)
+    else:
+        builder = DocxBuilder(doc_pth)
 
-    pdf_files = []
+    local_pdfs = {}
     if not get_pdf_flag:
-        dir_path = os.path.dirname(doc_pth)
-        # Record downloaded pdf files for relative address modification
-        if os.path.exists(dir_path):
-            pdf_files = [file for file in os.listdir(dir_path) if file.endswith(".pdf")]
+        # Match downloaded pdf files for relative address modification
+        local_pdfs = LocalPdfIndex.from_dir(paper_dir).match_all(
+            cit["filename"] for cit in cit_list
+        )
+
+    arxiv_ids = None
+    quarantined = set()
+    if get_pdf_flag:
+        if not retry_quarantined:
+            quarantined = quarantined_filenames(paper_dir)
+        # Resolve the arXiv fallback of all missing PDFs in a few batched queries
+        missing_titles = [
+            cit.get("title", "")
+            for cit in cit_list
+            if not os.path.exists(
+                os.path.join(PAPER_LIST_DIR, dir_name, f"{cit['filename']}.pdf")
+            )
+            and cit["filename"] not in quarantined
+            and not extract_arxiv_id(cit)
+        ]
+        arxiv_ids = resolve_arxiv_ids(missing_titles)
 
     for cit in cit_list:
         display_cit(cit)
@@ -206,17 +325,41 @@ def docx_worker(paper_title, get_pdf_flag=True):
             if os.path.exists(pdf_pth) and os.path.getsize(pdf_pth) > 0:
                 logging.info(f"PDF already exists at {pdf_pth}, skipping download.")
                 isPDF = True
+            elif cit["filename"] in quarantined:
+                logging.info(
+                    f"PDF of {cit['filename']} was quarantined, skipping download "
+                    "(use --retry-quarantined to try again)."
+                )
+                isPDF = False
             else:
-                isPDF = get_pdf(cit, pdf_pth)
-
-            input_docx(cit, doc_pth, isPDF)
+                isPDF = get_pdf(cit, pdf_pth, arxiv_ids=arxiv_ids, hedged=hedged)
+                if isPDF and validate:
+                    isPDF = validate_pdf(
+                        paper_dir, cit["filename"], cit.get("title", "")
+                    )
+                stats["downloaded"] += bool(isPDF)
+
+            entry = CitationEntry.from_citation(
+                cit, f"{cit['filename']}.pdf" if isPDF else ""
+            )
         else:
-            input_docx(cit, doc_pth, False, pdf_list=pdf_files)
+            entry = CitationEntry.from_citation(
+                cit, local_pdfs.get(cit["filename"], "")
+            )
+        builder.add_entry(entry)
+        stats["with_pdf"] += entry.has_pdf
 
         logging.info(
             "+++===================================================================================================+++\n"
         )
 
+    builder.save()
+    manifest[doc_name] = {
+        "inputs": docx_inputs_hash(paper_dir, json_path, get_pdf_flag, engine),
+        "stats": stats,
+    }
+    save_manifest(paper_dir, manifest)
+
     print(
         f"***++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++***"
     )
@@ -226,9 +369,51 @@ def docx_worker(paper_title, get_pdf_flag=True):
     print(
         f"***++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++***\n"
     )
+    return stats
 
 
-def generate_all_docx(paper_ls, get_pdf_flag=True):
+def _init_worker(host_semaphores):
+    """Process pool initializer: own log file, shared per-host limiter."""
+    setup_logging(f"docx_gen-worker{os.getpid()}")
+    set_host_limiter(HostLimiter(shared=host_semaphores))
+
+
+def print_summary(stats_ls):
+    print(
+        "+++===================================================================================================+++"
+    )
+    print(f"{'paper':<70} {'citations':>9} {'PDF':>5} {'new':>5} {'missing':>7}")
+    for stats in stats_ls:
+        missing = stats["citations"] - stats["with_pdf"]
+        print(
+            f"{stats['paper'][:70]:<70} {stats['citations']:>9} {stats['with_pdf']:>5} "
+            f"{stats['downloaded']:>5} {missing:>7}"
+        )
+    total = {
+        key: sum(stats[key] for stats in stats_ls)
+        for key in ("citations", "with_pdf", "downloaded")
+    }
+    print(
+        f"{'TOTAL (' + str(len(stats_ls)) + ' papers)':<70} {total['citations']:>9} "
+        f"{total['with_pdf']:>5} {total['downloaded']:>5} "
+        f"{total['citations'] - total['with_pdf']:>7}"
+    )
+    skipped = sum(1 for stats in stats_ls if stats.get("skipped"))
+    if skipped:
+        print(f"{skipped} unchanged papers were skipped (use --force to rebuild).")
+    logging.info(f"Summary: {total} over {len(stats_ls)} papers, {skipped} skipped")
+
+
+def generate_all_docx(
+    paper_ls,
+    get_pdf_flag=True,
+    hedged=None,
+    engine=None,
+    jobs=1,
+    force=False,
+    validate=False,
+    retry_quarantined=False,
+):
     print()
     print(f"The {str(len(paper_ls))} docx documents to be written:")
     print(paper_ls)
@@ -247,8 +432,34 @@ def generate_all_docx(paper_ls, get_pdf_flag=True):
     )
     logging.info("\n\n\n")
 
-    for paper in paper_ls:
-        docx_worker(paper, get_pdf_flag=get_pdf_flag)
+    worker_kwargs = dict(
+        get_pdf_flag=get_pdf_flag,
+        hedged=hedged,
+        engine=engine,
+        force=force,
+        validate=validate,
+        retry_quarantined=retry_quarantined,
+    )
+    if jobs > 1:
+        # Papers are independent. Each worker logs to its own file, and
+        # downloads share per-host semaphores across processes. Results are
+        # collected in paper order whatever order workers finish in.
+        with HostLimiterManager() as manager:
+            host_semaphores = manager.HostSemaphores(PER_HOST_CONCURRENCY)
+            with ProcessPoolExecutor(
+                max_workers=jobs,
+                initializer=_init_worker,
+                initargs=(host_semaphores,),
+            ) as pool:
+                futures = [
+                    pool.submit(docx_worker, paper, **worker_kwargs)
+                    for paper in paper_ls
+                ]
+                stats_ls = [future.result() for future in futures]
+    else:
+        stats_ls = [docx_worker(paper, **worker_kwargs) for paper in paper_ls]
+
+    print_summary(stats_ls)
     print("All docx documents have been written successfully.")
 
     logging.info("\n\n\n")
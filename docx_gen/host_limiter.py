@@ -0,0 +1,76 @@
+import threading
+from contextlib import contextmanager
+from multiprocessing.managers import BaseManager
+from urllib.parse import urlsplit
+
+import config
+
+# Maximum number of simultaneous requests to the same host
+PER_HOST_CONCURRENCY = getattr(config, "PER_HOST_CONCURRENCY", 2)
+
+
+class HostSemaphores:
+    """host -> semaphore, each created on first use under a lock."""
+
+    def __init__(self, per_host=PER_HOST_CONCURRENCY):
+        self.per_host = per_host
+        self._lock = threading.Lock()
+        self._semaphores = {}
+
+    def _get(self, host):
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.per_host)
+            return self._semaphores[host]
+
+    def acquire(self, host):
+        self._get(host).acquire()
+
+    def release(self, host):
+        self._get(host).release()
+
+
+class HostLimiterManager(BaseManager):
+    """Manager serving one HostSemaphores shared by several processes.
+
+    The semaphores live in the manager process: acquire() blocks there, on
+    the connection of the calling thread.
+    """
+
+
+HostLimiterManager.register("HostSemaphores", HostSemaphores)
+
+
+class HostLimiter:
+    """Cap the number of concurrent requests per host.
+
+    By default semaphores are per-process. To share the limit between
+    processes, pass `shared`: a HostSemaphores proxy created by a
+    HostLimiterManager. Every process then waits on the same semaphore for
+    a host, and unrelated hosts never share one.
+    """
+
+    def __init__(self, per_host=PER_HOST_CONCURRENCY, shared=None):
+        self.per_host = per_host
+        self.semaphores = shared if shared is not None else HostSemaphores(per_host)
+
+    @contextmanager
+    def slot(self, url):
+        host = urlsplit(url).netloc.lower()
+        self.semaphores.acquire(host)
+        try:
+            yield
+        finally:
+            self.semaphores.release(host)
+
+
+_limiter = HostLimiter()
+
+
+def get_host_limiter():
+    return _limiter
+
+
+def set_host_limiter(limiter):
+    global _limiter
+    _limiter = limiter
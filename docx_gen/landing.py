@@ -0,0 +1,70 @@
+import re
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+# Stop reading a landing page after </head> or this many bytes
+MAX_HEAD_BYTES = 512 * 1024
+
+# Meta tags publishers use for a direct PDF link (Highwire Press / bepress)
+PDF_META_NAMES = ("citation_pdf_url", "bepress_citation_pdf_url")
+
+_HEAD_END_RE = re.compile(rb"</head\s*>", re.IGNORECASE)
+_HEAD_TAGS = SoupStrainer(["meta", "link"])
+
+
+def read_head(response, first_chunk=b"", chunk_size=8192):
+    """Read a streamed response only up to the end of its <head>."""
+    data = bytearray(first_chunk)
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        data.extend(chunk)
+        # Only the tail can contain a new </head>
+        if _HEAD_END_RE.search(data, max(0, len(data) - len(chunk) - 8)):
+            break
+        if len(data) >= MAX_HEAD_BYTES:
+            break
+    match = _HEAD_END_RE.search(data)
+    if match:
+        del data[match.end() :]
+    return bytes(data).decode(response.encoding or "utf-8", errors="replace")
+
+
+def _looks_like_pdf(url):
+    url = url.lower()
+    return url.endswith(".pdf") or "/pdf" in url or "pdf?" in url
+
+
+def extract_pdf_links(head_html, base_url):
+    """
+    Return candidate PDF URLs declared in a page head, most reliable first:
+    citation_pdf_url meta tags, <link rel=alternate type=application/pdf>,
+    then og: tags pointing to a PDF.
+    """
+    soup = BeautifulSoup(head_html, "html.parser", parse_only=_HEAD_TAGS)
+
+    meta_links, alternate_links, og_links = [], [], []
+    for tag in soup.find_all("meta"):
+        name = (tag.get("name") or "").lower()
+        prop = (tag.get("property") or "").lower()
+        content = (tag.get("content") or "").strip()
+        if not content:
+            continue
+        if name in PDF_META_NAMES:
+            meta_links.append(content)
+        elif prop.startswith("og:") and _looks_like_pdf(content):
+            og_links.append(content)
+
+    for tag in soup.find_all("link"):
+        rel = tag.get("rel") or []
+        if isinstance(rel, str):
+            rel = rel.split()
+        if "alternate" in rel and tag.get("type") == "application/pdf":
+            if tag.get("href"):
+                alternate_links.append(tag["href"].strip())
+
+    links = []
+    for link in meta_links + alternate_links + og_links:
+        link = urljoin(base_url, link)
+        if link not in links:
+            links.append(link)
+    return links
@@ -0,0 +1,97 @@
+import json
+import os
+
+from utils import LocalPdfIndex
+
+
+class CitationEntry:
+    """One citing paper as rendered in a report."""
+
+    def __init__(self, title, info, abstract, link, has_pdf, snippets=None):
+        self.title = title
+        self.info = info
+        self.abstract = abstract
+        # Local PDF filename if has_pdf, otherwise the online page link
+        self.link = link
+        self.has_pdf = has_pdf
+        # Analyzed citation snippets ({"Text", "Analysis", "Positive"}) from
+        # comment_analysis/all_snippets.json, if the paper was analyzed
+        self.snippets = snippets or []
+
+    def __repr__(self):
+        return f"CitationEntry(title={self.title}, link={self.link}, has_pdf={self.has_pdf})"
+
+    @classmethod
+    def from_citation(cls, cit, local_pdf=""):
+        """Build an entry from a citation_info.json item and its local PDF, if any."""
+        if local_pdf:
+            link, has_pdf = local_pdf, True
+        else:
+            link, has_pdf = cit["link"], False
+        return cls(cit["title"], cit["info"], cit["abstract"], link, has_pdf)
+
+
+class PaperReport:
+    """A cited paper with the entries of the papers citing it."""
+
+    def __init__(self, name, paper_dir, entries):
+        self.name = name
+        self.paper_dir = paper_dir
+        self.entries = entries
+
+    def __repr__(self):
+        return f"PaperReport(name={self.name}, entries={len(self.entries)})"
+
+    @property
+    def num_citations(self):
+        return len(self.entries)
+
+    @property
+    def num_pdfs(self):
+        return sum(1 for entry in self.entries if entry.has_pdf)
+
+    @property
+    def coverage(self):
+        """Fraction of citing papers with a local PDF."""
+        return self.num_pdfs / self.num_citations if self.entries else 0.0
+
+    def entry_link(self, entry, base_dir=None):
+        """Link of an entry, local PDFs made relative to base_dir if given."""
+        if entry.has_pdf and base_dir is not None:
+            return os.path.relpath(os.path.join(self.paper_dir, entry.link), base_dir)
+        return entry.link
+
+
+def load_snippets(paper_dir):
+    """{citing paper filename: analyzed snippets} from all_snippets.json."""
+    path = os.path.join(paper_dir, "comment_analysis", "all_snippets.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as file:
+        return {paper["Filename"]: paper["Citations"] for paper in json.load(file)}
+
+
+def load_paper_report(paper_dir, with_snippets=False):
+    """
+    Build a PaperReport from citation_info.json and the PDFs of a folder,
+    and from the comment analysis results if with_snippets is set.
+    """
+    json_path = os.path.join(paper_dir, "citation_info.json")
+    cit_list = []
+    if os.path.exists(json_path):
+        with open(json_path, "r", encoding="utf-8") as file:
+            cit_list = json.load(file)
+
+    local_pdfs = LocalPdfIndex.from_dir(paper_dir).match_all(
+        cit["filename"] for cit in cit_list
+    )
+    entries = [
+        CitationEntry.from_citation(cit, local_pdfs.get(cit["filename"], ""))
+        for cit in cit_list
+    ]
+    if with_snippets:
+        snippets = load_snippets(paper_dir)
+        for cit, entry in zip(cit_list, entries):
+            entry.snippets = snippets.get(cit["filename"], [])
+    name = os.path.basename(os.path.normpath(paper_dir))
+    return PaperReport(name, paper_dir, entries)
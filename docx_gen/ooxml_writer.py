@@ -0,0 +1,374 @@
+"""
+Direct OOXML rendering engine for large reports.
+
+Instead of building paragraphs through python-docx's object model, the
+report is written straight into a .docx zip: all parts except
+word/document.xml are copied from python-docx's default template (so styles,
+theme and page setup are the same as with Document()), word/document.xml is
+streamed from string templates and hyperlink relationships are registered
+in bulk. Layouts match docx_gen.generator.write_entry and author_docx_gen.py;
+CombinedReport puts every paper's citations into one document.
+"""
+
+import os
+import re
+import zipfile
+from functools import lru_cache
+from xml.sax.saxutils import escape, quoteattr
+
+import docx
+
+from .model import CitationEntry
+
+TEMPLATE_PATH = os.path.join(
+    os.path.dirname(docx.__file__), "templates", "default.docx"
+)
+HYPERLINK_REL = (
+    "http://schemas.openxmlformats.org/officeDocument/2006/relationships/hyperlink"
+)
+
+# Character style python-docx adds on the first hyperlink (get_or_create_hyperlink_style)
+HYPERLINK_STYLES = (
+    '<w:style w:type="character" w:styleId="DefaultCharacterFont" w:default="1">'
+    '<w:name w:val="Default Character Font"/><w:uiPriority w:val="1"/><w:semiHidden/>'
+    "<w:unhideWhenUsed/></w:style>"
+    '<w:style w:type="character" w:styleId="Hyperlink"><w:name w:val="Hyperlink"/>'
+    '<w:basedOn w:val="DefaultCharacterFont"/><w:unhideWhenUsed/><w:rPr>'
+    '<w:rFonts w:ascii="Arial" w:hAnsi="Arial"/><w:color w:val="0000FF"/>'
+    '<w:sz w:val="26"/><w:u w:val="single"/></w:rPr></w:style>'
+)
+
+# Characters that are not allowed in XML 1.0
+_INVALID_XML_RE = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+# --- citation report (docx_gen.generator) ---
+
+ENTRY_P = '<w:p><w:pPr>{spacing}<w:ind w:firstLine="0"/><w:jc w:val="left"/></w:pPr>{runs}</w:p>'
+ENTRY_SPACING = '<w:spacing w:before="320"/>'
+MISSING_RUN = (
+    '<w:r><w:rPr><w:rFonts w:ascii="Arial" w:hAnsi="Arial"/><w:color w:val="C80000"/>'
+    '<w:sz w:val="24"/></w:rPr><w:t>[PDF not downloaded]</w:t><w:br/></w:r>'
+)
+TITLE_LINK = (
+    '<w:hyperlink r:id="{rid}"><w:r><w:rPr><w:rStyle w:val="Hyperlink"/></w:rPr>'
+    "{text}<w:br/></w:r></w:hyperlink>"
+)
+INFO_RUN = (
+    '<w:r><w:rPr><w:rFonts w:ascii="Arial" w:hAnsi="Arial"/><w:color w:val="006621"/>'
+    '<w:sz w:val="20"/></w:rPr>{text}<w:br/></w:r>'
+)
+ABSTRACT_RUN = (
+    '<w:r><w:rPr><w:rFonts w:ascii="Arial" w:hAnsi="Arial"/><w:color w:val="222222"/>'
+    '<w:sz w:val="20"/></w:rPr>{text}</w:r>'
+)
+
+# --- assignment table (author_docx_gen.py) ---
+
+HEADING_P = '<w:p><w:pPr><w:pStyle w:val="Heading1"/></w:pPr><w:r>{text}</w:r></w:p>'
+TABLE_START = (
+    '<w:tbl><w:tblPr><w:tblStyle w:val="TableGrid"/><w:tblW w:type="auto" w:w="0"/>'
+    '<w:tblLayout w:type="fixed"/><w:tblLook w:firstColumn="1" w:firstRow="1" '
+    'w:lastColumn="0" w:lastRow="0" w:noHBand="0" w:noVBand="1" w:val="04A0"/>'
+    "<w:tblBorders>{borders}</w:tblBorders></w:tblPr><w:tblGrid>{grid}</w:tblGrid>"
+)
+TABLE_BORDER = '<w:{name} w:val="dotted" w:sz="4" w:space="0" w:color="auto"/>'
+TABLE_END = "</w:tbl>"
+CELL = '<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{width}"/></w:tcPr>{paragraph}</w:tc>'
+HEADER_CELL_P = '<w:p><w:pPr><w:jc w:val="center"/></w:pPr><w:r>{text}</w:r></w:p>'
+CENTER_CELL_P = (
+    '<w:p><w:pPr><w:jc w:val="center"/></w:pPr><w:r><w:rPr>'
+    '<w:rFonts w:ascii="Arial" w:hAnsi="Arial"/><w:sz w:val="18"/></w:rPr>{text}</w:r></w:p>'
+)
+INFO_CELL_P = (
+    '<w:p><w:pPr><w:spacing w:line="240" w:lineRule="exact" w:before="0" w:after="0"/>'
+    '</w:pPr><w:hyperlink r:id="{rid}"><w:r><w:rPr><w:color w:val="1A0DAB"/>'
+    '<w:sz w:val="20"/><w:rFonts w:ascii="Arial"/></w:rPr>{title}</w:r></w:hyperlink>'
+    '<w:r><w:rPr><w:sz w:val="18"/></w:rPr><w:br/>{authors}</w:r>'
+    '<w:r><w:rPr><w:sz w:val="18"/></w:rPr><w:br/>{publication}</w:r></w:p>'
+)
+# Column widths in twips: 5 and 0.7 inches
+TABLE_WIDTHS = (7200, 1008, 1008)
+
+# --- combined report (docx_gen.combined) ---
+
+TITLE_P = '<w:p><w:pPr><w:pStyle w:val="Title"/></w:pPr><w:r>{text}</w:r></w:p>'
+PLAIN_P = "<w:p><w:r>{text}</w:r></w:p>"
+TOC_HEADING_P = (
+    '<w:p><w:pPr><w:pStyle w:val="TOCHeading"/></w:pPr><w:r>{text}</w:r></w:p>'
+)
+# Complex field Word fills in when fields are updated (see UPDATE_FIELDS)
+TOC_P = (
+    '<w:p><w:r><w:fldChar w:fldCharType="begin" w:dirty="true"/></w:r>'
+    '<w:r><w:instrText xml:space="preserve"> TOC \\o "1-1" \\h \\z \\u </w:instrText></w:r>'
+    '<w:r><w:fldChar w:fldCharType="separate"/></w:r>'
+    "<w:r>{text}</w:r>"
+    '<w:r><w:fldChar w:fldCharType="end"/></w:r></w:p>'
+)
+UPDATE_FIELDS = '<w:updateFields w:val="true"/>'
+BOOKMARK_HEADING_P = (
+    '<w:p><w:pPr><w:pStyle w:val="Heading1"/><w:pageBreakBefore/></w:pPr>'
+    '<w:bookmarkStart w:id="{id}" w:name="{name}"/><w:r>{text}</w:r>'
+    '<w:bookmarkEnd w:id="{id}"/></w:p>'
+)
+STATS_P = (
+    '<w:p><w:r><w:rPr><w:rFonts w:ascii="Arial" w:hAnsi="Arial"/><w:color w:val="555555"/>'
+    '<w:sz w:val="20"/></w:rPr>{text}</w:r></w:p>'
+)
+ANCHOR_CELL_P = (
+    '<w:p><w:hyperlink w:anchor="{anchor}"><w:r><w:rPr><w:rStyle w:val="Hyperlink"/>'
+    '<w:sz w:val="20"/></w:rPr>{text}</w:r></w:hyperlink></w:p>'
+)
+# Paper, citations, PDFs, coverage
+SUMMARY_WIDTHS = (5760, 1152, 1152, 1152)
+
+
+def text_xml(text):
+    """Render text as <w:t> runs content, turning newlines into <w:br/>."""
+    text = _INVALID_XML_RE.sub("", str(text))
+    parts = []
+    for i, line in enumerate(text.split("\n")):
+        if i:
+            parts.append("<w:br/>")
+        if line:
+            parts.append(f'<w:t xml:space="preserve">{escape(line)}</w:t>')
+    return "".join(parts)
+
+
+@lru_cache(maxsize=1)
+def _template():
+    """Load the template parts once and split document.xml around the body."""
+    with zipfile.ZipFile(TEMPLATE_PATH) as zf:
+        parts = {name: zf.read(name) for name in zf.namelist()}
+    document = parts.pop("word/document.xml").decode("utf-8")
+    body_start = document.index("<w:body>") + len("<w:body>")
+    sect_start = document.index("<w:sectPr", body_start)
+    head, tail = document[:body_start], document[sect_start:]
+    return parts, head, tail
+
+
+class OoxmlDocument:
+    """A .docx written in one pass: body XML chunks plus hyperlink targets."""
+
+    def __init__(self):
+        self.chunks = []
+        self.links = []
+        parts, _, _ = _template()
+        rels = parts["word/_rels/document.xml.rels"].decode("utf-8")
+        used = [int(n) for n in re.findall(r'Id="rId(\d+)"', rels)]
+        self._first_rid = max(used, default=0) + 1
+        # Internal (bookmark) links also need the Hyperlink character style
+        self.has_anchors = False
+        # Ask Word to refresh fields (e.g. the table of contents) on open
+        self.update_fields = False
+
+    def relate(self, url):
+        """Register a hyperlink target, returning its relationship id."""
+        self.links.append(url)
+        return f"rId{self._first_rid + len(self.links) - 1}"
+
+    def append(self, xml):
+        self.chunks.append(xml)
+
+    def save(self, path):
+        parts, head, tail = _template()
+        tmp_path = path + ".tmp"
+        with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as zf:
+            for name, data in parts.items():
+                if name == "word/_rels/document.xml.rels":
+                    data = self._rels_xml(data.decode("utf-8")).encode("utf-8")
+                elif name == "word/styles.xml" and (self.links or self.has_anchors):
+                    data = (
+                        data.decode("utf-8")
+                        .replace("</w:styles>", HYPERLINK_STYLES + "</w:styles>")
+                        .encode("utf-8")
+                    )
+                elif name == "word/settings.xml" and self.update_fields:
+                    data = (
+                        data.decode("utf-8")
+                        .replace("<w:compat>", UPDATE_FIELDS + "<w:compat>")
+                        .encode("utf-8")
+                    )
+                zf.writestr(name, data)
+            with zf.open("word/document.xml", "w") as document:
+                document.write(head.encode("utf-8"))
+                for chunk in self.chunks:
+                    document.write(chunk.encode("utf-8"))
+                document.write(tail.encode("utf-8"))
+        os.replace(tmp_path, path)
+
+    def _rels_xml(self, rels):
+        links = "".join(
+            f'<Relationship Id="rId{self._first_rid + i}" Type="{HYPERLINK_REL}" '
+            f'Target={quoteattr(url)} TargetMode="External"/>'
+            for i, url in enumerate(self.links)
+        )
+        return rels.replace("</Relationships>", links + "</Relationships>")
+
+
+def entry_xml(doc, entry, is_first):
+    """XML of one citation entry, same layout as generator.write_entry."""
+    runs = [MISSING_RUN] if not entry.has_pdf else []
+    runs.append(
+        TITLE_LINK.format(rid=doc.relate(entry.link), text=text_xml(entry.title))
+    )
+    runs.append(INFO_RUN.format(text=text_xml(entry.info)))
+    runs.append(ABSTRACT_RUN.format(text=text_xml(entry.abstract)))
+    return ENTRY_P.format(spacing="" if is_first else ENTRY_SPACING, runs="".join(runs))
+
+
+def write_citation_report(doc_pth, entries):
+    """Write a list of CitationEntry as a citation report .docx."""
+    doc = OoxmlDocument()
+    for i, entry in enumerate(entries):
+        doc.append(entry_xml(doc, entry, is_first=i == 0))
+    doc.save(doc_pth)
+
+
+class OoxmlBuilder:
+    """Drop-in replacement for generator.DocxBuilder using the OOXML engine."""
+
+    def __init__(self, doc_pth, checkpoint_every=0):
+        self.doc_pth = doc_pth
+        self.checkpoint_every = checkpoint_every
+        self.entries = []
+
+    @property
+    def num_entries(self):
+        return len(self.entries)
+
+    def add_entry(self, entry):
+        self.entries.append(entry)
+        if self.checkpoint_every and self.num_entries % self.checkpoint_every == 0:
+            self.save()
+
+    def save(self):
+        write_citation_report(self.doc_pth, self.entries)
+
+
+def _table_start(widths):
+    borders = "".join(
+        TABLE_BORDER.format(name=name)
+        for name in ("top", "left", "bottom", "right", "insideH", "insideV")
+    )
+    grid = "".join(f'<w:gridCol w:w="{w}"/>' for w in widths)
+    return TABLE_START.format(borders=borders, grid=grid)
+
+
+def _header_row(widths, headers):
+    return (
+        "<w:tr>"
+        + "".join(
+            CELL.format(width=w, paragraph=HEADER_CELL_P.format(text=text_xml(h)))
+            for w, h in zip(widths, headers)
+        )
+        + "</w:tr>"
+    )
+
+
+def write_assignment_table(doc_pth, heading, headers, rows):
+    """
+    Write the paper assignment table of author_docx_gen.py.
+    rows are (title, link, authors, publication, cite count, assignee).
+    """
+    doc = OoxmlDocument()
+    doc.append(HEADING_P.format(text=text_xml(heading)))
+    doc.append(_table_start(TABLE_WIDTHS))
+    doc.append(_header_row(TABLE_WIDTHS, headers))
+    for title, link, authors, publication, cited_by, assignee in rows:
+        info = INFO_CELL_P.format(
+            rid=doc.relate(link),
+            title=text_xml(title),
+            authors=text_xml(authors),
+            publication=text_xml(publication),
+        )
+        doc.append(
+            "<w:tr>"
+            + CELL.format(width=TABLE_WIDTHS[0], paragraph=info)
+            + CELL.format(
+                width=TABLE_WIDTHS[1],
+                paragraph=CENTER_CELL_P.format(text=text_xml(cited_by)),
+            )
+            + CELL.format(
+                width=TABLE_WIDTHS[2],
+                paragraph=CENTER_CELL_P.format(text=text_xml(assignee)),
+            )
+            + "</w:tr>"
+        )
+    doc.append(TABLE_END)
+    doc.save(doc_pth)
+
+
+class CombinedReport:
+    """
+    Several paper reports in one document: a title, a table of contents, a
+    summary table linking to each paper, then one bookmarked section per paper.
+    Word fills in the table of contents when the document is opened.
+    """
+
+    SUMMARY_HEADERS = ("论文", "引用数", "PDF", "覆盖率")
+
+    def __init__(self, title, subtitle=""):
+        self.doc = OoxmlDocument()
+        self.doc.has_anchors = True
+        self.doc.update_fields = True
+        self.doc.append(TITLE_P.format(text=text_xml(title)))
+        if subtitle:
+            self.doc.append(PLAIN_P.format(text=text_xml(subtitle)))
+        self.doc.append(TOC_HEADING_P.format(text=text_xml("目录")))
+        self.doc.append(
+            TOC_P.format(
+                text=text_xml("Right-click and choose Update Field to refresh.")
+            )
+        )
+        self.summary_rows = []
+        self.sections = []
+
+    def add_paper(self, report, base_dir=None):
+        """Render one PaperReport; links to local PDFs are made relative to base_dir."""
+        i = len(self.summary_rows)
+        anchor = f"paper_{i + 1}"
+        self.summary_rows.append(
+            "<w:tr>"
+            + CELL.format(
+                width=SUMMARY_WIDTHS[0],
+                paragraph=ANCHOR_CELL_P.format(
+                    anchor=anchor, text=text_xml(report.name)
+                ),
+            )
+            + "".join(
+                CELL.format(
+                    width=w, paragraph=CENTER_CELL_P.format(text=text_xml(value))
+                )
+                for w, value in zip(
+                    SUMMARY_WIDTHS[1:],
+                    (report.num_citations, report.num_pdfs, f"{report.coverage:.0%}"),
+                )
+            )
+            + "</w:tr>"
+        )
+
+        chunks = [
+            BOOKMARK_HEADING_P.format(id=i, name=anchor, text=text_xml(report.name)),
+            STATS_P.format(
+                text=text_xml(
+                    f"Citations: {report.num_citations}    PDFs: {report.num_pdfs}"
+                    f"    Coverage: {report.coverage:.0%}"
+                )
+            ),
+        ]
+        for j, entry in enumerate(report.entries):
+            link = report.entry_link(entry, base_dir)
+            entry = CitationEntry(
+                entry.title, entry.info, entry.abstract, link, entry.has_pdf
+            )
+            chunks.append(entry_xml(self.doc, entry, is_first=j == 0))
+        self.sections.append("".join(chunks))
+
+    def save(self, path):
+        self.doc.append(HEADING_P.format(text=text_xml("统计")))
+        self.doc.append(_table_start(SUMMARY_WIDTHS))
+        self.doc.append(_header_row(SUMMARY_WIDTHS, self.SUMMARY_HEADERS))
+        self.doc.chunks.extend(self.summary_rows)
+        self.doc.append(TABLE_END)
+        self.doc.chunks.extend(self.sections)
+        self.doc.save(path)
@@ -0,0 +1,155 @@
+"""
+Lightweight HTML, Markdown and CSV renderers for a paper's citation report.
+
+They take the same PaperReport as the docx engines, with the analyzed
+snippets of comment_analysis/all_snippets.json attached, and stream the
+output straight to the file.
+"""
+
+import csv
+import logging
+import os
+from html import escape
+from urllib.parse import quote
+
+import config
+from utils import get_filename
+
+from .model import load_paper_report
+
+PAPER_LIST_DIR = config.PAPER_LIST_DIR
+
+HTML_HEAD = """<!DOCTYPE html>
+<html lang="zh">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: Arial, sans-serif; max-width: 960px; margin: 2em auto; color: #222222; }}
+.entry {{ margin-top: 1.6em; }}
+.missing {{ color: #C80000; }}
+.info {{ color: #006621; font-size: 0.9em; }}
+.abstract {{ font-size: 0.9em; }}
+.snippet {{ font-size: 0.9em; margin: 0.4em 0; }}
+.positive {{ border-left: 3px solid #1A7F37; padding-left: 0.6em; }}
+.analysis {{ color: #555555; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+<p>Citations: {citations} &nbsp; PDFs: {pdfs} &nbsp; Coverage: {coverage:.0%}</p>
+"""
+HTML_TAIL = "</body>\n</html>\n"
+
+CSV_HEADERS = [
+    "ID",
+    "Title",
+    "Info",
+    "Link",
+    "HasPDF",
+    "Snippet",
+    "Analysis",
+    "Positive",
+]
+
+
+def _href(entry):
+    # Local PDFs sit next to the report
+    return quote(entry.link) if entry.has_pdf else entry.link
+
+
+def render_html(report, path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(
+            HTML_HEAD.format(
+                title=escape(report.name),
+                citations=report.num_citations,
+                pdfs=report.num_pdfs,
+                coverage=report.coverage,
+            )
+        )
+        for entry in report.entries:
+            f.write('<div class="entry">\n')
+            if not entry.has_pdf:
+                f.write('<span class="missing">[PDF not downloaded]</span><br>\n')
+            f.write(f'<a href="{escape(_href(entry))}">{escape(entry.title)}</a><br>\n')
+            f.write(f'<span class="info">{escape(entry.info)}</span><br>\n')
+            f.write(f'<span class="abstract">{escape(entry.abstract)}</span>\n')
+            for snippet in entry.snippets:
+                css = "snippet positive" if snippet["Positive"] else "snippet"
+                f.write(
+                    f'<p class="{css}">{escape(snippet["Text"])}<br>'
+                    f'<span class="analysis">{escape(snippet["Analysis"])}</span></p>\n'
+                )
+            f.write("</div>\n")
+        f.write(HTML_TAIL)
+
+
+def _md(text):
+    """Keep a value on one Markdown line and stop it from opening a link."""
+    return " ".join(str(text).split()).replace("[", "\\[").replace("]", "\\]")
+
+
+def render_markdown(report, path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"# {_md(report.name)}\n\n")
+        f.write(
+            f"Citations: {report.num_citations} | PDFs: {report.num_pdfs} | "
+            f"Coverage: {report.coverage:.0%}\n"
+        )
+        for i, entry in enumerate(report.entries, 1):
+            missing = "" if entry.has_pdf else " *(PDF not downloaded)*"
+            f.write(f"\n## {i}. [{_md(entry.title)}](<{_href(entry)}>){missing}\n\n")
+            f.write(f"_{_md(entry.info)}_\n\n")
+            f.write(f"> {_md(entry.abstract)}\n")
+            if entry.snippets:
+                f.write("\n")
+            for snippet in entry.snippets:
+                mark = "**[+]** " if snippet["Positive"] else ""
+                f.write(
+                    f"- {mark}{_md(snippet['Text'])}\n  - {_md(snippet['Analysis'])}\n"
+                )
+
+
+def render_csv(report, path):
+    """One row per analyzed snippet, or a single row for citations without any."""
+    # utf-8-sig so that Excel detects the encoding
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADERS)
+        for i, entry in enumerate(report.entries, 1):
+            row = [i, entry.title, entry.info, entry.link, int(entry.has_pdf)]
+            if not entry.snippets:
+                writer.writerow(row + ["", "", ""])
+            for snippet in entry.snippets:
+                writer.writerow(
+                    row
+                    + [snippet["Text"], snippet["Analysis"], int(snippet["Positive"])]
+                )
+
+
+RENDERERS = {
+    "html": (render_html, ".html"),
+    "md": (render_markdown, ".md"),
+    "csv": (render_csv, ".csv"),
+}
+
+
+def render_all(paper_ls, fmt, base_dir=None):
+    """Render the report of every paper into its folder as <dir_name>.<fmt>."""
+    if base_dir is None:
+        base_dir = PAPER_LIST_DIR
+    render, suffix = RENDERERS[fmt]
+    for paper in paper_ls:
+        dir_name = get_filename(paper)
+        paper_dir = os.path.join(base_dir, dir_name)
+        report = load_paper_report(paper_dir, with_snippets=True)
+        report.name = paper
+        if not report.entries:
+            logging.info(f"Paper: [{dir_name}] has no citation")
+            continue
+        path = os.path.join(paper_dir, dir_name + suffix)
+        render(report, path)
+        logging.info(
+            f"[SUCCESS] {path}: {report.num_citations} citations, {report.num_pdfs} PDFs"
+        )
@@ -0,0 +1,149 @@
+"""
+Declarative landing page -> direct PDF URL rewrites for open repositories.
+
+Each rule is (name, hosts, pattern, template). Patterns are matched
+against the URL path, plus the query string for the rules in QUERY_RULES, so a
+citation link is resolved with one host lookup and at most a few regex
+matches, without any HTML fetch. Every rule has fixtures in
+tests/test_url_rules.py.
+"""
+
+import re
+from urllib.parse import urlsplit
+
+RULES = [
+    (
+        "arxiv",
+        ["arxiv.org", "www.arxiv.org", "export.arxiv.org"],
+        r"/abs/(?P<id>[^?#]+?)/?$",
+        "https://arxiv.org/pdf/{id}",
+    ),
+    (
+        "acm",
+        ["dl.acm.org"],
+        r"/doi/(?:abs/|full/|fullHtml/|epdf/|pdf/)?(?P<doi>10\.\d+/[^?#]+)",
+        "https://dl.acm.org/doi/pdf/{doi}",
+    ),
+    (
+        "ieee",
+        ["ieeexplore.ieee.org"],
+        r"/(?:abstract/)?document/(?P<num>\d+)",
+        "https://ieeexplore.ieee.org/stampPDF/getPDF.jsp?tp=&arnumber={num}",
+    ),
+    (
+        "openreview",
+        ["openreview.net"],
+        r"/(?:forum|pdf)\?(?:.*&)?id=(?P<id>[^&#]+)",
+        "https://openreview.net/pdf?id={id}",
+    ),
+    (
+        "acl_anthology",
+        ["aclanthology.org", "www.aclweb.org"],
+        r"(?:/anthology)?/(?P<id>[A-Z]\d{2}-\d{4}|\d{4}\.[a-z0-9\-]+\.\d+)/?$",
+        "https://aclanthology.org/{id}.pdf",
+    ),
+    (
+        "cvf",
+        ["openaccess.thecvf.com"],
+        r"/(?P<path>.+)/html/(?P<name>[^/]+)\.html$",
+        "https://openaccess.thecvf.com/{path}/papers/{name}.pdf",
+    ),
+    (
+        "ecva",
+        ["www.ecva.net", "ecva.net"],
+        r"/(?P<path>.+)/html/(?P<name>[^/]+)\.php$",
+        "https://www.ecva.net/{path}/papers/{name}.pdf",
+    ),
+    (
+        "pmlr",
+        ["proceedings.mlr.press"],
+        r"/(?P<vol>v\d+)/(?P<name>[^/]+)\.html$",
+        "https://proceedings.mlr.press/{vol}/{name}/{name}.pdf",
+    ),
+    (
+        "jmlr",
+        ["jmlr.org", "www.jmlr.org"],
+        r"/papers/v(?P<vol>\d+)/(?P<name>[^/]+)\.html$",
+        "https://jmlr.org/papers/volume{vol}/{name}/{name}.pdf",
+    ),
+    (
+        "neurips",
+        ["proceedings.neurips.cc", "papers.nips.cc"],
+        r"/(?P<root>paper|paper_files/paper)/(?P<year>\d{4})/hash/(?P<hash>[0-9a-f]+)-Abstract(?P<track>-[A-Za-z_]+)?\.html$",
+        "https://proceedings.neurips.cc/{root}/{year}/file/{hash}-Paper{track}.pdf",
+    ),
+    (
+        "ijcai",
+        ["www.ijcai.org", "ijcai.org"],
+        r"/proceedings/(?P<year>\d{4})/(?P<num>\d+)/?$",
+        "https://www.ijcai.org/proceedings/{year}/{num}.pdf",
+    ),
+    (
+        "aaai",
+        ["ojs.aaai.org"],
+        r"/index\.php/(?P<journal>[A-Za-z]+)/article/view/(?P<article>\d+)/(?P<galley>\d+)",
+        "https://ojs.aaai.org/index.php/{journal}/article/download/{article}/{galley}",
+    ),
+    (
+        "mdpi",
+        ["www.mdpi.com", "mdpi.com"],
+        r"/(?P<path>\d{4}-\d{3}[\dX]/\d+/\d+/\d+)(?:/htm)?/?$",
+        "https://www.mdpi.com/{path}/pdf",
+    ),
+    (
+        "biorxiv",
+        ["www.biorxiv.org", "biorxiv.org", "www.medrxiv.org", "medrxiv.org"],
+        r"/content/(?P<doi>10\.1101/[^?#]+?v\d+)(?:\.full|\.abstract)?/?$",
+        "https://{host}/content/{doi}.full.pdf",
+    ),
+    (
+        "springer",
+        ["link.springer.com"],
+        r"/(?:article|chapter)/(?P<doi>10\.\d+/[^?#]+)",
+        "https://link.springer.com/content/pdf/{doi}.pdf",
+    ),
+    (
+        "nature",
+        ["www.nature.com", "nature.com"],
+        r"/articles/(?P<id>[^/?#.]+)$",
+        "https://www.nature.com/articles/{id}.pdf",
+    ),
+    (
+        "wiley",
+        ["onlinelibrary.wiley.com"],
+        r"/doi/(?:abs/|full/|epdf/)?(?P<doi>10\.\d+/[^?#]+)",
+        "https://onlinelibrary.wiley.com/doi/pdfdirect/{doi}",
+    ),
+]
+
+# Rules whose pattern is matched against "path?query" instead of the path alone
+QUERY_RULES = {"openreview"}
+
+# host -> [(name, compiled pattern, template)], built once at import
+_RULES_BY_HOST = {}
+for _name, _hosts, _pattern, _template in RULES:
+    for _host in _hosts:
+        _RULES_BY_HOST.setdefault(_host, []).append(
+            (_name, re.compile(_pattern), _template)
+        )
+
+
+def rewrite_pdf_url(url):
+    """Return (rule name, direct PDF URL) for a landing URL, or (None, None)."""
+    if not url:
+        return None, None
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    rules = _RULES_BY_HOST.get(host)
+    if not rules:
+        return None, None
+
+    for name, regex, template in rules:
+        if name in QUERY_RULES:
+            match = regex.match(f"{parts.path}?{parts.query}")
+        else:
+            match = regex.match(parts.path)
+        if match:
+            groups = {k: v or "" for k, v in match.groupdict().items()}
+            return name, template.format(host=host, **groups)
+    return None, None
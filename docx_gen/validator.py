@@ -0,0 +1,213 @@
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+from fuzzywuzzy import fuzz
+
+import config
+from utils import get_filename
+
+# Minimum partial_ratio between the citation title and the first pages' text
+TITLE_MATCH_THRESHOLD = getattr(config, "PDF_TITLE_MATCH_THRESHOLD", 80)
+VALIDATION_STATE_FILE = ".pdf_validation.json"
+QUARANTINE_DIR = "quarantine"
+QUARANTINE_REPORT = "report.json"
+
+# Statuses that send a PDF to quarantine. "no_text" (e.g. scanned papers)
+# cannot be verified and is kept.
+BAD_STATUSES = ("corrupt", "encrypted", "empty", "title_mismatch")
+
+
+def _normalize(text):
+    text = re.sub(r"-\s*\n\s*", "", text.lower())
+    return " ".join(re.findall(r"[^\W_]+", text))
+
+
+def check_pdf(pdf_path, title, threshold=TITLE_MATCH_THRESHOLD):
+    """Open a PDF and check that it is readable and is the paper titled `title`."""
+    result = {"status": "ok", "pages": 0, "score": None}
+    try:
+        with fitz.open(pdf_path) as pdf_document:
+            result["pages"] = pdf_document.page_count
+            if pdf_document.needs_pass:
+                result["status"] = "encrypted"
+                return result
+            if pdf_document.page_count == 0:
+                result["status"] = "empty"
+                return result
+            # The title can be on page 2 behind a publisher cover page
+            first_pages = "".join(
+                pdf_document.load_page(i).get_text()
+                for i in range(min(2, pdf_document.page_count))
+            )
+    except Exception as e:
+        result["status"] = "corrupt"
+        result["error"] = str(e)
+        return result
+
+    text = _normalize(first_pages)
+    if not text:
+        result["status"] = "no_text"
+        return result
+    if title:
+        result["score"] = fuzz.partial_ratio(_normalize(title), text)
+        if result["score"] < threshold:
+            result["status"] = "title_mismatch"
+    return result
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _load_json(path, default):
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Failed to read {path}: {e}")
+    return default
+
+
+def _save_json(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def _pending_checks(paper_dir):
+    """Return (filename, title, path) of citation PDFs that are new or changed."""
+    json_path = os.path.join(paper_dir, "citation_info.json")
+    cit_list = _load_json(json_path, [])
+    state = _load_json(os.path.join(paper_dir, VALIDATION_STATE_FILE), {})
+
+    pending = []
+    for cit in cit_list:
+        filename = cit.get("filename")
+        if not filename:
+            continue
+        pdf_path = os.path.join(paper_dir, f"{filename}.pdf")
+        if not os.path.exists(pdf_path):
+            continue
+        entry = state.get(filename)
+        if entry and entry.get("signature") == _file_signature(pdf_path):
+            continue
+        pending.append((filename, cit.get("title", ""), pdf_path))
+    return pending
+
+
+def _quarantine_path(quarantine_dir, filename):
+    """A path in quarantine_dir for filename.pdf that does not overwrite a copy."""
+    path = os.path.join(quarantine_dir, f"{filename}.pdf")
+    n = 1
+    while os.path.exists(path):
+        path = os.path.join(quarantine_dir, f"{filename}.{n}.pdf")
+        n += 1
+    return path
+
+
+def _record_results(paper_dir, results):
+    """Update the validation state and quarantine the PDFs that failed."""
+    state_path = os.path.join(paper_dir, VALIDATION_STATE_FILE)
+    state = _load_json(state_path, {})
+    quarantine_dir = os.path.join(paper_dir, QUARANTINE_DIR)
+    report_path = os.path.join(quarantine_dir, QUARANTINE_REPORT)
+    report = None
+
+    for filename, title, pdf_path, result in results:
+        if result["status"] not in BAD_STATUSES:
+            state[filename] = dict(result, signature=_file_signature(pdf_path))
+            continue
+
+        if report is None:
+            os.makedirs(quarantine_dir, exist_ok=True)
+            report = _load_json(report_path, [])
+        target = _quarantine_path(quarantine_dir, filename)
+        os.replace(pdf_path, target)
+        state.pop(filename, None)
+        # One record per citation, for its latest quarantined copy
+        report = [item for item in report if item.get("filename") != filename]
+        report.append(
+            dict(
+                result,
+                filename=filename,
+                title=title,
+                quarantined_as=os.path.basename(target),
+                time=time.strftime("%Y-%m-%d %H:%M:%S"),
+            )
+        )
+        logging.info(
+            f"[FAILED] Quarantined {filename}.pdf as {os.path.basename(target)} "
+            f"({result['status']}, score: {result['score']})"
+        )
+
+    _save_json(state_path, state)
+    if report is not None:
+        _save_json(report_path, report)
+
+
+def quarantined_filenames(paper_dir):
+    """Filenames listed in <paper>/quarantine/report.json."""
+    report = _load_json(os.path.join(paper_dir, QUARANTINE_DIR, QUARANTINE_REPORT), [])
+    return {item["filename"] for item in report if item.get("filename")}
+
+
+def validate_pdf(paper_dir, filename, title):
+    """
+    Check one citation PDF right after it is downloaded, quarantining it if it
+    fails. Returns True if the PDF was kept.
+    """
+    pdf_path = os.path.join(paper_dir, f"{filename}.pdf")
+    result = check_pdf(pdf_path, title)
+    _record_results(paper_dir, [(filename, title, pdf_path, result)])
+    return result["status"] not in BAD_STATUSES
+
+
+def validate_all_pdfs(paper_ls, jobs=None, base_dir=None):
+    """
+    Validate the new or changed citation PDFs of every paper in a process pool.
+    PDFs that are unreadable, encrypted or not the cited paper are moved to
+    <paper>/quarantine/ and listed in quarantine/report.json.
+    Returns {status: count} over the checked files.
+    """
+    if base_dir is None:
+        base_dir = config.PAPER_LIST_DIR
+
+    jobs_by_paper = {}
+    for paper in paper_ls:
+        paper_dir = os.path.join(base_dir, get_filename(paper))
+        pending = _pending_checks(paper_dir)
+        if pending:
+            jobs_by_paper[paper_dir] = pending
+
+    summary = {}
+    total = sum(len(p) for p in jobs_by_paper.values())
+    if not total:
+        logging.info("No new or changed PDFs to validate.")
+        return summary
+
+    logging.info(f"Validating {total} PDFs...")
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {
+            paper_dir: [
+                (filename, title, path, pool.submit(check_pdf, path, title))
+                for filename, title, path in pending
+            ]
+            for paper_dir, pending in jobs_by_paper.items()
+        }
+        for paper_dir, checks in futures.items():
+            results = [
+                (filename, title, path, future.result())
+                for filename, title, path, future in checks
+            ]
+            _record_results(paper_dir, results)
+            for *_, result in results:
+                summary[result["status"]] = summary.get(result["status"], 0) + 1
+
+    logging.info(f"PDF validation summary: {summary}")
+    return summary
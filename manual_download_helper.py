@@ -5,7 +5,7 @@ import shutil
 import time
 import glob
 from config import PAPER_LIST_DIR
-from utils import get_filename
+from utils import get_filename, LocalPdfIndex
 
 # ================= 配置区域 =================
 # 尝试自动猜测下载路径 (Windows/Mac/Linux)
@@ -109,6 +109,11 @@ def get_missing_citations(paper_name):
         return []
 
     missing_list = []
+    # Same matching as the Word report, so PDFs saved under a slightly
+    # different name are not listed as missing
+    local_pdfs = LocalPdfIndex.from_dir(paper_path).match_all(
+        cit["filename"] for cit in citations if cit.get("filename")
+    )
 
     for cit in citations:
         filename = cit.get("filename")
@@ -118,7 +123,7 @@ def get_missing_citations(paper_name):
         pdf_path = os.path.join(paper_path, f"{filename}.pdf")
 
         # Check if PDF exists
-        if not os.path.exists(pdf_path):
+        if filename not in local_pdfs:
             missing_list.append(
                 {
                     "index": cit.get("index", "N/A"),
@@ -6,7 +6,10 @@ import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from utils import get_papers, setup_logging
+from docx_gen.combined import generate_combined_report
 from docx_gen.generator import generate_all_docx
+from docx_gen.renderers import render_all
+from docx_gen.validator import validate_all_pdfs
 
 
 def main():
@@ -21,7 +24,73 @@ def main():
         help="Generate Word documents using only local PDFs (do not crawl online).",
     )
 
+    parser.add_argument(
+        "--hedged",
+        action="store_true",
+        help="Race the PDF sources of each citation instead of trying them one by one.",
+    )
+
+    parser.add_argument(
+        "--validate",
+        action="store_true",
+        help="Check new or changed PDFs, including the ones downloaded in this run, "
+        "and quarantine those that are not the citing paper.",
+    )
+
+    parser.add_argument(
+        "--retry-quarantined",
+        action="store_true",
+        help="Download again the PDFs listed in quarantine/report.json "
+        "(skipped by default).",
+    )
+
+    parser.add_argument(
+        "--engine",
+        choices=["python-docx", "ooxml"],
+        default=None,
+        help="Word rendering engine (default: DOCX_ENGINE in config). "
+        "'ooxml' writes the .docx directly and is much faster for large reports.",
+    )
+
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of papers processed in parallel (worker processes).",
+    )
+
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rebuild every document even if its citations and PDFs are unchanged.",
+    )
+
+    parser.add_argument(
+        "--format",
+        choices=["docx", "html", "md", "csv"],
+        default="docx",
+        help="Report format. html/md/csv are rendered from local data only "
+        "(citations, local PDFs and comment analysis results) and take milliseconds.",
+    )
+
+    parser.add_argument(
+        "--combined",
+        action="store_true",
+        help="Write all papers into one report with a table of contents and statistics "
+        "(uses local PDFs only).",
+    )
+
+    parser.add_argument(
+        "--output",
+        default="combined_report.docx",
+        help="Output path of the --combined report.",
+    )
+
     args = parser.parse_args()
+    if args.combined and args.format != "docx":
+        parser.error(
+            "--combined only writes a .docx report, it cannot be used with --format"
+        )
 
     # Determine mode
     get_pdf_mode = not args.no_pdf
@@ -36,8 +105,35 @@ def main():
             print("No paper directories found in ./paper_list")
             return
 
+        if args.validate:
+            # PDFs downloaded below are validated as soon as they arrive
+            print("Validating local PDFs...")
+            summary = validate_all_pdfs(
+                paper_list, jobs=args.jobs if args.jobs > 1 else None
+            )
+            print(f"PDF validation summary: {summary}")
+
+        if args.format != "docx":
+            print(f"Rendering {args.format} reports from local data...")
+            render_all(paper_list, args.format)
+            return
+
+        if args.combined:
+            print(f"Writing combined report to {args.output}...")
+            generate_combined_report(paper_list, args.output)
+            return
+
         print(f"Running in {'PDF Download' if get_pdf_mode else 'Local Link'} mode.")
-        generate_all_docx(paper_list, get_pdf_flag=get_pdf_mode)
+        generate_all_docx(
+            paper_list,
+            get_pdf_flag=get_pdf_mode,
+            hedged=args.hedged or None,
+            engine=args.engine,
+            jobs=args.jobs,
+            force=args.force,
+            validate=args.validate,
+            retry_quarantined=args.retry_quarantined,
+        )
     else:
         print(
             "Please use CitationSpider to get citation data in advance (missing ./paper_list directory)"
@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+from comment_analysis.title_locator import (
+    check_queries,
+    corpus_titles,
+    locate_title,
+    scan_title,
+    synthetic_corpus,
+)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def queries():
+    titles = corpus_titles(REPO_ROOT)
+    assert len(titles) >= 60
+    return synthetic_corpus(titles, 40, seed=0)
+
+
+def test_locate_matches_scan(queries):
+    checked, mismatches, _, _ = check_queries(queries)
+    assert checked == len(queries)
+    assert mismatches == []
+
+
+def test_locate_is_faster(queries):
+    # ~23x on this corpus: ~45x for listed titles, ~15x for absent ones,
+    # which fall back to all title n-grams as anchors
+    _, _, scan_time, locate_time = check_queries(queries)
+    assert scan_time > 10 * locate_time
+
+
+@pytest.mark.parametrize(
+    "title,text",
+    [
+        ("Deep learning", "References\n[1] Y. LeCun. Deep learning. Nature."),
+        ("A", "abc"),
+        ("A long title longer than the text", "short"),
+    ],
+)
+def test_edge_cases(title, text):
+    assert locate_title(title, text) == scan_title(title, text)
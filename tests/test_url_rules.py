@@ -0,0 +1,181 @@
+import pytest
+
+from docx_gen.url_rules import RULES, rewrite_pdf_url
+
+# Landing page -> expected PDF URL, for each rule of docx_gen.url_rules
+FIXTURES = {
+    "arxiv": [
+        ("https://arxiv.org/abs/2301.01234v2", "https://arxiv.org/pdf/2301.01234v2"),
+        (
+            "https://arxiv.org/abs/2301.01234?context=cs",
+            "https://arxiv.org/pdf/2301.01234",
+        ),
+    ],
+    "acm": [
+        (
+            "https://dl.acm.org/doi/abs/10.1145/3580305.3599256",
+            "https://dl.acm.org/doi/pdf/10.1145/3580305.3599256",
+        ),
+    ],
+    "ieee": [
+        (
+            "https://ieeexplore.ieee.org/abstract/document/10446469/",
+            "https://ieeexplore.ieee.org/stampPDF/getPDF.jsp?tp=&arnumber=10446469",
+        ),
+    ],
+    "openreview": [
+        (
+            "https://openreview.net/forum?id=rJzIBfZAb",
+            "https://openreview.net/pdf?id=rJzIBfZAb",
+        ),
+    ],
+    "acl_anthology": [
+        (
+            "https://aclanthology.org/2023.acl-long.1/",
+            "https://aclanthology.org/2023.acl-long.1.pdf",
+        ),
+        (
+            "https://www.aclweb.org/anthology/P19-1001/",
+            "https://aclanthology.org/P19-1001.pdf",
+        ),
+        (
+            "https://aclanthology.org/2023.acl-long.1/?utm_source=scholar",
+            "https://aclanthology.org/2023.acl-long.1.pdf",
+        ),
+    ],
+    "cvf": [
+        (
+            "https://openaccess.thecvf.com/content/CVPR2023/html/Wei_CFA_Class-Wise_Calibrated_Fair_Adversarial_Training_CVPR_2023_paper.html",
+            "https://openaccess.thecvf.com/content/CVPR2023/papers/Wei_CFA_Class-Wise_Calibrated_Fair_Adversarial_Training_CVPR_2023_paper.pdf",
+        ),
+        (
+            "https://openaccess.thecvf.com/content/ICCV2023/html/Li_Robust_ICCV_2023_paper.html?ref=scholar",
+            "https://openaccess.thecvf.com/content/ICCV2023/papers/Li_Robust_ICCV_2023_paper.pdf",
+        ),
+    ],
+    "ecva": [
+        (
+            "https://www.ecva.net/papers/eccv_2022/papers_ECCV/html/1234_ECCV_2022_paper.php",
+            "https://www.ecva.net/papers/eccv_2022/papers_ECCV/papers/1234_ECCV_2022_paper.pdf",
+        ),
+        (
+            "https://www.ecva.net/papers/eccv_2022/papers_ECCV/html/1234_ECCV_2022_paper.php?ref=scholar",
+            "https://www.ecva.net/papers/eccv_2022/papers_ECCV/papers/1234_ECCV_2022_paper.pdf",
+        ),
+    ],
+    "pmlr": [
+        (
+            "https://proceedings.mlr.press/v202/wei23a.html",
+            "https://proceedings.mlr.press/v202/wei23a/wei23a.pdf",
+        ),
+        (
+            "https://proceedings.mlr.press/v202/wei23a.html?ref=scholar",
+            "https://proceedings.mlr.press/v202/wei23a/wei23a.pdf",
+        ),
+    ],
+    "jmlr": [
+        (
+            "https://jmlr.org/papers/v24/22-1234.html",
+            "https://jmlr.org/papers/volume24/22-1234/22-1234.pdf",
+        ),
+        (
+            "https://jmlr.org/papers/v24/22-1234.html?ref=scholar",
+            "https://jmlr.org/papers/volume24/22-1234/22-1234.pdf",
+        ),
+    ],
+    "neurips": [
+        (
+            "https://proceedings.neurips.cc/paper/2021/hash/0a1bf96b7165e962e90cb14648c9462d-Abstract.html",
+            "https://proceedings.neurips.cc/paper/2021/file/0a1bf96b7165e962e90cb14648c9462d-Paper.pdf",
+        ),
+        (
+            "https://proceedings.neurips.cc/paper_files/paper/2023/hash/0a1bf96b7165e962e90cb14648c9462d-Abstract-Conference.html",
+            "https://proceedings.neurips.cc/paper_files/paper/2023/file/0a1bf96b7165e962e90cb14648c9462d-Paper-Conference.pdf",
+        ),
+        (
+            "https://proceedings.neurips.cc/paper_files/paper/2023/hash/0a1bf96b7165e962e90cb14648c9462d-Abstract-Conference.html?ref=scholar",
+            "https://proceedings.neurips.cc/paper_files/paper/2023/file/0a1bf96b7165e962e90cb14648c9462d-Paper-Conference.pdf",
+        ),
+    ],
+    "ijcai": [
+        (
+            "https://www.ijcai.org/proceedings/2023/0001",
+            "https://www.ijcai.org/proceedings/2023/0001.pdf",
+        ),
+        (
+            "https://www.ijcai.org/proceedings/2023/0001?ref=scholar",
+            "https://www.ijcai.org/proceedings/2023/0001.pdf",
+        ),
+    ],
+    "aaai": [
+        (
+            "https://ojs.aaai.org/index.php/AAAI/article/view/25001/24773",
+            "https://ojs.aaai.org/index.php/AAAI/article/download/25001/24773",
+        ),
+    ],
+    "mdpi": [
+        (
+            "https://www.mdpi.com/2076-3417/13/5/3021",
+            "https://www.mdpi.com/2076-3417/13/5/3021/pdf",
+        ),
+        (
+            "https://www.mdpi.com/2076-3417/13/5/3021/htm?ref=scholar",
+            "https://www.mdpi.com/2076-3417/13/5/3021/pdf",
+        ),
+    ],
+    "biorxiv": [
+        (
+            "https://www.biorxiv.org/content/10.1101/2023.01.01.522345v1",
+            "https://www.biorxiv.org/content/10.1101/2023.01.01.522345v1.full.pdf",
+        ),
+        (
+            "https://www.medrxiv.org/content/10.1101/2023.01.01.522345v2.full?versioned=true",
+            "https://www.medrxiv.org/content/10.1101/2023.01.01.522345v2.full.pdf",
+        ),
+    ],
+    "springer": [
+        (
+            "https://link.springer.com/article/10.1007/s11263-023-01234-5",
+            "https://link.springer.com/content/pdf/10.1007/s11263-023-01234-5.pdf",
+        ),
+    ],
+    "nature": [
+        (
+            "https://www.nature.com/articles/s41586-021-03819-2",
+            "https://www.nature.com/articles/s41586-021-03819-2.pdf",
+        ),
+        (
+            "https://www.nature.com/articles/s41586-021-03819-2?foo",
+            "https://www.nature.com/articles/s41586-021-03819-2.pdf",
+        ),
+    ],
+    "wiley": [
+        (
+            "https://onlinelibrary.wiley.com/doi/full/10.1002/int.22838",
+            "https://onlinelibrary.wiley.com/doi/pdfdirect/10.1002/int.22838",
+        ),
+    ],
+}
+
+CASES = [
+    (name, landing, expected)
+    for name, examples in FIXTURES.items()
+    for landing, expected in examples
+]
+
+
+@pytest.mark.parametrize("name,landing,expected", CASES)
+def test_rewrite(name, landing, expected):
+    assert rewrite_pdf_url(landing) == (name, expected)
+
+
+def test_every_rule_has_fixtures():
+    assert sorted(FIXTURES) == sorted(rule[0] for rule in RULES)
+
+
+@pytest.mark.parametrize(
+    "url",
+    ["", "https://example.com/paper.pdf", "https://arxiv.org/list/cs.LG/recent"],
+)
+def test_unknown_urls(url):
+    assert rewrite_pdf_url(url) == (None, None)
@@ -2,6 +2,7 @@ import logging
 import os
 import pickle
 import json
+import re
 from datetime import datetime
 from fuzzywuzzy import fuzz
 import config
@@ -72,6 +73,75 @@ def are_strings_almost_matching(string1, string2, threshold=90):
     return similarity_ratio >= threshold
 
 
+def normalize_filename(name):
+    """Normalize a PDF file name for exact lookup: lowercase alphanumeric tokens."""
+    if name.lower().endswith(".pdf"):
+        name = name[:-4]
+    return " ".join(re.findall(r"[^\W_]+", name.lower()))
+
+
+class LocalPdfIndex:
+    """
+    Matches citation filenames to the PDF files of a folder.
+
+    Names are first looked up exactly after normalization. Only the names
+    left over are fuzzy matched, against the PDFs not yet taken and whose
+    length allows a ratio above the threshold, and pairs are then assigned
+    one-to-one from the best score down.
+    """
+
+    def __init__(self, pdf_list):
+        self.pdfs = sorted(pdf_list)
+        self.exact = {}
+        for pdf in self.pdfs:
+            self.exact.setdefault(normalize_filename(pdf), pdf)
+
+    @classmethod
+    def from_dir(cls, dir_path):
+        if not os.path.exists(dir_path):
+            return cls([])
+        return cls(f for f in os.listdir(dir_path) if f.lower().endswith(".pdf"))
+
+    def match_all(self, filenames, threshold=90):
+        """Return {filename: pdf} for the filenames that have a local PDF."""
+        matches = {}
+        taken = set()
+        unmatched = []
+        for filename in dict.fromkeys(filenames):
+            pdf = self.exact.get(normalize_filename(filename))
+            if pdf and pdf not in taken:
+                matches[filename] = pdf
+                taken.add(pdf)
+            else:
+                unmatched.append(filename)
+
+        candidates = [(pdf, pdf[:-4].lower()) for pdf in self.pdfs if pdf not in taken]
+        if not unmatched or not candidates:
+            return matches
+
+        # fuzz.ratio is at most 200 * min(len) / (len_a + len_b)
+        min_len_ratio = threshold / (200 - threshold)
+        pairs = []
+        for filename in unmatched:
+            name = filename.lower()
+            for pdf, pdf_name in candidates:
+                shorter, longer = sorted((len(name), len(pdf_name)))
+                if shorter < min_len_ratio * longer:
+                    continue
+                score = fuzz.ratio(name, pdf_name)
+                if score >= threshold:
+                    pairs.append((score, filename, pdf))
+
+        for score, filename, pdf in sorted(pairs, key=lambda p: -p[0]):
+            if filename not in matches and pdf not in taken:
+                matches[filename] = pdf
+                taken.add(pdf)
+        return matches
+
+    def match(self, filename, threshold=90):
+        return self.match_all([filename], threshold).get(filename, "")
+
+
 def get_filename(paper_title):
     """Generate a safe filename from a paper title."""
     words = paper_title.split()